@@ -0,0 +1,199 @@
+"""Circuit breakers and bulkheads per endpoint family.
+
+Endpoints are grouped in families by the first segment of their path
+(`purge`, `content_delivery`, `tokens`). When one family degrades, its
+circuit opens and calls to it fail fast with
+:class:`~azion.exceptions.CircuitOpen` instead of piling up on
+timeouts. After `reset_timeout` seconds a limited number of trial calls
+is let through (half-open); if they succeed the circuit closes again.
+
+Bulkheads cap how many calls of each family may be in flight at once,
+and :meth:`Breakers.isolate` gives every family its own slice of the
+connection pool, so a slow purge API cannot take connections needed to
+manage configurations.
+"""
+import contextlib
+import threading
+import time
+
+from azion import forks
+from azion.concurrency import is_overload
+from azion.exceptions import AzionError, BulkheadFull, CircuitOpen
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def endpoint_family(path):
+    """Return the family of an endpoint from its path segments,
+    as given to :meth:`~azion.client.Session.build_url`."""
+    return str(path[0]) if path else ''
+
+
+class CircuitBreaker(object):
+    """Circuit breaker of a single endpoint family.
+
+    .. attribute:: state
+
+        One of `closed`, `open` or `half_open`.
+
+    :param int failure_threshold: consecutive failures that open
+        the circuit.
+    :param float reset_timeout: seconds the circuit stays open
+        before trial calls are allowed.
+    :param int half_open_trials: calls allowed while half-open.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30,
+                 half_open_trials=1, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_trials = half_open_trials
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trials = 0
+
+    def allow(self):
+        """Reserve the right to make a call.
+
+        :raises: :class:`~azion.exceptions.CircuitOpen` while the
+            circuit is open or all half-open trials are taken.
+        """
+        with self.lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpen('Circuit is open')
+                self.state = HALF_OPEN
+                self.trials = 0
+            if self.state == HALF_OPEN:
+                if self.trials >= self.half_open_trials:
+                    raise CircuitOpen('Circuit is half-open, trial running')
+                self.trials += 1
+
+    def record_success(self):
+        with self.lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if (self.state == HALF_OPEN or
+                    self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = self.clock()
+
+    def after_fork(self):
+        self.lock = threading.Lock()
+        # Trials running in the parent never report in the child
+        self.trials = 0
+
+    def record_ignored(self):
+        """Release a half-open trial whose outcome says nothing
+        about the health of the endpoint."""
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.trials -= 1
+
+
+class Breakers(object):
+    """Circuit breakers and bulkheads for every endpoint family.
+
+    .. code-block:: python
+
+        breakers = Breakers(bulkheads={'purge': 4})
+        breakers.isolate(session)
+        azion = Azion(token, session=session, breakers=breakers)
+
+    :param dict bulkheads: maximum calls in flight per family.
+        Families not listed are not limited.
+    :param float bulkhead_timeout: how long to wait for a bulkhead
+        slot before raising :class:`~azion.exceptions.BulkheadFull`.
+        Default to fail immediately.
+
+    Other keyword arguments are passed to every :class:`CircuitBreaker`.
+    """
+
+    def __init__(self, bulkheads=None, bulkhead_timeout=0, **options):
+        self.options = options
+        self.bulkheads = {
+            family: threading.BoundedSemaphore(size)
+            for family, size in (bulkheads or {}).items()}
+        self.bulkhead_sizes = dict(bulkheads or {})
+        self.bulkhead_timeout = bulkhead_timeout
+        self.breakers = {}
+        self.lock = threading.Lock()
+        forks.register(self)
+
+    def after_fork(self):
+        """Release the bulkhead slots and breaker trials held by
+        calls of the parent process."""
+        self.bulkheads = {
+            family: threading.BoundedSemaphore(size)
+            for family, size in self.bulkhead_sizes.items()}
+        self.lock = threading.Lock()
+        for breaker in self.breakers.values():
+            breaker.after_fork()
+
+    def breaker(self, family):
+        """Return the circuit breaker of a family, creating it
+        on first use."""
+        with self.lock:
+            if family not in self.breakers:
+                self.breakers[family] = CircuitBreaker(**self.options)
+            return self.breakers[family]
+
+    def isolate(self, session):
+        """Mount a dedicated connection pool on `session` for every
+        family with a bulkhead, sized to the bulkhead."""
+        for family, size in self.bulkhead_sizes.items():
+            session.mount(session.build_url(family),
+                          session.create_adapter(size))
+
+    @contextlib.contextmanager
+    def guard(self, path):
+        """Run a call to the endpoint at `path` through the circuit
+        breaker and bulkhead of its family."""
+        family = endpoint_family(path)
+        breaker = self.breaker(family)
+        bulkhead = self.bulkheads.get(family)
+
+        if bulkhead is not None:
+            if self.bulkhead_timeout:
+                acquired = bulkhead.acquire(timeout=self.bulkhead_timeout)
+            else:
+                acquired = bulkhead.acquire(blocking=False)
+            if not acquired:
+                raise BulkheadFull(f'Bulkhead of {family} is full')
+        try:
+            breaker.allow()
+            try:
+                yield
+            except Exception as error:
+                if is_overload(error):
+                    breaker.record_failure()
+                elif isinstance(error, AzionError):
+                    # The API answered, so the endpoint is healthy
+                    breaker.record_success()
+                else:
+                    breaker.record_ignored()
+                raise
+            else:
+                breaker.record_success()
+        finally:
+            if bulkhead is not None:
+                bulkhead.release()
+
+    def states(self):
+        """Return the state of every family's circuit.
+
+        :rtype: dict
+        """
+        with self.lock:
+            return {family: breaker.state
+                    for family, breaker in self.breakers.items()}
@@ -0,0 +1,168 @@
+"""Reusable buffers for request and response bodies.
+
+By default `requests` joins the response chunks into `content`, decodes
+it into a string and then parses it, allocating new objects for every
+call. With a :class:`BufferPool` attached to the
+:class:`~azion.client.Session`, response bodies are read into a reused
+`bytearray` and decoded to text straight from a `memoryview` of it, and
+JSON request bodies are encoded into a pooled buffer and sent without
+building an intermediate `bytes` copy.
+"""
+import collections
+import json
+
+import requests
+
+
+class BufferPool(object):
+    """Pool of reusable `bytearray` buffers.
+
+    :param int size:
+        Initial size of new buffers, in bytes.
+    :param int max_buffers:
+        Maximum number of idle buffers kept in the pool.
+    :param int max_size:
+        Buffers grown beyond this size are dropped instead of
+        returned to the pool, so one huge response does not pin
+        memory forever.
+    """
+
+    def __init__(self, size=64 * 1024, max_buffers=8,
+                 max_size=16 * 1024 * 1024):
+        self.size = size
+        self.max_buffers = max_buffers
+        self.max_size = max_size
+        self.buffers = collections.deque()
+        self.allocations = 0
+
+    def acquire(self, size=None):
+        """Return a buffer of at least `size` bytes."""
+        size = size or self.size
+        try:
+            buffer = self.buffers.pop()
+        except IndexError:
+            self.allocations += 1
+            return bytearray(max(size, self.size))
+        if len(buffer) < size:
+            buffer.extend(bytes(size - len(buffer)))
+        return buffer
+
+    def release(self, buffer):
+        """Give a buffer back to the pool."""
+        if (len(buffer) <= self.max_size and
+                len(self.buffers) < self.max_buffers):
+            self.buffers.append(buffer)
+
+
+def encode_json_into(data, buffer):
+    """Encode `data` as compact JSON into `buffer`.
+
+    The buffer grows when needed.
+
+    :return: number of bytes written.
+    :rtype: int
+    """
+    encoder = json.JSONEncoder(separators=(',', ':'), allow_nan=False)
+    return copy_into(
+        (chunk.encode('utf-8') for chunk in encoder.iterencode(data)),
+        buffer)
+
+
+def copy_into(chunks, buffer):
+    """Copy an iterable of bytes-like chunks into `buffer`, growing
+    it when needed.
+
+    :return: number of bytes written.
+    :rtype: int
+    """
+    size = 0
+    for chunk in chunks:
+        end = size + len(chunk)
+        if end > len(buffer):
+            buffer.extend(bytes(max(end - len(buffer), len(buffer))))
+        buffer[size:end] = chunk
+        size = end
+    return size
+
+
+def read_into(raw, buffer, chunk_size=64 * 1024):
+    """Read a whole stream into `buffer`, growing it when full.
+
+    :param object raw: file-like object with a `readinto` method.
+    :return: number of bytes read.
+    :rtype: int
+    """
+    size = 0
+    while True:
+        if size == len(buffer):
+            buffer.extend(bytes(max(chunk_size, len(buffer))))
+        with memoryview(buffer) as view:
+            read = raw.readinto(view[size:])
+        if not read:
+            return size
+        size += read
+
+
+class BufferedResponse(requests.Response):
+    """Response whose JSON body was already decoded from a
+    pooled buffer.
+
+    The raw body is not kept. :attr:`content` re-encodes
+    the decoded JSON when accessed.
+    """
+
+    @classmethod
+    def from_response(cls, response, data, error=None):
+        buffered = cls()
+        buffered.__dict__.update(response.__dict__)
+        buffered._data = data
+        buffered._error = error
+        buffered._content = False
+        buffered._content_consumed = True
+        return buffered
+
+    def json(self, **kwargs):
+        if self._error is not None:
+            raise self._error
+        return self._data
+
+    @property
+    def content(self):
+        if self._content is False:
+            if self._data is None:
+                self._content = b''
+            else:
+                self._content = json.dumps(self._data).encode('utf-8')
+        return self._content
+
+
+def read_response(response, pool):
+    """Read and decode the JSON body of a streamed response using
+    a pooled buffer.
+
+    :param object response: a `requests` response made with `stream=True`.
+    :param object pool: :class:`BufferPool` instance.
+    :rtype: BufferedResponse
+    """
+    length = response.headers.get('Content-Length')
+    encoding = response.headers.get('Content-Encoding', 'identity')
+    buffer = pool.acquire(int(length) if length else None)
+    try:
+        if encoding.lower() == 'identity':
+            size = read_into(response.raw, buffer)
+        else:
+            # `readinto` returns the body as sent: let urllib3 decode
+            # it, in chunks of any size
+            size = copy_into(response.raw.stream(
+                64 * 1024, decode_content=True), buffer)
+        with memoryview(buffer) as view, view[:size] as body:
+            text = str(body, response.encoding or 'utf-8')
+    finally:
+        pool.release(buffer)
+        response.close()
+
+    try:
+        data = json.loads(text) if text else None
+    except ValueError as error:
+        return BufferedResponse.from_response(response, None, error)
+    return BufferedResponse.from_response(response, data)
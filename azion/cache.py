@@ -0,0 +1,264 @@
+"""Read cache for configurations and origins.
+
+Decoded JSON payloads of GET requests are cached, and models are built
+from them on every read. Besides a plain TTL, the cache supports:
+
+* stale-while-revalidate: once an entry expires, it is still served
+  for `stale_while_revalidate` seconds while a background refresh
+  fetches a new one;
+* stale-if-error: when the API answers 5xx or is unreachable, or a
+  circuit breaker or bulkhead rejects the call, an expired entry is
+  served for up to `stale_if_error` seconds past its TTL instead of
+  failing.
+
+A value loaded while its key was invalidated, by a write of this
+process, is returned but not stored: it may predate the write.
+
+Entries live in a backend. :class:`MemoryBackend` keeps them in the
+process; other backends only need to implement the same interface.
+See :mod:`azion.shared` and :mod:`azion.remote`.
+"""
+import concurrent.futures
+import hashlib
+import json
+import threading
+import time
+
+from azion import forks
+from azion.concurrency import is_overload
+from azion.exceptions import BulkheadFull, CircuitOpen
+
+
+def serves_stale(error):
+    """Whether an expired entry may be served instead of raising
+    `error`: the API is overloaded, or calls to it fail fast."""
+    return is_overload(error) or isinstance(
+        error, (CircuitOpen, BulkheadFull))
+
+
+def cache_key(url, token=None):
+    """Return the cache key of a URL requested with a given token.
+
+    The token is hashed, so it never appears in shared backends.
+    """
+    if not token:
+        return url
+    digest = hashlib.sha1(token.encode('utf-8')).hexdigest()[:16]
+    return f'{digest}:{url}'
+
+
+class MemoryBackend(object):
+    """Keep cache entries in a dict of the current process.
+
+    Every backend implements `get`, `set` and `delete`. Entries are
+    `(stored_at, value)` tuples, where `value` is decoded JSON.
+
+    Values are kept encoded, as other backends do, so every read
+    returns new objects: callers changing a result, or a model built
+    from it, never change the cache.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+        forks.register(self)
+
+    def after_fork(self):
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Return the `(stored_at, value)` entry of a key, or `None`."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return entry[0], json.loads(entry[1])
+
+    def get_many(self, keys):
+        """Return the entries of several keys, `None` for missing ones.
+        Remote backends fetch them in a single round trip."""
+        return [self.get(key) for key in keys]
+
+    def set(self, key, stored_at, value, ttl=None):
+        """Store an entry. `ttl` is how long the backend should keep
+        it, a hint for backends able to expire entries."""
+        encoded = json.dumps(value, separators=(',', ':'))
+        with self.lock:
+            self.entries[key] = (stored_at, encoded)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class Cache(object):
+    """Cache of decoded API payloads.
+
+    .. code-block:: python
+
+        cache = Cache(ttl=60, stale_while_revalidate=300,
+                      stale_if_error=3600)
+        azion = Azion(token, cache=cache)
+
+    :param object backend: where entries are stored.
+        Default to a :class:`MemoryBackend`.
+    :param float ttl: seconds an entry is fresh.
+    :param float stale_while_revalidate: seconds past the TTL an
+        entry is served while being refreshed in background.
+    :param float stale_if_error: seconds past the TTL an entry is
+        served when the API fails.
+    """
+
+    def __init__(self, backend=None, ttl=60, stale_while_revalidate=0,
+                 stale_if_error=0, clock=time.time):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.clock = clock
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix='azion-cache')
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        # Keys being loaded, and their generation bumped by
+        # invalidations, so a load started before one is not stored
+        # after it. Keys are dropped once no load is in flight.
+        self.loading = {}
+        self.generations = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.errors_served = 0
+        forks.register(self)
+
+    def after_fork(self):
+        """Replace the refresh thread pool, whose workers only exist
+        in the parent process, and forget its refreshes."""
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix='azion-cache')
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.loading = {}
+        self.generations = {}
+
+    @property
+    def retention(self):
+        """How long the backend must keep an entry."""
+        return self.ttl + max(self.stale_while_revalidate,
+                              self.stale_if_error)
+
+    def store(self, key, value):
+        self.backend.set(key, self.clock(), value, self.retention)
+
+    def invalidate(self, key):
+        with self.lock:
+            if key in self.loading:
+                self.generations[key] = self.generations.get(key, 0) + 1
+        self.backend.delete(key)
+
+    def get_many(self, keys):
+        """Return the fresh cached values of several keys.
+
+        :param list keys: cache keys, see :func:`cache_key`.
+        :returns: dict of the keys found to their value.
+        """
+        keys = list(keys)
+        get_many = getattr(self.backend, 'get_many', None)
+        if get_many is not None:
+            entries = get_many(keys)
+        else:
+            entries = [self.backend.get(key) for key in keys]
+
+        now = self.clock()
+        values = {}
+        for key, entry in zip(keys, entries):
+            if entry is not None and now - entry[0] <= self.ttl:
+                values[key] = entry[1]
+        self.hits += len(values)
+        self.misses += len(keys) - len(values)
+        return values
+
+    def fetch(self, key, loader):
+        """Return the cached value of `key`, calling `loader` to
+        fetch it when missing or expired.
+
+        :param str key: cache key, see :func:`cache_key`.
+        :param callable loader: function returning the fresh value.
+        """
+        entry = self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+            return self._load(key, loader)
+
+        stored_at, value = entry
+        age = self.clock() - stored_at
+        if age <= self.ttl:
+            self.hits += 1
+            return value
+        if age <= self.ttl + self.stale_while_revalidate:
+            self.stale_hits += 1
+            self._refresh_in_background(key, loader)
+            return value
+
+        self.misses += 1
+        try:
+            return self._load(key, loader)
+        except Exception as error:
+            if (serves_stale(error) and
+                    age <= self.ttl + self.stale_if_error):
+                self.errors_served += 1
+                return value
+            raise
+
+    def _load(self, key, loader):
+        with self.lock:
+            self.loading[key] = self.loading.get(key, 0) + 1
+            generation = self.generations.get(key, 0)
+        try:
+            value = loader()
+            if self.generations.get(key, 0) == generation:
+                self.store(key, value)
+                # Invalidated while storing: the entry may be outdated
+                if self.generations.get(key, 0) != generation:
+                    self.backend.delete(key)
+            return value
+        finally:
+            with self.lock:
+                self.loading[key] -= 1
+                if not self.loading[key]:
+                    del self.loading[key]
+                    self.generations.pop(key, None)
+
+    def _refresh_in_background(self, key, loader):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+        self.executor.submit(self._refresh, key, loader)
+
+    def _refresh(self, key, loader):
+        try:
+            self._load(key, loader)
+        except Exception:
+            # The stale entry keeps being served until it is too old
+            pass
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def stats(self):
+        """Return cache metrics.
+
+        :rtype: dict
+        """
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'errors_served': self.errors_served,
+        }
@@ -1,11 +1,37 @@
-"""Client to access and interact with Azion's API."""
+"""Client to access and interact with Azion's API.
+
+Thread and fork safety
+======================
+
+One :class:`Azion` instance, and its :class:`Session`, may be shared
+by any number of threads. The connection pool is thread-safe and the
+authorization token is replaced atomically by
+:meth:`Azion.login`. Options meant for a single thread, like a
+timeout, are set with :meth:`Session.thread_options` instead of
+session attributes, which every thread sees.
+
+Connection pools are not shared with child processes: after
+`os.fork`, every session of the child starts with empty pools, so a
+TLS stream is never used by two processes. Threads of the parent do
+not exist in the child, so thread pools (:attr:`Azion.submit`,
+hedging, cache refreshes) are recreated, and so are the locks and
+counters of the limiter, breakers and caches. See :mod:`azion.forks`.
+"""
+import contextlib
+import json
+import threading
+
 import requests
 
 from azion.__metadata__ import __version__ as version
-from azion.models import (
-    Configuration, Origin, Token, as_boolean,
-    decode_json, filter_none, instance_from_data, many_of)
-from azion.responses import handle_multi_status
+from azion import forks, protocol, provisioning
+from azion.buffers import encode_json_into, read_response
+from azion.cache import cache_key
+from azion.compression import accept_encoding, compress
+from azion.concurrency import endpoint_key
+from azion.connections import DNSCacheAdapter, warmup
+from azion.futures import Submitter
+from azion.singleflight import Group
 
 
 class AuthToken(requests.auth.AuthBase):
@@ -25,20 +51,211 @@ class AuthToken(requests.auth.AuthBase):
 
 
 class Session(requests.Session):
-    auth = None
+    pool_maxsize = requests.adapters.DEFAULT_POOLSIZE
 
-    def __init__(self):
+    def __init__(self, pool_maxsize=None, buffer_pool=None,
+                 compress_threshold=None, request_encoding='gzip',
+                 dns_cache=None):
+        """
+        :param int pool_maxsize: Maximum number of connections kept
+            open to the API. Default to `requests` default pool size.
+        :param object buffer_pool: :class:`~azion.buffers.BufferPool`
+            used to encode JSON request bodies and read JSON responses
+            with fewer copies. Disabled by default.
+        :param int compress_threshold: Compress request bodies of at
+            least this many bytes. Default to `None`, which disables
+            request compression.
+        :param str request_encoding: Encoding used to compress request
+            bodies: `gzip`, `br` or `zstd`. Default to gzip.
+        :param object dns_cache: :class:`~azion.connections.DNSCache`
+            used to resolve the API host. Disabled by default.
+        """
         super(Session, self).__init__()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.buffer_pool = buffer_pool
+        self.compress_threshold = compress_threshold
+        self.request_encoding = request_encoding
+        self.dns_cache = dns_cache
+        if pool_maxsize:
+            self.pool_maxsize = pool_maxsize
+        if pool_maxsize or dns_cache is not None:
+            adapter = self.create_adapter(
+                self.pool_maxsize, pool_connections=self.pool_maxsize)
+            self.mount('https://', adapter)
+            self.mount('http://', adapter)
         self.headers.update({
             'Accept': 'application/json; version=1',
             'Accept-Charset': 'utf-8',
+            'Accept-Encoding': accept_encoding(),
             'Content-Type': 'application/json',
             'User-Agent': f'azion-python/{version}'
         })
         self.base_url = 'https://api.azion.net'
+        forks.register(self)
+
+    def request(self, method, url, **kwargs):
+        """Send a request.
+
+        Options set by :meth:`thread_options` in the current thread
+        are used when not passed.
+
+        When a buffer pool is set, JSON bodies are encoded into a
+        pooled buffer and the response is streamed into another one.
+        See :mod:`azion.buffers`.
+
+        When `compress_threshold` is set, bodies of at least that many
+        bytes are compressed with `request_encoding`.
+        """
+        options = getattr(self._local, 'options', None)
+        if options:
+            kwargs = self._with_thread_options(options, kwargs)
+        pool = self.buffer_pool
+        if kwargs.get('stream') or (
+                pool is None and self.compress_threshold is None):
+            return super(Session, self).request(method, url, **kwargs)
+
+        body = kwargs.pop('json', None)
+        buffer = None
+        if body is not None and kwargs.get('data') is None:
+            if pool is not None:
+                buffer = pool.acquire()
+                # The buffer may grow while encoding, so it is only
+                # exported once the body is written
+                size = encode_json_into(body, buffer)
+                body = memoryview(buffer)[:size]
+            else:
+                body = json.dumps(body, separators=(',', ':')).encode()
+            kwargs['data'] = body
+        elif body is not None:
+            kwargs['json'] = body
+
+        kwargs['stream'] = pool is not None
+        try:
+            response = self.send_compressed(method, url, **kwargs)
+        finally:
+            if buffer is not None:
+                body.release()
+                pool.release(buffer)
+        if buffer is not None:
+            response.request.body = None
+        if pool is None:
+            return response
+        return read_response(response, pool)
+
+    def send_compressed(self, method, url, **kwargs):
+        """Send a request, compressing its body when it is large enough.
+
+        If the API answers `415 Unsupported Media Type`, compression
+        is disabled for this session and the request is sent again
+        without it.
+        """
+        data = kwargs.get('data')
+        threshold = self.compress_threshold
+        if (threshold is None or
+                not isinstance(data, (bytes, bytearray, memoryview)) or
+                len(data) < threshold):
+            return super(Session, self).request(method, url, **kwargs)
+
+        headers = dict(kwargs.get('headers') or {})
+        headers['Content-Encoding'] = self.request_encoding
+        response = super(Session, self).request(
+            method, url, **dict(
+                kwargs, headers=headers,
+                data=compress(data, self.request_encoding)))
+        if response.status_code != 415:
+            return response
+
+        response.close()
+        self.compress_threshold = None
+        return super(Session, self).request(method, url, **kwargs)
+
+    @contextlib.contextmanager
+    def thread_options(self, **options):
+        """Set request options for the current thread only.
+
+        .. code-block:: python
+
+            with azion.session.thread_options(timeout=5):
+                azion.purge_url(urls)
+
+        Accepts the keyword arguments of :meth:`requests.Session.request`.
+        Headers are merged with the headers of each request, other
+        options are used when a request does not set them. Nested
+        blocks add to the options of the enclosing block.
+        """
+        previous = getattr(self._local, 'options', None) or {}
+        current = dict(previous, **options)
+        if 'headers' in previous and 'headers' in options:
+            current['headers'] = dict(previous['headers'],
+                                      **options['headers'])
+        self._local.options = current
+        try:
+            yield self
+        finally:
+            self._local.options = previous
+
+    def bind_thread_options(self, fn):
+        """Return a function calling `fn` with the options set for the
+        current thread, so they also apply when it runs in another
+        thread, e.g. a worker of :class:`~azion.hedging.HedgePolicy`.
+        """
+        options = getattr(self._local, 'options', None) or {}
+
+        def bound(*args, **kwargs):
+            with self.thread_options(**options):
+                return fn(*args, **kwargs)
+        return bound
+
+    @staticmethod
+    def _with_thread_options(options, kwargs):
+        merged = dict(options, **kwargs)
+        if 'headers' in options and kwargs.get('headers'):
+            merged['headers'] = dict(options['headers'], **kwargs['headers'])
+        return merged
+
+    def after_fork(self):
+        """Drop the connections inherited from the parent process.
+
+        Called in child processes after `os.fork`. The pools are
+        replaced without closing their connections, which still
+        belong to the parent.
+        """
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        for adapter in self.adapters.values():
+            adapter.init_poolmanager(
+                adapter._pool_connections, adapter._pool_maxsize,
+                block=adapter._pool_block)
+            adapter.proxy_manager = {}
+
+    def create_adapter(self, pool_maxsize, pool_connections=1):
+        """Return a transport adapter keeping up to `pool_maxsize`
+        connections per host, resolving hosts through the DNS cache
+        of this session if any."""
+        if self.dns_cache is not None:
+            return DNSCacheAdapter(
+                self.dns_cache, pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize)
+        return requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+
+    def warmup(self, n_connections=None):
+        """Open connections to the API ahead of the first requests.
+
+        :param int n_connections: number of connections to open.
+            Default to the size of the connection pool.
+        :return: number of connections open in the pool.
+        """
+        return warmup(self, self.base_url, n_connections or self.pool_maxsize)
 
     def token_auth(self, token):
-        self.auth = AuthToken(token)
+        """Authorize the next requests with `token`.
+
+        Requests already sent by other threads keep the previous one.
+        """
+        with self._lock:
+            self.auth = AuthToken(token)
 
     def build_url(self, *args, **kwargs):
         """Build a URL depending on the `base_url`
@@ -62,15 +279,40 @@ class Azion(object):
         azion = login(auth.token)
 
     Now you can use all API resources.
+
+    An instance may be shared by threads, and is reset in child
+    processes after `os.fork`. See :mod:`azion.client`.
     """
 
-    def __init__(self, token=None, session=None):
+    def __init__(self, token=None, session=None, limiter=None,
+                 breakers=None, hedging=None, coalesce=False, cache=None):
         """Create a new Azion API instance.
 
         :param str token: Authorization token. It can be
             obtained from :func:`~azion.client.Azion.token_auth`
+        :param object limiter: :class:`~azion.concurrency.AdaptiveLimiter`
+            limiting the HTTP requests in flight, e.g. for bulk
+            operations. Unlimited by default.
+        :param object breakers: :class:`~azion.breaker.Breakers` guarding
+            every call with a circuit breaker per endpoint family.
+            Disabled by default.
+        :param object hedging: :class:`~azion.hedging.HedgePolicy` used
+            to hedge GET requests. Disabled by default.
+        :param bool coalesce: share one HTTP request between identical
+            GET requests in flight. Default to False.
+        :param object cache: :class:`~azion.cache.Cache` serving
+            GET requests. Writes invalidate the affected entries.
+            Disabled by default.
         """
         self.session = session or Session()
+        self.limiter = limiter
+        self.breakers = breakers
+        self.hedging = hedging
+        self.singleflight = Group() if coalesce else None
+        self.cache = cache
+        self._submitter = None
+        self._lock = threading.Lock()
+        forks.register(self)
 
         if token:
             self.login(token)
@@ -83,6 +325,130 @@ class Azion(object):
         """
         self.session.token_auth(token)
 
+    @property
+    def submit(self):
+        """Non-blocking counterparts of every method, returning
+        :class:`concurrent.futures.Future` objects.
+
+        .. code-block:: python
+
+            future = azion.submit.purge_url(urls)
+            result = future.result()
+
+        See :class:`~azion.futures.Submitter`.
+        """
+        with self._lock:
+            if self._submitter is None:
+                self._submitter = Submitter(self)
+            return self._submitter
+
+    def warmup(self, n_connections=None):
+        """Open keep-alive connections to the API, so the first
+        requests do not wait for DNS, TCP and TLS handshakes.
+
+        :param int n_connections: number of connections to open.
+            Default to the size of the connection pool.
+        :return: number of connections open in the pool.
+        """
+        return self.session.warmup(n_connections)
+
+    def after_fork(self):
+        """Drop the thread pool of :attr:`submit`, whose threads only
+        exist in the parent process. Called in child processes after
+        `os.fork`."""
+        self._submitter = None
+        self._lock = threading.Lock()
+
+    def close(self):
+        """Stop background workers and close pooled connections."""
+        with self._lock:
+            submitter, self._submitter = self._submitter, None
+        if submitter is not None:
+            submitter.shutdown()
+        self.session.close()
+
+    def request(self, request, **options):
+        """Execute a request described by :mod:`azion.protocol`
+        and return its result.
+
+        :param object request:
+            :class:`~azion.protocol.Request` instance.
+
+        Other keyword arguments (`raw`, `fields`, `lazy`) tell how to
+        build the result, see :meth:`~azion.protocol.Request.build`.
+        """
+        if request.method != 'get':
+            data = self._guarded(request)
+            self._invalidate(request)
+            return request.build(data, **options)
+        if self.cache is not None:
+            # Refreshes may run in a background thread
+            data = self.cache.fetch(
+                self._cache_key(request.path),
+                self.session.bind_thread_options(
+                    lambda: self._coalesced(request)))
+        else:
+            data = self._coalesced(request)
+        return request.build(data, **options)
+
+    def cached(self, requests, **options):
+        """Return the results of GET requests fresh in the cache,
+        looked up at once: a single round trip to a remote backend.
+
+        :param list requests:
+            :class:`~azion.protocol.Request` instances.
+        :returns: dict of the positions of the requests found to
+            their result, built as in :meth:`request`.
+        """
+        if self.cache is None:
+            return {}
+        keys = [self._cache_key(request.path) for request in requests]
+        values = self.cache.get_many(keys)
+        return dict(
+            (index, request.build(values[key], **options))
+            for index, (request, key) in enumerate(zip(requests, keys))
+            if key in values)
+
+    def _cache_key(self, path):
+        return cache_key(self.session.build_url(*path),
+                         getattr(self.session.auth, 'token', None))
+
+    def _invalidate(self, request):
+        if self.cache is None:
+            return
+        for path in request.invalidates:
+            self.cache.invalidate(self._cache_key(path))
+
+    def _coalesced(self, request):
+        if self.singleflight is None:
+            return self._read(request)
+        return self.singleflight.do(
+            self._cache_key(request.path), lambda: self._read(request))
+
+    def _read(self, request):
+        if self.hedging is not None:
+            # Both attempts run in the hedging pool
+            return self.hedging.run(self.session.bind_thread_options(
+                lambda: self._guarded(request)))
+        return self._guarded(request)
+
+    def _guarded(self, request):
+        if self.breakers is None:
+            return self._send(request)
+        with self.breakers.guard(request.path):
+            return self._send(request)
+
+    def _send(self, request):
+        """Send the request and return the decoded response."""
+        url = self.session.build_url(*request.path)
+        send = getattr(self.session, request.method)
+        if self.limiter is None:
+            return request.decode(send(url, **request.options()))
+        with self.limiter.slot(
+                key=endpoint_key(request.method, request.path)):
+            response = send(url, **request.options())
+            return request.decode(response)
+
     def authorize(self, username, password):
         """Obtain a fresh token to handle Azion's API protected calls.
 
@@ -91,28 +457,30 @@ class Azion(object):
         :param str password:
             password
         """
-        url = self.session.build_url('tokens')
-        response = self.session.post(url, data={}, auth=(username, password))
-        json = decode_json(response, 201)
-        return instance_from_data(Token, json)
+        return self.request(protocol.authorize(username, password))
 
-    def get_configuration(self, configuration_id):
+    def get_configuration(self, configuration_id, raw=False, fields=None,
+                          lazy=False):
         """Retrieve a configuration.
 
         :param int configuration_id: configuration id
+        :param bool raw: return the decoded JSON object instead of
+            a :class:`~azion.models.Configuration`.
+        :param tuple fields: only load these fields, e.g.
+            `('id', 'domain_name')`.
+        :param bool lazy: return a proxy converting fields only when
+            they are accessed.
         """
-        url = self.session.build_url(
-            'content_delivery', 'configurations', configuration_id)
-        response = self.session.get(url)
-        json = decode_json(response, 200)
-        return instance_from_data(Configuration, json)
-
-    def list_configurations(self):
-        """List configurations."""
-        url = self.session.build_url('content_delivery', 'configurations')
-        response = self.session.get(url)
-        json = decode_json(response, 200)
-        return many_of(Configuration, json)
+        return self.request(protocol.get_configuration(configuration_id),
+                            raw=raw, fields=fields, lazy=lazy)
+
+    def list_configurations(self, raw=False, fields=None, lazy=False):
+        """List configurations.
+
+        `raw`, `fields` and `lazy` work as in :func:`get_configuration`.
+        """
+        return self.request(protocol.list_configurations(),
+                            raw=raw, fields=fields, lazy=lazy)
 
     def create_configuration(self, name, origin_address, origin_host_header,
                              cname=None, cname_access_only=False,
@@ -148,23 +516,18 @@ class Azion(object):
         .. _Digital Certificates:
             https://www.azion.com.br/developers/documentacao/produtos/content-delivery/digital-certificates/
         """
-        data = {
-            'name': name, 'origin_address': origin_address,
-            'origin_host_header': origin_host_header,
-            'cname': cname, 'cname_access_only': cname_access_only,
-            'delivery_protocol': delivery_protocol,
-            'digital_certificate': digital_certificate,
-            'origin_protocol_policy': origin_protocol_policy,
-            'browser_cache_settings': browser_cache_settings,
-            'browser_cache_settings_maximum_ttl': browser_cache_settings_maximum_ttl,
-            'cdn_cache_settings': cdn_cache_settings,
-            'cdn_cache_settings_maximum_ttl': cdn_cache_settings_maximum_ttl
-        }
-
-        url = self.session.build_url('content_delivery', 'configurations')
-        response = self.session.post(url, json=filter_none(data))
-        json = decode_json(response, 201)
-        return instance_from_data(Configuration, json)
+        return self.request(protocol.create_configuration(
+            name=name, origin_address=origin_address,
+            origin_host_header=origin_host_header,
+            cname=cname, cname_access_only=cname_access_only,
+            delivery_protocol=delivery_protocol,
+            digital_certificate=digital_certificate,
+            origin_protocol_policy=origin_protocol_policy,
+            browser_cache_settings=browser_cache_settings,
+            browser_cache_settings_maximum_ttl=(
+                browser_cache_settings_maximum_ttl),
+            cdn_cache_settings=cdn_cache_settings,
+            cdn_cache_settings_maximum_ttl=cdn_cache_settings_maximum_ttl))
 
     def delete_configuration(self, configuration_id):
         """Delete a configuration.
@@ -172,10 +535,7 @@ class Azion(object):
         :param int configuration_id:
             Configuration ID.
         """
-        url = self.session.build_url(
-            'content_delivery', 'configurations', configuration_id)
-        response = self.session.delete(url)
-        return as_boolean(response, 204)
+        return self.request(protocol.delete_configuration(configuration_id))
 
     def partial_update_configuration(self, configuration_id, name=None,
                                      cname=None, cname_access_only=None,
@@ -204,21 +564,12 @@ class Azion(object):
         .. _Digital Certificates:
             https://www.azion.com.br/developers/documentacao/produtos/content-delivery/digital-certificates/
         """
-
-        data = {
-            'name': name,
-            'cname': cname, 'cname_access_only': cname_access_only,
-            'delivery_protocol': delivery_protocol,
-            'digital_certificate': digital_certificate,
-            'rawlogs': rawlogs,
-            'active': active
-        }
-
-        url = self.session.build_url(
-            'content_delivery', 'configurations', configuration_id)
-        response = self.session.patch(url, json=filter_none(data))
-        json = decode_json(response, 200)
-        return instance_from_data(Configuration, json)
+        return self.request(protocol.partial_update_configuration(
+            configuration_id, name=name,
+            cname=cname, cname_access_only=cname_access_only,
+            delivery_protocol=delivery_protocol,
+            digital_certificate=digital_certificate,
+            rawlogs=rawlogs, active=active))
 
     def replace_configuration(self, configuration_id, name=None,
                               cname=None, cname_access_only=None,
@@ -250,21 +601,12 @@ class Azion(object):
         .. _Digital Certificates:
             https://www.azion.com.br/developers/documentacao/produtos/content-delivery/digital-certificates/
         """
-
-        data = {
-            'name': name,
-            'cname': cname, 'cname_access_only': cname_access_only,
-            'delivery_protocol': delivery_protocol,
-            'digital_certificate': digital_certificate,
-            'rawlogs': rawlogs,
-            'active': active
-        }
-
-        url = self.session.build_url(
-            'content_delivery', 'configurations', configuration_id)
-        response = self.session.put(url, json=filter_none(data))
-        json = decode_json(response, 200)
-        return instance_from_data(Configuration, json)
+        return self.request(protocol.replace_configuration(
+            configuration_id, name=name,
+            cname=cname, cname_access_only=cname_access_only,
+            delivery_protocol=delivery_protocol,
+            digital_certificate=digital_certificate,
+            rawlogs=rawlogs, active=active))
 
     def purge_url(self, urls, method='delete'):
         """Purge content of the given URLs inside
@@ -276,11 +618,7 @@ class Azion(object):
             How the content will be purged.
             Default to 'delete'.
         """
-        url = self.session.build_url('purge', 'url')
-        response = self.session.post(
-            url, json={'urls': urls, 'method': method})
-        data = decode_json(response, 207)
-        return handle_multi_status(data, 'urls')
+        return self.request(protocol.purge_url(urls, method))
 
     def purge_cache_key(self, urls, method='delete'):
         """Purge content of the given URLs inside
@@ -293,10 +631,7 @@ class Azion(object):
             How the content will be purged.
             Default to 'delete'.
         """
-        url = self.session.build_url('purge', 'cachekey')
-        response = self.session.post(
-            url, json={'urls': urls, 'method': method})
-        return as_boolean(response, 201)
+        return self.request(protocol.purge_cache_key(urls, method))
 
     def purge_wildcard(self, url, method='delete'):
         """Purge content of the given URL.
@@ -309,22 +644,19 @@ class Azion(object):
             How the content will be purged.
             Default to 'delete'.
         """
-        api_url = self.session.build_url('purge', 'wildcard')
-        response = self.session.post(
-            api_url, json={'urls': [url], 'method': method})
-        return as_boolean(response, 201)
+        return self.request(protocol.purge_wildcard(url, method))
 
-    def list_origins(self, configuration_id):
+    def list_origins(self, configuration_id, raw=False, fields=None,
+                     lazy=False):
         """List origins of the given configuration.
 
         :param int configuration_id:
             Configuration ID
+
+        `raw`, `fields` and `lazy` work as in :func:`get_configuration`.
         """
-        url = self.session.build_url(
-            'content_delivery', 'configurations', configuration_id, 'origins')
-        response = self.session.get(url)
-        data = decode_json(response, 200)
-        return many_of(Origin, data)
+        return self.request(protocol.list_origins(configuration_id),
+                            raw=raw, fields=fields, lazy=lazy)
 
     def create_origin(self, configuration_id, name, origin_type,
                       method, host_header,
@@ -332,18 +664,23 @@ class Azion(object):
                       connection_timeout, timeout_between_bytes):
         """Create an origin.
         """
-        data = {
-            'name': name,
-            'origin_type': origin_type,
-            'method': method,
-            'host_header': host_header,
-            'origin_protocol_policy': origin_protocol_policy,
-            'addresses': addresses,
-            'connection_timeout': connection_timeout,
-            'timeout_between_bytes': timeout_between_bytes
-        }
-        url = self.session.build_url(
-            'content_delivery', 'configurations', configuration_id, 'origins')
-        response = self.session.post(url, json=filter_none(data))
-        data = decode_json(response, 201)
-        return instance_from_data(Origin, data)
+        return self.request(protocol.create_origin(
+            configuration_id, name=name, origin_type=origin_type,
+            method=method, host_header=host_header,
+            origin_protocol_policy=origin_protocol_policy,
+            addresses=addresses, connection_timeout=connection_timeout,
+            timeout_between_bytes=timeout_between_bytes))
+
+    def create_origins(self, specs, checkpoint=None, max_workers=8):
+        """Create many origins concurrently.
+
+        :param list specs: arguments of :func:`create_origin`, as dicts.
+        :param str checkpoint: path of a file recording the created
+            origins, so an interrupted call can be resumed.
+        :param int max_workers: maximum number of configurations
+            provisioned at once.
+
+        See :func:`~azion.provisioning.create_origins`.
+        """
+        return provisioning.create_origins(
+            self, specs, checkpoint=checkpoint, max_workers=max_workers)
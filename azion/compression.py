@@ -0,0 +1,68 @@
+"""Content encodings supported by the client.
+
+Responses are decoded by urllib3, which understands brotli and zstd
+when their libraries are installed and it is recent enough: zstd needs
+urllib3 2. Request bodies can be compressed too, see
+:class:`~azion.client.Session`.
+"""
+import gzip
+
+import urllib3.response
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+def available_encodings():
+    """Return the encodings this client can decode, preferred first.
+
+    Only those urllib3 decodes are advertised, whatever libraries
+    are installed.
+    """
+    encodings = []
+    if getattr(urllib3.response, 'HAS_ZSTD', False):
+        encodings.append('zstd')
+    if getattr(urllib3.response, 'brotli', None) is not None:
+        encodings.append('br')
+    encodings.extend(['gzip', 'deflate'])
+    return encodings
+
+
+def accept_encoding():
+    """Value of the `Accept-Encoding` header."""
+    return ', '.join(available_encodings())
+
+
+def _zstd(data):
+    return zstandard.ZstdCompressor().compress(data)
+
+
+compressors = {
+    'gzip': lambda data: gzip.compress(data, compresslevel=6),
+    'br': lambda data: brotli.compress(data),
+    'zstd': _zstd,
+}
+libraries = {'gzip': gzip, 'br': brotli, 'zstd': zstandard}
+
+
+def compress(data, encoding='gzip'):
+    """Compress a request body.
+
+    :param bytes data: body to be compressed. Any bytes-like
+        object is accepted.
+    :param str encoding: one of `gzip`, `br` or `zstd`.
+    :rtype: bytes
+    """
+    if libraries.get(encoding) is None:
+        raise ValueError(f'Unsupported content encoding: {encoding}')
+    return compressors[encoding](data)
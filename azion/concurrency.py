@@ -0,0 +1,223 @@
+"""Adaptive concurrency limit for bulk operations.
+
+A fixed number of workers is either too low (slow) or too high
+(`TooManyRequests` and latency spikes). :class:`AdaptiveLimiter` finds
+the limit at run time using AIMD (additive increase, multiplicative
+decrease), the same approach TCP uses for its congestion window:
+
+* every window of successful calls with healthy latency raises the
+  limit by `increase`;
+* a 429, a 5xx, a connection error or latency above
+  `latency_tolerance` times the baseline multiplies it by `decrease`.
+
+Endpoints are not equally fast, so calls are measured against the
+baseline of their own endpoint (see :func:`endpoint_key`): a slow
+purge does not make a cheap GET look inflated.
+
+The limiter is opt-in. Given one, :class:`~azion.client.Azion` takes
+a slot around every HTTP request it sends, so only network round trips
+are measured: answers served by the cache or shared with identical
+calls never wait for a slot nor skew the latency baselines.
+"""
+import contextlib
+import threading
+import time
+
+import requests
+
+from azion import forks
+from azion.exceptions import AzionError, QueueFull, TooManyRequests
+
+
+def is_overload(error):
+    """Whether an error signals that the API is overloaded."""
+    if isinstance(error, TooManyRequests):
+        return True
+    if isinstance(error, AzionError):
+        return error.status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+def endpoint_key(method, path):
+    """Return the key of an endpoint, IDs in its path left out.
+
+    >>> endpoint_key('get', ('content_delivery', 'configurations', 1))
+    'get content_delivery/configurations/{id}'
+    """
+    segments = ('{id}' if isinstance(segment, int) else str(segment)
+                for segment in path)
+    return f'{method} ' + '/'.join(segments)
+
+
+class AdaptiveLimiter(object):
+    """Concurrency limiter driven by AIMD.
+
+    .. code-block:: python
+
+        limiter = AdaptiveLimiter()
+        with limiter.slot(key='get purge'):
+            response = session.get(url)
+
+    .. attribute:: limit
+
+        Current concurrency limit, exposed as a metric.
+
+    :param int initial: initial limit.
+    :param int minimum: lowest limit.
+    :param int maximum: highest limit.
+    :param float increase: added to the limit after a window of
+        healthy calls.
+    :param float decrease: factor applied to the limit on overload.
+    :param float latency_tolerance: latency above this many times the
+        baseline latency of the endpoint counts as overload.
+    :param float smoothing: weight of new samples in the latency
+        moving average.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=64, increase=1,
+                 decrease=0.5, latency_tolerance=2.0, smoothing=0.2,
+                 clock=time.monotonic):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.clock = clock
+
+        self.current = float(initial)
+        self.in_flight = 0
+        # Smoothed and baseline latencies, by endpoint key
+        self.latencies = {}
+        self.baselines = {}
+        self.last_decrease = None
+        self.condition = threading.Condition()
+        self.local = threading.local()
+
+        self.successes = 0
+        self.overloads = 0
+        forks.register(self)
+
+    @property
+    def limit(self):
+        return max(self.minimum, int(self.current))
+
+    def acquire(self, timeout=None):
+        """Wait until a call may start.
+
+        :raises: :class:`~azion.exceptions.QueueFull` when no slot
+            is released within `timeout`.
+        """
+        with self.condition:
+            if not self.condition.wait_for(
+                    lambda: self.in_flight < self.limit, timeout):
+                raise QueueFull(f'Concurrency limit {self.limit} reached')
+            self.in_flight += 1
+
+    def release(self, latency=None, overload=False, key=None):
+        """Mark a call as finished and adapt the limit.
+
+        :param float latency: duration of the call, in seconds.
+        :param bool overload: whether the call failed because
+            the API is overloaded.
+        :param str key: endpoint of the call, whose baseline the
+            latency is compared to.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            if latency is not None:
+                self._observe(key, latency)
+                overload = overload or self._inflated(key, latency)
+            if overload:
+                self._decrease(key)
+            elif latency is not None:
+                self.successes += 1
+                self.current = min(
+                    self.maximum,
+                    self.current + self.increase / max(self.current, 1))
+            self.condition.notify_all()
+
+    def _observe(self, key, latency):
+        smoothed = self.latencies.get(key)
+        if smoothed is None:
+            smoothed = latency
+        else:
+            smoothed += self.smoothing * (latency - smoothed)
+        self.latencies[key] = smoothed
+        baseline = self.baselines.get(key)
+        if baseline is None or smoothed < baseline:
+            self.baselines[key] = smoothed
+        else:
+            # Let the baseline drift up slowly, so a lucky fast
+            # sample early on does not count as inflation forever.
+            self.baselines[key] = baseline + self.smoothing / 10 * (
+                smoothed - baseline)
+
+    def _inflated(self, key, latency):
+        baseline = self.baselines.get(key)
+        return (baseline is not None and
+                latency > baseline * self.latency_tolerance)
+
+    def _decrease(self, key):
+        # Calls started before the last decrease may fail too;
+        # react once per round trip instead of collapsing the limit.
+        now = self.clock()
+        cooldown = self.latencies.get(key) or 0
+        if (self.last_decrease is not None and
+                now - self.last_decrease < cooldown):
+            return
+        self.last_decrease = now
+        self.overloads += 1
+        self.current = max(self.minimum, self.current * self.decrease)
+
+    @contextlib.contextmanager
+    def slot(self, timeout=None, key=None):
+        """Hold a slot while the block runs, measuring its latency
+        and classifying its errors.
+
+        :param str key: endpoint called in the block, see
+            :func:`endpoint_key`.
+
+        Slots are reentrant: a thread already holding one does not
+        take another, and only the outermost block is measured.
+        """
+        if getattr(self.local, 'held', False):
+            yield
+            return
+        self.acquire(timeout)
+        self.local.held = True
+        started = self.clock()
+        try:
+            yield
+        except Exception as error:
+            if is_overload(error):
+                self.release(self.clock() - started, overload=True, key=key)
+            else:
+                self.release()
+            raise
+        else:
+            self.release(self.clock() - started, key=key)
+        finally:
+            self.local.held = False
+
+    def after_fork(self):
+        """Forget the calls of the parent process, which never
+        release their slots in the child."""
+        self.condition = threading.Condition()
+        self.local = threading.local()
+        self.in_flight = 0
+
+    def stats(self):
+        """Return current metrics of the limiter.
+
+        :rtype: dict
+        """
+        with self.condition:
+            return {
+                'limit': self.limit,
+                'in_flight': self.in_flight,
+                'latencies': dict(self.latencies),
+                'baselines': dict(self.baselines),
+                'successes': self.successes,
+                'overloads': self.overloads,
+            }
@@ -0,0 +1,207 @@
+"""Faster first requests: DNS caching and connection warm-up.
+
+After an idle period or a deploy, the first request of a worker pays
+for a DNS lookup, the TCP handshake and the TLS handshake before the
+API even sees it. Two tools remove that cost:
+
+* :class:`DNSCache` keeps resolved addresses for `ttl` seconds, and
+  :class:`DNSCacheAdapter` makes `requests` connect through it;
+* :func:`warmup` opens keep-alive connections ahead of time and
+  leaves them in the pool, ready for the next requests.
+
+TLS session resumption is not available: `urllib3` does not expose a
+way to reuse an `ssl.SSLSession` for new connections. Warm pooled
+connections avoid the handshake altogether instead.
+"""
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import (
+    ConnectTimeoutError, EmptyPoolError, NewConnectionError)
+
+from azion import forks
+
+
+class DNSCache(object):
+    """Cache of resolved host addresses.
+
+    .. code-block:: python
+
+        session = Session(dns_cache=DNSCache(ttl=300))
+
+    :param float ttl: seconds an address is kept.
+    :param callable resolver: function with the signature of
+        :func:`socket.getaddrinfo`.
+    """
+
+    def __init__(self, ttl=300, resolver=socket.getaddrinfo,
+                 clock=time.monotonic):
+        self.ttl = ttl
+        self.resolver = resolver
+        self.clock = clock
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        forks.register(self)
+
+    def after_fork(self):
+        self.lock = threading.Lock()
+
+    def resolve(self, host, port):
+        """Return the IP addresses of `host`, resolving it when
+        missing or expired."""
+        key = (host, port)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.clock() < entry[0]:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        infos = self.resolver(host, port, 0, socket.SOCK_STREAM)
+        addresses = []
+        for family, type, proto, canonname, sockaddr in infos:
+            if sockaddr[0] not in addresses:
+                addresses.append(sockaddr[0])
+        with self.lock:
+            self.entries[key] = (self.clock() + self.ttl, addresses)
+        return addresses
+
+    def invalidate(self, host, port):
+        with self.lock:
+            self.entries.pop((host, port), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Return cache metrics.
+
+        :rtype: dict
+        """
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hosts': len(self.entries)}
+
+
+class CachedDNSConnectionMixin(object):
+    """Connect to the address cached for the host, instead of
+    resolving it for every new connection.
+
+    Only the address connected to changes: the `Host` header, SNI
+    and certificate verification still use the host name.
+    """
+
+    dns_cache = None
+
+    def _new_conn(self):
+        """Connect to the first cached address accepting the
+        connection. When none does, the host is resolved again on
+        the next attempt."""
+        host = self._dns_host
+        addresses = self.dns_cache.resolve(host, self.port)
+        try:
+            for index, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    return super(CachedDNSConnectionMixin, self)._new_conn()
+                except (NewConnectionError, ConnectTimeoutError):
+                    if index == len(addresses) - 1:
+                        # The addresses may have changed
+                        self.dns_cache.invalidate(host, self.port)
+                        raise
+        finally:
+            self._dns_host = host
+
+
+class DNSCacheAdapter(requests.adapters.HTTPAdapter):
+    """Transport adapter whose connections resolve hosts through
+    a :class:`DNSCache`.
+
+    :param object dns_cache: :class:`DNSCache` instance.
+
+    Other keyword arguments are passed to
+    :class:`requests.adapters.HTTPAdapter`.
+    """
+
+    def __init__(self, dns_cache, **kwargs):
+        self.dns_cache = dns_cache
+        super(DNSCacheAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(DNSCacheAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': self._pool_class(HTTPConnectionPool, HTTPConnection),
+            'https': self._pool_class(HTTPSConnectionPool, HTTPSConnection),
+        }
+
+    def _pool_class(self, pool_class, connection_class):
+        connection = type(
+            f'Cached{connection_class.__name__}',
+            (CachedDNSConnectionMixin, connection_class),
+            {'dns_cache': self.dns_cache})
+        return type(f'Cached{pool_class.__name__}', (pool_class,),
+                    {'ConnectionCls': connection})
+
+    def __setstate__(self, state):
+        """Unpickled adapters rebuild their pool manager, and connect
+        through a fresh :class:`DNSCache` with default settings: the
+        cache of the pickled adapter is not part of its state."""
+        self.dns_cache = state.pop('dns_cache', None) or DNSCache()
+        super(DNSCacheAdapter, self).__setstate__(state)
+
+
+def connection_pool(session, url):
+    """Return the connection pool `session` uses for requests to `url`.
+    """
+    adapter = session.get_adapter(url)
+    request = session.prepare_request(requests.Request('GET', url))
+    if hasattr(adapter, 'get_connection_with_tls_context'):
+        return adapter.get_connection_with_tls_context(
+            request, session.verify, session.proxies, session.cert)
+    return adapter.get_connection(url, session.proxies)  # pragma: no cover
+
+
+def warmup(session, url, n_connections):
+    """Open up to `n_connections` connections to `url` concurrently
+    and leave them idle in the pool of `session`.
+
+    Connections that fail to open are skipped.
+
+    :return: number of connections open in the pool.
+    :rtype: int
+    """
+    pool = connection_pool(session, url)
+    connections = []
+    for _ in range(min(n_connections, pool.pool.maxsize)):
+        try:
+            connections.append(pool._get_conn())
+        except EmptyPoolError:
+            # Other connections are in use
+            break
+
+    def connect(connection):
+        if connection.sock is None:
+            connection.connect()
+
+    opened = 0
+    with ThreadPoolExecutor(max_workers=len(connections) or 1) as executor:
+        futures = [executor.submit(connect, connection)
+                   for connection in connections]
+        for connection, future in zip(connections, futures):
+            try:
+                future.result()
+            except Exception:
+                connection.close()
+                pool._put_conn(None)
+            else:
+                opened += 1
+                pool._put_conn(connection)
+    return opened
@@ -29,14 +29,19 @@ class AzionError(AzionException):
 
     .. attribute:: errors
 
-        List of errors generated from the response.
+        List of errors generated from the response, or `None`
+        when the response body is not JSON.
     """
 
     def __init__(self, response):
         super().__init__(self, response)
         self.response = response
         self.status_code = response.status_code
-        self.errors = response.json()
+        try:
+            self.errors = response.json()
+        except ValueError:
+            # Server errors are not always JSON encoded
+            self.errors = None
 
     def __repr__(self):
         return f'<{self.__class__.__name__} [{self.status_code}]>'
@@ -111,6 +116,49 @@ class TooManyRequests(AzionError):
     pass
 
 
+class ServerError(AzionError):
+    """Indicate that the server failed to fulfill a valid request
+    (any 5xx status code).
+
+    More info here: https://developer.mozilla.org/en-US/docs/Web/HTTP/Status#Server_error_responses
+    """
+    pass
+
+
+class QueueFull(AzionException):
+    """Indicate that too many calls are waiting to be executed and
+    no slot was released in time.
+    """
+    pass
+
+
+class CircuitOpen(AzionException):
+    """Indicate that calls to an endpoint family are failing fast
+    because its circuit breaker is open.
+    """
+    pass
+
+
+class BulkheadFull(AzionException):
+    """Indicate that an endpoint family already has as many calls
+    in flight as its bulkhead allows.
+    """
+    pass
+
+
+class ValidationError(AzionException):
+    """Indicate that a request payload is invalid and was not sent.
+
+    .. attribute:: errors
+
+        List of messages, one for every invalid field.
+    """
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = list(errors)
+
+
 error_handlers = {
     400: BadRequest,
     401: Unauthorized,
@@ -130,5 +178,7 @@ def handle_error(response):
     :param object response:
         requests Response object.
     """
-    handler = error_handlers.get(response.status_code)
+    status_code = response.status_code
+    default = ServerError if status_code >= 500 else AzionError
+    handler = error_handlers.get(status_code, default)
     return handler(response)
@@ -0,0 +1,371 @@
+"""Export the whole inventory (configurations, origins and addresses)
+to disk.
+
+Configurations are listed once and their origins are fetched
+concurrently. Every configuration is written as soon as its origins
+arrive, so only a bounded number of them live in memory at any time.
+
+Supported formats are NDJSON, CSV and, when `pyarrow` is installed,
+Parquet.
+"""
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from azion import protocol
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+
+CONFIGURATION_FIELDS = (
+    'id', 'name', 'domain_name', 'active', 'delivery_protocol',
+    'digital_certificate', 'cname', 'cname_access_only', 'rawlogs')
+ORIGIN_FIELDS = (
+    'id', 'name', 'origin_type', 'method', 'host_header',
+    'origin_protocol_policy', 'connection_timeout', 'timeout_between_bytes')
+ADDRESS_FIELDS = ('address', 'weight', 'server_role', 'is_active')
+
+
+def address_record(address):
+    """Convert an :class:`~azion.models.Address` to a plain dict."""
+    return address.to_dict()
+
+
+def origin_record(origin):
+    """Convert an :class:`~azion.models.Origin` to a plain dict,
+    including its addresses."""
+    return origin.to_dict()
+
+
+def configuration_record(configuration, origins=None):
+    """Convert a :class:`~azion.models.Configuration` to a plain dict.
+
+    :param object configuration:
+        Configuration model.
+    :param list origins:
+        Origins of the configuration. When given, they are
+        nested under the `origins` key.
+    """
+    record = configuration.to_dict()
+    if origins is not None:
+        record['origins'] = [origin.to_dict() for origin in origins]
+    return record
+
+
+def record_digest(record):
+    """Return a stable digest of a record, used to detect changes
+    between two exports."""
+    encoded = json.dumps(record, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def flatten_record(record):
+    """Flatten a nested configuration record into rows.
+
+    Each row holds a configuration, one of its origins and one of
+    the origin addresses. Configurations without origins and origins
+    without addresses still produce one row with empty columns.
+    """
+    base = {f'configuration_{field}': _scalar(record[field])
+            for field in CONFIGURATION_FIELDS}
+    origins = record.get('origins') or [{}]
+    for origin in origins:
+        origin_row = dict(base)
+        origin_row.update({
+            f'origin_{field}': origin.get(field)
+            for field in ORIGIN_FIELDS})
+        addresses = origin.get('addresses') or [{}]
+        for address in addresses:
+            row = dict(origin_row)
+            row.update({
+                f'address_{field}': address.get(field)
+                for field in ADDRESS_FIELDS})
+            yield row
+
+
+FLAT_COLUMNS = (
+    [f'configuration_{field}' for field in CONFIGURATION_FIELDS] +
+    [f'origin_{field}' for field in ORIGIN_FIELDS] +
+    [f'address_{field}' for field in ADDRESS_FIELDS])
+
+# Python type of every flat column, the others being strings
+COLUMN_TYPES = {
+    'configuration_id': int,
+    'configuration_active': bool,
+    'configuration_digital_certificate': int,
+    'configuration_cname_access_only': bool,
+    'configuration_rawlogs': bool,
+    'origin_id': int,
+    'origin_connection_timeout': int,
+    'origin_timeout_between_bytes': int,
+    'address_weight': int,
+    'address_is_active': bool,
+}
+
+
+def parquet_schema():
+    """Return the Arrow schema of flat rows. Types do not depend on
+    the values of a batch, e.g. a column whose values are all `None`,
+    so every row group of a file has the same schema."""
+    types = {int: pyarrow.int64(), bool: pyarrow.bool_(),
+             str: pyarrow.string()}
+    return pyarrow.schema([
+        (column, types[COLUMN_TYPES.get(column, str)])
+        for column in FLAT_COLUMNS])
+
+
+def _scalar(value):
+    if isinstance(value, list):
+        return ','.join(map(str, value))
+    return value
+
+
+class NDJSONWriter(object):
+    """Write one JSON document per configuration, with origins and
+    addresses nested."""
+
+    extension = 'ndjson'
+    mode = 'w'
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+
+    def write(self, record):
+        self.fileobj.write(
+            json.dumps(record, separators=(',', ':')) + '\n')
+
+    def close(self):
+        self.fileobj.flush()
+
+
+class CSVWriter(object):
+    """Write one row per configuration/origin/address combination."""
+
+    extension = 'csv'
+    mode = 'w'
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.writer = csv.DictWriter(fileobj, fieldnames=FLAT_COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, record):
+        self.writer.writerows(flatten_record(record))
+
+    def close(self):
+        self.fileobj.flush()
+
+
+class ParquetWriter(object):
+    """Write flattened rows to a Parquet file.
+
+    Rows are buffered and written as a row group every
+    `batch_size` rows, bounding the memory used by the writer.
+    Requires `pyarrow`.
+    """
+
+    extension = 'parquet'
+    mode = 'wb'
+
+    def __init__(self, fileobj, batch_size=10000):
+        if pyarrow is None:
+            raise RuntimeError('pyarrow is required to export to Parquet')
+        self.fileobj = fileobj
+        self.batch_size = batch_size
+        self.rows = []
+        self.schema = parquet_schema()
+        self.writer = pyarrow.parquet.ParquetWriter(fileobj, self.schema)
+
+    def write(self, record):
+        self.rows.extend(flatten_record(record))
+        if len(self.rows) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.rows:
+            return
+        columns = {column: [row[column] for row in self.rows]
+                   for column in FLAT_COLUMNS}
+        self.writer.write_table(pyarrow.table(columns, schema=self.schema))
+        self.rows = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+writers = {
+    'ndjson': NDJSONWriter,
+    'csv': CSVWriter,
+    'parquet': ParquetWriter
+}
+
+
+def get_writer(fmt):
+    """Return the writer class registered for the given format."""
+    try:
+        return writers[fmt]
+    except KeyError:
+        raise ValueError(f'Unsupported export format: {fmt}')
+
+
+def iter_inventory(azion, configurations=None, max_workers=8,
+                   raw=False, fields=None):
+    """Yield `(configuration, origins)` pairs as their origins arrive.
+
+    Origins are fetched concurrently, but never more than
+    `max_workers` requests are in flight, so memory is bounded
+    regardless of how many configurations exist. HTTP requests are
+    further limited by the adaptive limiter of the client, if any. Origins
+    found in the cache of the client are read in a single lookup.
+
+    :param object azion:
+        :class:`~azion.client.Azion` instance.
+    :param list configurations:
+        Configurations to fetch origins for. Default to all
+        configurations of the account.
+    :param int max_workers:
+        Maximum number of concurrent requests.
+    :param bool raw:
+        Yield origins as decoded JSON objects instead of models.
+    :param tuple fields:
+        Only load these fields of the origins.
+    """
+    if configurations is None:
+        configurations = azion.list_configurations()
+    configurations = list(configurations)
+    options = {}
+    if raw:
+        options['raw'] = raw
+    if fields is not None:
+        options['fields'] = fields
+
+    # Origins in the cache are read in one lookup, the rest fetched
+    cached = azion.cached([protocol.list_origins(configuration.id)
+                           for configuration in configurations], **options)
+    for index, origins in sorted(cached.items()):
+        yield configurations[index], origins
+    pending = (configuration
+               for index, configuration in enumerate(configurations)
+               if index not in cached)
+
+    def fetch(configuration_id):
+        return azion.list_origins(configuration_id, **options)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {}
+
+        def submit_next():
+            for configuration in pending:
+                future = executor.submit(fetch, configuration.id)
+                in_flight[future] = configuration
+                return True
+            return False
+
+        for _ in range(max_workers):
+            if not submit_next():
+                break
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                configuration = in_flight.pop(future)
+                yield configuration, future.result()
+                submit_next()
+
+
+def export_inventory(azion, path, fmt='ndjson', max_workers=8):
+    """Export every configuration, its origins and addresses
+    to a single file.
+
+    :param object azion:
+        :class:`~azion.client.Azion` instance.
+    :param str path:
+        Destination file.
+    :param str fmt:
+        One of `ndjson`, `csv` or `parquet`.
+    :param int max_workers:
+        Maximum number of concurrent requests.
+    :return: number of exported configurations.
+    :rtype: int
+    """
+    writer_class = get_writer(fmt)
+    count = 0
+    with open(path, writer_class.mode, **_open_options(writer_class)) as f:
+        writer = writer_class(f)
+        for configuration, origins in iter_inventory(
+                azion, max_workers=max_workers):
+            writer.write(configuration_record(configuration, origins))
+            count += 1
+        writer.close()
+    return count
+
+
+MANIFEST = 'manifest.json'
+
+
+def export_incremental(azion, directory, fmt='ndjson', max_workers=8):
+    """Export the inventory to a directory, one file per configuration,
+    rewriting only the configurations that changed since the last run.
+
+    A `manifest.json` file keeps the digest of every exported
+    configuration. Files of configurations that no longer exist
+    are removed.
+
+    :param object azion:
+        :class:`~azion.client.Azion` instance.
+    :param str directory:
+        Destination directory. Created if it does not exist.
+    :param str fmt:
+        One of `ndjson`, `csv` or `parquet`.
+    :param int max_workers:
+        Maximum number of concurrent requests.
+    :return: IDs of the configurations written in this run.
+    :rtype: list
+    """
+    writer_class = get_writer(fmt)
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            previous = json.load(f)
+    except FileNotFoundError:
+        previous = {}
+
+    current = {}
+    written = []
+    for configuration, origins in iter_inventory(
+            azion, max_workers=max_workers):
+        record = configuration_record(configuration, origins)
+        key = str(configuration.id)
+        current[key] = record_digest(record)
+        if previous.get(key) == current[key]:
+            continue
+        path = os.path.join(directory, f'{key}.{writer_class.extension}')
+        with open(path, writer_class.mode,
+                  **_open_options(writer_class)) as f:
+            writer = writer_class(f)
+            writer.write(record)
+            writer.close()
+        written.append(configuration.id)
+
+    for key in set(previous) - set(current):
+        path = os.path.join(directory, f'{key}.{writer_class.extension}')
+        if os.path.exists(path):
+            os.remove(path)
+
+    with open(manifest_path, 'w') as f:
+        json.dump(current, f, sort_keys=True)
+    return written
+
+
+def _open_options(writer_class):
+    if 'b' in writer_class.mode:
+        return {}
+    return {'encoding': 'utf-8', 'newline': ''}
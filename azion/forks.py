@@ -0,0 +1,30 @@
+"""Reset state inherited by child processes after `os.fork`.
+
+Threads do not survive a fork, but the objects describing them do: an
+executor in the child believes its workers exist, and a lock held by
+another thread of the parent is never released. Sockets are shared
+with the parent, so both processes would read from the same stream.
+
+Objects owning threads, locks or sockets register themselves with
+:func:`register` and implement `after_fork`, called in every child
+process right after the fork, before any other code runs.
+"""
+import os
+import weakref
+
+_instances = weakref.WeakSet()
+
+
+def register(instance):
+    """Call `instance.after_fork()` in child processes."""
+    _instances.add(instance)
+    return instance
+
+
+def _after_fork_in_child():
+    for instance in list(_instances):
+        instance.after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,354 @@
+"""Columnar collections of configurations and origins.
+
+:func:`~azion.models.many_of` returns a list of model objects, and
+filtering or aggregating thousands of them is a pure Python loop over
+attributes. Frames keep one array per field instead, built straight
+from the decoded JSON. When NumPy is installed, boolean and numeric
+columns are NumPy arrays and filters are vectorized. Other columns,
+and those holding `None`, are :class:`Column` lists, so a missing
+value never reads as `False` or `0`. Both kinds compare element-wise
+and return boolean masks.
+
+Rows are lazy models reading the columns, and only convert the fields
+that are accessed:
+
+.. code-block:: python
+
+    frame = ConfigurationFrame.from_json(data)
+    frame.count_by('delivery_protocol')
+    active = frame.filter(active=True)
+    configuration = active[0]
+"""
+import collections
+import collections.abc
+import operator
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from azion.models import Address, Configuration, Origin, lazy_model
+
+
+class Column(list):
+    """Column of Python objects.
+
+    Like those of NumPy arrays, its comparisons with a value are
+    element-wise and return a boolean mask (a list). `None` is never
+    ordered: it is neither smaller nor greater than any value.
+    """
+
+    __hash__ = None
+
+    def __eq__(self, value):
+        return [item == value for item in self]
+
+    def __ne__(self, value):
+        return [item != value for item in self]
+
+    def __lt__(self, value):
+        return self._ordered(operator.lt, value)
+
+    def __le__(self, value):
+        return self._ordered(operator.le, value)
+
+    def __gt__(self, value):
+        return self._ordered(operator.gt, value)
+
+    def __ge__(self, value):
+        return self._ordered(operator.ge, value)
+
+    def _ordered(self, compare, value):
+        return [item is not None and compare(item, value)
+                for item in self]
+
+
+def _column(values, dtype=None):
+    # NumPy would turn None into False or NaN: keep Python objects
+    if numpy is not None and dtype is not None and not any(
+            value is None for value in values):
+        try:
+            return numpy.array(values, dtype=dtype)
+        except (TypeError, ValueError):
+            pass
+    return Column(values)
+
+
+def _take(column, indexes):
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        return column[indexes]
+    return Column(column[index] for index in indexes)
+
+
+def _indexes(mask):
+    if numpy is not None and isinstance(mask, numpy.ndarray):
+        return numpy.flatnonzero(mask)
+    return [index for index, selected in enumerate(mask) if selected]
+
+
+def _and(left, right):
+    if numpy is not None and isinstance(left, numpy.ndarray):
+        return numpy.logical_and(left, right)
+    return [a and b for a, b in zip(left, right)]
+
+
+class Frame(object):
+    """Base class of columnar collections.
+
+    Subclasses define `model` and `fields`, a mapping of field
+    names to a NumPy dtype (or `None` for generic Python objects).
+    """
+
+    model = None
+    fields = {}
+
+    def __init__(self, columns, length):
+        self.columns = columns
+        self.length = length
+
+    @classmethod
+    def from_json(cls, data):
+        """Build a frame from a list of decoded JSON objects."""
+        data = data or []
+        columns = {
+            field: _column([item.get(field) for item in data], dtype)
+            for field, dtype in cls.fields.items()}
+        return cls(columns, len(data))
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} [{self.length} rows]>'
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        if isinstance(key, slice):
+            return self.take(range(*key.indices(self.length)))
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError(key)
+        return lazy_model(self.model)(_Row(self, key))
+
+    def __iter__(self):
+        for index in range(self.length):
+            yield self[index]
+
+    def row(self, index):
+        """Return the decoded JSON of a row."""
+        return {field: self.value(index, field) for field in self.keys()}
+
+    def keys(self):
+        """Fields of the decoded JSON of a row."""
+        return self.columns.keys()
+
+    def value(self, index, field):
+        """Return the decoded JSON of a field of a row."""
+        return _item(self.columns[field][index])
+
+    def take(self, indexes):
+        """Return a new frame holding only the given rows."""
+        indexes = list(indexes)
+        columns = {field: _take(column, indexes)
+                   for field, column in self.columns.items()}
+        return self.__class__(columns, len(indexes))
+
+    def mask(self, **equals):
+        """Return a boolean mask of the rows whose fields equal
+        the given values."""
+        mask = None
+        for field, value in equals.items():
+            selected = self.columns[field] == value
+            mask = selected if mask is None else _and(mask, selected)
+        return mask
+
+    def filter(self, mask=None, **equals):
+        """Return a new frame with the rows selected by a boolean
+        mask and/or whose fields equal the given values.
+
+        .. code-block:: python
+
+            frame.filter(active=True, delivery_protocol='http')
+            frame.filter(frame['connection_timeout'] > 30)
+
+        Rows whose field is `None` are never selected by an ordering
+        comparison.
+        """
+        if equals:
+            selected = self.mask(**equals)
+            mask = selected if mask is None else _and(mask, selected)
+        if mask is None:
+            return self
+        return self.take(_indexes(mask))
+
+    def count_by(self, field):
+        """Count rows by the value of a field.
+
+        :rtype: dict
+        """
+        column = self.columns[field]
+        if numpy is not None and isinstance(column, numpy.ndarray):
+            values, counts = numpy.unique(column, return_counts=True)
+            return {_item(value): int(count)
+                    for value, count in zip(values, counts)}
+        return dict(collections.Counter(_hashable(item) for item in column))
+
+    def group_by(self, field):
+        """Split the frame by the value of a field.
+
+        :return: dict mapping every value to a frame.
+        :rtype: dict
+        """
+        groups = collections.defaultdict(list)
+        for index, value in enumerate(self.columns[field]):
+            groups[_hashable(_item(value))].append(index)
+        return {value: self.take(indexes)
+                for value, indexes in groups.items()}
+
+
+class _Row(collections.abc.Mapping):
+    """Read-only view of the decoded JSON of a row, reading the
+    columns of the frame on access."""
+
+    __slots__ = ('frame', 'index')
+
+    def __init__(self, frame, index):
+        self.frame = frame
+        self.index = index
+
+    def __getitem__(self, field):
+        if field not in self.frame.keys():
+            raise KeyError(field)
+        return self.frame.value(self.index, field)
+
+    def __iter__(self):
+        return iter(self.frame.keys())
+
+    def __len__(self):
+        return len(self.frame.keys())
+
+
+def _item(value):
+    """Convert NumPy scalars back to Python objects."""
+    if numpy is not None and isinstance(value, numpy.generic):
+        return value.item()
+    return value
+
+
+def _hashable(value):
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+class ConfigurationFrame(Frame):
+    """Columnar collection of :class:`~azion.models.Configuration`."""
+
+    model = Configuration
+    fields = {
+        'id': 'int64',
+        'name': None,
+        'domain_name': None,
+        'active': 'bool',
+        'delivery_protocol': None,
+        'digital_certificate': None,
+        'cname': None,
+        'cname_access_only': 'bool',
+        'rawlogs': 'bool',
+    }
+
+
+class AddressFrame(Frame):
+    """Columnar collection of :class:`~azion.models.Address`.
+
+    Besides the address fields, the `origin` column holds
+    the row index of the owning origin in its
+    :class:`OriginFrame`.
+    """
+
+    model = Address
+    fields = {
+        'address': None,
+        'weight': None,
+        'server_role': None,
+        'is_active': 'bool',
+        'origin': 'int64',
+    }
+
+
+class OriginFrame(Frame):
+    """Columnar collection of :class:`~azion.models.Origin`.
+
+    Addresses of every origin are flattened into a single
+    :class:`AddressFrame`, available as :attr:`addresses`, so they
+    can be filtered and aggregated across all origins at once.
+    """
+
+    model = Origin
+    fields = {
+        'id': 'int64',
+        'name': None,
+        'origin_type': None,
+        'method': None,
+        'host_header': None,
+        'origin_protocol_policy': None,
+        'connection_timeout': 'int64',
+        'timeout_between_bytes': 'int64',
+    }
+
+    def __init__(self, columns, length, addresses=None):
+        super(OriginFrame, self).__init__(columns, length)
+        self.addresses = addresses or AddressFrame.from_json([])
+
+    @property
+    def addresses(self):
+        return self._addresses
+
+    @addresses.setter
+    def addresses(self, addresses):
+        self._addresses = addresses
+        self._address_positions = None
+
+    def address_positions(self, index):
+        """Return the positions in :attr:`addresses` of the addresses
+        of an origin. They are indexed on first use."""
+        if self._address_positions is None:
+            positions = collections.defaultdict(list)
+            for position, owner in enumerate(self.addresses['origin']):
+                positions[_item(owner)].append(position)
+            self._address_positions = positions
+        return self._address_positions.get(index, [])
+
+    @classmethod
+    def from_json(cls, data):
+        frame = super(OriginFrame, cls).from_json(data)
+        frame.addresses = AddressFrame.from_json([
+            dict(address, origin=index)
+            for index, origin in enumerate(data or [])
+            for address in origin.get('addresses') or []])
+        return frame
+
+    def keys(self):
+        return self.columns.keys() | {'addresses'}
+
+    def value(self, index, field):
+        if field == 'addresses':
+            return [self.addresses.row(position)
+                    for position in self.address_positions(index)]
+        return super(OriginFrame, self).value(index, field)
+
+    def take(self, indexes):
+        indexes = list(indexes)
+        frame = super(OriginFrame, self).take(indexes)
+        positions = {old: new for new, old in enumerate(indexes)}
+        owners = [_item(owner) for owner in self.addresses['origin']]
+        kept = [position for position, owner in enumerate(owners)
+                if owner in positions]
+        addresses = self.addresses.take(kept)
+        addresses.columns['origin'] = _column(
+            [positions[owners[position]] for position in kept], 'int64')
+        frame.addresses = addresses
+        return frame
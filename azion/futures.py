@@ -0,0 +1,114 @@
+"""Run :class:`~azion.client.Azion` calls in a thread pool.
+
+Every public method of the client has a non-blocking counterpart
+returning a :class:`concurrent.futures.Future`, so synchronous code
+can overlap many calls without adopting asyncio:
+
+.. code-block:: python
+
+    futures = [azion.submit.purge_url(batch) for batch in batches]
+    for future in as_completed(futures):
+        print(future.result())
+"""
+import concurrent.futures
+import functools
+import threading
+import weakref
+
+from azion.exceptions import QueueFull
+
+
+def as_completed(futures, timeout=None):
+    """Iterate over futures as they complete.
+
+    Same as :func:`concurrent.futures.as_completed`, exposed here
+    so callers do not need another import.
+    """
+    return concurrent.futures.as_completed(futures, timeout=timeout)
+
+
+# Client methods managing the client itself, never submitted: `close`
+# would shut the pool down from one of its own workers
+LIFECYCLE = frozenset(['login', 'close', 'after_fork'])
+
+
+class Submitter(object):
+    """Submit client calls to a managed thread pool.
+
+    The pool is sized to the connection pool of the session, so
+    workers never wait for a free connection. At most `max_pending`
+    calls may be queued or running; submitting more blocks until a
+    slot is released (backpressure). Their HTTP requests are further
+    limited by the adaptive limiter of the client, if any.
+
+    :param object azion:
+        :class:`~azion.client.Azion` instance.
+    :param int max_workers:
+        Number of worker threads. Default to the session pool size.
+    :param int max_pending:
+        Maximum number of queued plus running calls.
+        Default to four times `max_workers`.
+    :param float timeout:
+        How long to wait for a free slot before raising
+        :class:`~azion.exceptions.QueueFull`. Default to wait forever.
+    """
+
+    def __init__(self, azion, max_workers=None, max_pending=None,
+                 timeout=None):
+        self.azion = azion
+        self.max_workers = max_workers or azion.session.pool_maxsize
+        self.max_pending = max_pending or self.max_workers * 4
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='azion-submit')
+        self.futures = weakref.WeakSet()
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule `fn(*args, **kwargs)` and return its future.
+
+        :raises: :class:`~azion.exceptions.QueueFull` when no slot
+            is released within `timeout`.
+        """
+        if not self.slots.acquire(timeout=self.timeout):
+            raise QueueFull(
+                f'{self.max_pending} calls pending, no slot released')
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(self._release)
+        self.futures.add(future)
+        return future
+
+    def _release(self, future):
+        self.slots.release()
+
+    def map(self, fn, *iterables):
+        """Submit `fn` for every item of the iterables and
+        return the list of futures."""
+        return [self.submit(fn, *args) for args in zip(*iterables)]
+
+    def cancel(self):
+        """Cancel every call that has not started yet.
+
+        :return: number of cancelled calls.
+        :rtype: int
+        """
+        return sum(future.cancel() for future in list(self.futures))
+
+    def shutdown(self, wait=True, cancel=False):
+        """Stop the pool, optionally cancelling pending calls."""
+        if cancel:
+            self.cancel()
+        self.executor.shutdown(wait=wait)
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name in LIFECYCLE:
+            raise AttributeError(name)
+        method = getattr(self.azion, name)
+        if not callable(method):
+            raise AttributeError(name)
+        return functools.partial(self.submit, method)
@@ -0,0 +1,175 @@
+"""Hedged requests for latency-sensitive reads.
+
+A hedged request is sent again when the first attempt takes longer
+than usual, and whichever answers first wins. Since only a small share
+of requests is slow, a low delay (the observed p95 by default) cuts
+the tail latency at the cost of a few duplicate requests, capped by a
+budget.
+
+Only idempotent GET requests are hedged.
+"""
+import collections
+import concurrent.futures
+import threading
+import time
+
+from azion import forks
+
+
+class LatencyTracker(object):
+    """Keep the latest latency samples to estimate percentiles.
+
+    :param int size: number of samples kept.
+    """
+
+    def __init__(self, size=1000):
+        self.samples = collections.deque(maxlen=size)
+        self.lock = threading.Lock()
+        forks.register(self)
+
+    def after_fork(self):
+        self.lock = threading.Lock()
+
+    def add(self, latency):
+        with self.lock:
+            self.samples.append(latency)
+
+    def percentile(self, fraction):
+        """Return the given percentile (`0.95` for p95), or `None`
+        when there are no samples yet."""
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(fraction * len(samples)))
+        return samples[index]
+
+    def __len__(self):
+        return len(self.samples)
+
+
+class HedgePolicy(object):
+    """Decide when to hedge a request and run both attempts.
+
+    .. code-block:: python
+
+        azion = Azion(token, hedging=HedgePolicy(budget=0.05))
+
+    :param float delay: fixed delay, in seconds, before sending the
+        hedge. Default to the observed `percentile` latency.
+    :param float percentile: latency percentile used as delay when no
+        fixed delay is given.
+    :param float budget: maximum fraction of requests that may be
+        hedged.
+    :param int min_samples: number of latency samples needed before
+        hedging with the observed percentile.
+    :param int max_workers: threads used to run the attempts.
+    """
+
+    def __init__(self, delay=None, percentile=0.95, budget=0.1,
+                 min_samples=20, max_workers=8, clock=time.monotonic):
+        self.delay = delay
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.clock = clock
+        self.max_workers = max_workers
+        self.latencies = LatencyTracker()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='azion-hedge')
+        self.lock = threading.Lock()
+
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+        forks.register(self)
+
+    def after_fork(self):
+        """Replace the thread pool, whose workers only exist in the
+        parent process."""
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix='azion-hedge')
+        self.lock = threading.Lock()
+
+    def hedge_delay(self):
+        """Return how long to wait before hedging, or `None` when
+        there is not enough data to decide."""
+        if self.delay is not None:
+            return self.delay
+        if len(self.latencies) < self.min_samples:
+            return None
+        return self.latencies.percentile(self.percentile)
+
+    def _acquire_budget(self):
+        with self.lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                self.budget_denied += 1
+                return False
+            self.hedges += 1
+            return True
+
+    def _timed(self, fn):
+        started = self.clock()
+        result = fn()
+        self.latencies.add(self.clock() - started)
+        return result
+
+    def run(self, fn):
+        """Call `fn`, hedging it if it is slower than the hedge delay.
+
+        The first successful attempt wins. If an attempt fails while
+        the other is still running, the other one is awaited. The
+        losing attempt is cancelled when it has not started yet;
+        otherwise its result is discarded.
+
+        Attempts run in the threads of the pool, where state local to
+        the calling thread is not set. The client binds the thread
+        options of its session, see
+        :meth:`~azion.client.Session.bind_thread_options`.
+        """
+        with self.lock:
+            self.requests += 1
+
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed(fn)
+
+        primary = self.executor.submit(self._timed, fn)
+        done, _ = concurrent.futures.wait([primary], timeout=delay)
+        if done or not self._acquire_budget():
+            return primary.result()
+
+        hedge = self.executor.submit(self._timed, fn)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if future is hedge:
+                        with self.lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def stats(self):
+        """Return hedging metrics.
+
+        :rtype: dict
+        """
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'budget_denied': self.budget_denied,
+                'delay': self.hedge_delay(),
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,242 @@
+"""Local snapshot of the inventory with an indexed query API.
+
+Answering questions like "which configurations use this digital
+certificate?" against the live API means listing everything again.
+:class:`Inventory` keeps a SQLite copy of configurations, origins and
+addresses, indexed by the fields commonly used in lookups.
+"""
+import json
+import sqlite3
+import threading
+
+from azion.export import configuration_record, iter_inventory, record_digest
+from azion.models import Configuration, Origin
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS configurations (
+    id INTEGER PRIMARY KEY,
+    domain_name TEXT,
+    digital_certificate INTEGER,
+    active INTEGER,
+    digest TEXT,
+    record TEXT
+);
+CREATE INDEX IF NOT EXISTS configurations_domain_name
+    ON configurations (domain_name);
+CREATE INDEX IF NOT EXISTS configurations_digital_certificate
+    ON configurations (digital_certificate);
+CREATE INDEX IF NOT EXISTS configurations_active
+    ON configurations (active);
+
+CREATE TABLE IF NOT EXISTS cnames (
+    cname TEXT,
+    configuration_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS cnames_cname ON cnames (cname);
+CREATE INDEX IF NOT EXISTS cnames_configuration_id
+    ON cnames (configuration_id);
+
+CREATE TABLE IF NOT EXISTS origins (
+    id INTEGER,
+    configuration_id INTEGER,
+    record TEXT
+);
+CREATE INDEX IF NOT EXISTS origins_configuration_id
+    ON origins (configuration_id);
+
+CREATE TABLE IF NOT EXISTS addresses (
+    address TEXT,
+    origin_id INTEGER,
+    configuration_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS addresses_address ON addresses (address);
+CREATE INDEX IF NOT EXISTS addresses_configuration_id
+    ON addresses (configuration_id);
+"""
+
+
+def _cnames(cname):
+    if not cname:
+        return []
+    if isinstance(cname, str):
+        return [name.strip() for name in cname.split(',') if name.strip()]
+    return list(cname)
+
+
+class Inventory(object):
+    """Indexed snapshot of configurations, origins and addresses.
+
+    .. code-block:: python
+
+        inventory = Inventory('inventory.db')
+        inventory.refresh(azion)
+        inventory.configurations(digital_certificate=1234)
+        inventory.origins(address='www.myorigin.com')
+
+    :param str path:
+        SQLite database path. Default to an in-memory database.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def refresh(self, azion, configurations=None, max_workers=8):
+        """Refresh the snapshot from the API.
+
+        Only configurations whose data changed are rewritten.
+        When refreshing the whole account, configurations that
+        no longer exist are removed from the snapshot.
+
+        :param object azion:
+            :class:`~azion.client.Azion` instance.
+        :param list configurations:
+            Refresh only these configurations. Default to all
+            configurations of the account.
+        :param int max_workers:
+            Maximum number of concurrent requests.
+        :return: IDs of the configurations added, changed or removed.
+        :rtype: set
+        """
+        full_refresh = configurations is None
+        digests = self._digests()
+        seen = set()
+        changed = set()
+
+        for configuration, origins in iter_inventory(
+                azion, configurations, max_workers=max_workers):
+            record = configuration_record(configuration, origins)
+            digest = record_digest(record)
+            seen.add(configuration.id)
+            if digests.get(configuration.id) != digest:
+                self.store(record, digest)
+                changed.add(configuration.id)
+
+        if full_refresh:
+            for configuration_id in set(digests) - seen:
+                self.remove(configuration_id)
+                changed.add(configuration_id)
+        return changed
+
+    def store(self, record, digest=None):
+        """Insert or replace a configuration record with
+        its nested origins."""
+        configuration_id = record['id']
+        origins = record.get('origins') or []
+        configuration = {
+            key: value for key, value in record.items() if key != 'origins'}
+        with self.lock, self.connection:
+            self._delete(configuration_id)
+            self.connection.execute(
+                'INSERT INTO configurations VALUES (?, ?, ?, ?, ?, ?)',
+                (configuration_id, record['domain_name'],
+                 record['digital_certificate'], int(bool(record['active'])),
+                 digest or record_digest(record), json.dumps(configuration)))
+            self.connection.executemany(
+                'INSERT INTO cnames VALUES (?, ?)',
+                [(cname, configuration_id)
+                 for cname in _cnames(record['cname'])])
+            self.connection.executemany(
+                'INSERT INTO origins VALUES (?, ?, ?)',
+                [(origin['id'], configuration_id, json.dumps(origin))
+                 for origin in origins])
+            self.connection.executemany(
+                'INSERT INTO addresses VALUES (?, ?, ?)',
+                [(address['address'], origin['id'], configuration_id)
+                 for origin in origins for address in origin['addresses']])
+
+    def remove(self, configuration_id):
+        """Remove a configuration and its origins from the snapshot."""
+        with self.lock, self.connection:
+            self._delete(configuration_id)
+
+    def _delete(self, configuration_id):
+        for table, column in (('configurations', 'id'),
+                              ('cnames', 'configuration_id'),
+                              ('origins', 'configuration_id'),
+                              ('addresses', 'configuration_id')):
+            self.connection.execute(
+                f'DELETE FROM {table} WHERE {column} = ?',
+                (configuration_id,))
+
+    def _digests(self):
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT id, digest FROM configurations')
+            return dict(rows.fetchall())
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def get_configuration(self, configuration_id):
+        """Return the configuration with the given ID, or `None`."""
+        rows = self._query(
+            'SELECT record FROM configurations WHERE id = ?',
+            (configuration_id,))
+        if not rows:
+            return None
+        return Configuration(json.loads(rows[0][0]))
+
+    def configurations(self, cname=None, domain_name=None,
+                       digital_certificate=None, active=None):
+        """Find configurations matching every given filter.
+
+        :param str cname: one of the configuration CNAMEs.
+        :param str domain_name: configuration domain name.
+        :param int digital_certificate: Digital Certificate ID.
+        :param bool active: whether the configuration is active.
+        :rtype: list
+        """
+        clauses = []
+        params = []
+        if cname is not None:
+            clauses.append(
+                'id IN (SELECT configuration_id FROM cnames WHERE cname = ?)')
+            params.append(cname)
+        if domain_name is not None:
+            clauses.append('domain_name = ?')
+            params.append(domain_name)
+        if digital_certificate is not None:
+            clauses.append('digital_certificate = ?')
+            params.append(digital_certificate)
+        if active is not None:
+            clauses.append('active = ?')
+            params.append(int(active))
+
+        sql = 'SELECT record FROM configurations'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        return [Configuration(json.loads(record))
+                for record, in self._query(sql + ' ORDER BY id', params)]
+
+    def origins(self, address=None, configuration_id=None):
+        """Find origins matching every given filter.
+
+        :param str address: hostname or IP of one of the origin addresses.
+        :param int configuration_id: configuration owning the origin.
+        :rtype: list
+        """
+        clauses = []
+        params = []
+        if address is not None:
+            clauses.append(
+                '(id, configuration_id) IN (SELECT origin_id, '
+                'configuration_id FROM addresses WHERE address = ?)')
+            params.append(address)
+        if configuration_id is not None:
+            clauses.append('configuration_id = ?')
+            params.append(configuration_id)
+
+        sql = 'SELECT record FROM origins'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        return [Origin(json.loads(record))
+                for record, in self._query(sql + ' ORDER BY id', params)]
+
+    def __len__(self):
+        return self._query('SELECT COUNT(*) FROM configurations')[0][0]
@@ -3,17 +3,356 @@ import pendulum
 from azion import exceptions
 
 
-def instance_from_data(model, data):
+class Many(object):
+    """Schema converter of a field holding a list of `model`."""
+
+    def __init__(self, model):
+        self.model = model
+
+
+def compile_loader(model, tolerant=False, fields=None):
+    """Generate the functions building `model` from decoded JSON.
+
+    Every model declares its fields in `schema`, a tuple of
+    `(name, converter)` pairs where converter is `None`, a function
+    or :class:`Many`. From it, the source of specialized functions is
+    generated, with one plain assignment per field and no loop:
+
+    * `load_data(instance, data)` sets the attributes of an instance;
+    * `load(data)` returns a new instance;
+    * `load_many(items)` returns a list of instances in one pass.
+
+    In tolerant mode, missing fields are set to `None` instead of
+    raising `KeyError`. Unknown fields are always ignored.
+
+    :param tuple fields: only load these fields (a projection).
+    """
+    namespace = {'model': model, 'new': object.__new__}
+    schema = model.schema
+    if fields is not None:
+        schema = [(name, converter) for name, converter in schema
+                  if name in fields]
+    lines = []
+    for index, (name, converter) in enumerate(schema):
+        value = f'data.get({name!r})' if tolerant else f'data[{name!r}]'
+        if converter is not None:
+            function = f'convert_{index}'
+            if isinstance(converter, Many):
+                converter = loaders(converter.model, tolerant).load_many
+            namespace[function] = converter
+            if tolerant:
+                value = f'_convert({function}, {value})'
+            else:
+                value = f'{function}({value})'
+        lines.append(f'    self.{name} = {value}')
+    body = '\n'.join(lines) or '    pass'
+
+    if tolerant or fields is not None:
+        build = 'build(data)'
+        constructor = """
+def build(data):
+    instance = new(model)
+    load_data(instance, data)
+    return instance
+"""
+    else:
+        build = 'model(data)'
+        constructor = ''
+
+    source = f"""
+def _convert(function, value):
+    return None if value is None else function(value)
+
+def load_data(self, data):
+{body}
+{constructor}
+def load(data):
     if not data:
         return None
+    return {build}
+
+def load_many(items):
+    if not items:
+        return []
+    return [{build} if data else None for data in items]
+"""
+    exec(compile(source, f'<{model.__name__} loader>', 'exec'), namespace)
+    return Loader(namespace['load_data'], namespace['load'],
+                  namespace['load_many'])
+
+
+class Loader(object):
+    """Functions generated by :func:`compile_loader`."""
+
+    def __init__(self, load_data, load, load_many):
+        self.load_data = load_data
+        self.load = load
+        self.load_many = load_many
+
+
+_loaders = {}
+
+
+def loaders(model, tolerant=False, fields=None):
+    """Return the :class:`Loader` of a model, compiling it on
+    first use."""
+    if fields is not None:
+        fields = check_fields(model, fields)
+    key = (model, tolerant, fields)
+    loader = _loaders.get(key)
+    if loader is None:
+        loader = _loaders[key] = compile_loader(model, tolerant, fields)
+    return loader
+
+
+def check_fields(model, fields):
+    """Return `fields` as a sorted tuple, checking they all exist
+    in the schema of `model`.
+
+    :raises: `ValueError` for unknown fields.
+    """
+    fields = tuple(sorted(set(fields)))
+    known = {name for name, converter in model.schema}
+    unknown = [name for name in fields if name not in known]
+    if unknown:
+        raise ValueError(
+            f'Unknown fields of {model.__name__}: {", ".join(unknown)}')
+    return fields
+
+
+def project(data, fields):
+    """Keep only `fields` of a decoded JSON object, or of every
+    object of a list."""
+    if isinstance(data, list):
+        return [project(item, fields) for item in data]
+    if not data:
+        return data
+    return {name: data[name] for name in fields if name in data}
+
+
+_lazy_models = {}
+
+
+def lazy_model(model):
+    """Return a subclass of `model` whose instances keep the decoded
+    JSON object and only convert a field when it is first accessed.
+
+    Converted values are stored on the instance, so later accesses
+    are plain attribute lookups. Missing fields raise
+    `AttributeError` on access.
+    """
+    lazy = _lazy_models.get(model)
+    if lazy is not None:
+        return lazy
+
+    converters = {}
+    for name, converter in model.schema:
+        if isinstance(converter, Many):
+            converter = _lazy_many(converter.model)
+        converters[name] = converter
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getattr__(self, name):
+        try:
+            converter = converters[name]
+            value = self.__dict__['_data'][name]
+        except KeyError:
+            raise AttributeError(name) from None
+        if converter is not None and value is not None:
+            value = converter(value)
+        setattr(self, name, value)
+        return value
+
+    def load_data(self, data):
+        self.__dict__.clear()
+        self._data = data
+
+    lazy = _lazy_models[model] = type(f'Lazy{model.__name__}', (model,), {
+        '__init__': __init__, '__getattr__': __getattr__,
+        'load_data': load_data, '__module__': model.__module__})
+    return lazy
+
+
+def _lazy_many(model):
+    def convert(items):
+        return many_of(lazy_model(model), items)
+    return convert
+
+
+class Model(object):
+    """Base class of the models built from API responses.
+
+    Subclasses declare their fields in `schema` (see
+    :func:`compile_loader`), and get generated `__init__` and
+    `load_data` methods.
+    """
+
+    schema = ()
+    #: Models declaring a schema, by name
+    registry = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'schema' in cls.__dict__:
+            Model.registry[cls.__name__] = cls
+        defines_init = '__init__' in cls.__dict__
+        if 'load_data' not in cls.__dict__:
+            cls.load_data = loaders(cls).load_data
+            if not defines_init:
+                cls.__init__ = cls.load_data
+        elif not defines_init:
+            # A custom `load_data` must keep being called
+            cls.__init__ = _call_load_data
+
+    def to_dict(self):
+        """Return the fields of this instance as the API encodes them,
+        so `type(self).from_dict(self.to_dict())` is an equal copy.
+
+        Fields missing from a projected instance are left out.
+        """
+        return dumpers(type(self)).to_dict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build an instance from the output of :meth:`to_dict`."""
+        return cls(data)
+
+
+def _call_load_data(self, data):
+    self.load_data(data)
+
+
+def compile_dumper(model):
+    """Generate the functions serializing `model`, the reverse of
+    :func:`compile_loader`:
+
+    * `to_dict(instance)` returns the fields as decoded JSON;
+    * `to_values(instance)` returns the field values as a list in
+      schema order, keeping dates as datetime objects;
+    * `from_values(values)` builds an instance from such a list.
+
+    Converted fields are dumped with the function registered for
+    their converter in :data:`DUMPERS`, and restored from values with
+    the one registered in :data:`RESTORERS`.
+    """
+    namespace = {'model': model, 'new': object.__new__}
+    items = []
+    values = []
+    assignments = []
+    for index, (name, converter) in enumerate(model.schema):
+        item = value = f'self.{name}'
+        loaded = f'values[{index}]'
+        if isinstance(converter, Many):
+            nested = dumpers(converter.model)
+            namespace[f'to_dict_{index}'] = nested.to_dict
+            namespace[f'to_values_{index}'] = nested.to_values
+            namespace[f'from_values_{index}'] = nested.from_values
+            item = f'_many(to_dict_{index}, {item})'
+            value = f'_many(to_values_{index}, {value})'
+            loaded = f'_many(from_values_{index}, {loaded})'
+        elif converter is not None:
+            namespace[f'dump_{index}'] = DUMPERS[converter]
+            item = f'_dump(dump_{index}, {item})'
+            if converter in RESTORERS:
+                namespace[f'restore_{index}'] = RESTORERS[converter]
+                loaded = f'_dump(restore_{index}, {loaded})'
+        items.append(f'{name!r}: {item}')
+        values.append(value)
+        assignments.append(f'    instance.{name} = {loaded}')
+    names = tuple(name for name, converter in model.schema)
+    namespace['names'] = names
+
+    source = f"""
+def _dump(function, value):
+    return None if value is None else function(value)
+
+def _many(function, items):
+    if items is None:
+        return None
+    return [None if item is None else function(item) for item in items]
+
+def to_dict(self):
+    try:
+        return {{{', '.join(items)}}}
+    except AttributeError:
+        # Projected instance: only dump the loaded fields
+        loaded = _Projection(self, names)
+        return {{name: value for name, value in to_dict(loaded).items()
+                if name in loaded.__dict__}}
+
+def to_values(self):
+    try:
+        return [{', '.join(values)}]
+    except AttributeError:
+        return to_values(_Projection(self, names))
+
+def from_values(values):
+    instance = new(model)
+{chr(10).join(assignments) or '    pass'}
+    return instance
+"""
+    namespace['_Projection'] = _Projection
+    exec(compile(source, f'<{model.__name__} dumper>', 'exec'), namespace)
+    return Dumper(namespace['to_dict'], namespace['to_values'],
+                  namespace['from_values'])
+
+
+class _Projection(object):
+    """Stand-in holding the loaded fields of a projected instance,
+    with `None` for the others."""
+
+    def __init__(self, instance, names):
+        for name in names:
+            if hasattr(instance, name):
+                self.__dict__[name] = getattr(instance, name)
+
+    def __getattr__(self, name):
+        return None
+
+
+class Dumper(object):
+    """Functions generated by :func:`compile_dumper`."""
+
+    def __init__(self, to_dict, to_values, from_values):
+        self.to_dict = to_dict
+        self.to_values = to_values
+        self.from_values = from_values
+
+
+_dumpers = {}
+
+
+def dumpers(model):
+    """Return the :class:`Dumper` of a model, compiling it on
+    first use."""
+    dumper = _dumpers.get(model)
+    if dumper is None:
+        dumper = _dumpers[model] = compile_dumper(model)
+    return dumper
+
+
+def instance_from_data(model, data, tolerant=False):
+    if not data:
+        return None
+    if tolerant:
+        return loaders(model, tolerant).load(data)
     return model(data)
 
 
-def many_of(model, data):
+def many_of(model, data, tolerant=False):
+    """Build a list of `model` from a list of decoded JSON objects.
+
+    :param bool tolerant: set missing fields to `None` instead of
+        raising `KeyError`.
+    """
     if not data:
         return []
-    return [instance_from_data(model, resource) for
-            resource in data]
+    if not issubclass(model, Model):
+        return [instance_from_data(model, resource) for
+                resource in data]
+    return loaders(model, tolerant).load_many(data)
 
 
 def decode_json(response, excepted_status_code):
@@ -68,7 +407,18 @@ def to_date(date):
     return pendulum.parse(date)
 
 
-class Token(object):
+def from_date(date):
+    """Convert a datetime object back to an ISO 8601 string."""
+    return date.isoformat()
+
+
+# Reverse of every schema converter, used by `to_dict`
+DUMPERS = {to_date: from_date}
+# datetime objects decoded by `msgpack` are plain ones
+RESTORERS = {to_date: pendulum.instance}
+
+
+class Token(Model):
     """Model representing the authorized token retrieved
     from the API.
 
@@ -88,19 +438,18 @@ class Token(object):
         Date when the token will expire.
     """
 
-    def __init__(self, data):
-        self.load_data(data)
-
-    def load_data(self, data):
-        self.token = data['token']
-        self.created_at = to_date(data['created_at'])
-        self.expires_at = to_date(data['expires_at'])
+    schema = (
+        ('token', None),
+        ('created_at', to_date),
+        ('expires_at', to_date),
+    )
 
     def __repr__(self):
-        return f'<TokenAuth [{self.token[:6]}]>'
+        token = getattr(self, 'token', None) or ''
+        return f'<TokenAuth [{token[:6]}]>'
 
 
-class Configuration(object):
+class Configuration(Model):
     """Model representing the configuration retrieved
     from the API.
 
@@ -142,25 +491,26 @@ class Configuration(object):
         the domain_name.
     """
 
-    def __init__(self, data):
-        self.load_data(data)
+    schema = (
+        ('id', None),
+        ('name', None),
+        ('domain_name', None),
+        ('active', None),
+        ('delivery_protocol', None),
+        ('digital_certificate', None),
+        ('cname', None),
+        ('cname_access_only', None),
+        ('rawlogs', None),
+    )
 
     def __repr__(self):
-        return f'<Configuration [{self.name} ({self.domain_name})]>'
+        # Projected models may lack these fields
+        name = getattr(self, 'name', None)
+        domain_name = getattr(self, 'domain_name', None)
+        return f'<Configuration [{name} ({domain_name})]>'
 
-    def load_data(self, data):
-        self.id = data['id']
-        self.name = data['name']
-        self.domain_name = data['domain_name']
-        self.active = data['active']
-        self.delivery_protocol = data['delivery_protocol']
-        self.digital_certificate = data['digital_certificate']
-        self.cname = data['cname']
-        self.cname_access_only = data['cname_access_only']
-        self.rawlogs = data['rawlogs']
-
-
-class Address(object):
+
+class Address(Model):
     """Model representing an Address - a related resource
     of `Origin` model.
 
@@ -178,17 +528,15 @@ class Address(object):
         Define whether this origin is active.
     """
 
-    def __init__(self, data):
-        self.load_data(data)
+    schema = (
+        ('address', None),
+        ('weight', None),
+        ('server_role', None),
+        ('is_active', None),
+    )
 
-    def load_data(self, data):
-        self.address = data['address']
-        self.weight = data['weight']
-        self.server_role = data['server_role']
-        self.is_active = data['is_active']
 
-
-class Origin(object):
+class Origin(Model):
     """Model representing the Origin retrieved
     from the API.
 
@@ -224,19 +572,18 @@ class Origin(object):
         Timeout for a connection without data transferring (seconds).
     """
 
-    def __init__(self, data):
-        self.load_data(data)
+    schema = (
+        ('id', None),
+        ('name', None),
+        ('origin_type', None),
+        ('method', None),
+        ('host_header', None),
+        ('origin_protocol_policy', None),
+        ('addresses', Many(Address)),
+        ('connection_timeout', None),
+        ('timeout_between_bytes', None),
+    )
 
     def __repr__(self):
-        return f'<Origin [{self.name}]>'
-
-    def load_data(self, data):
-        self.id = data['id']
-        self.name = data['name']
-        self.origin_type = data['origin_type']
-        self.method = data['method']
-        self.host_header = data['host_header']
-        self.origin_protocol_policy = data['origin_protocol_policy']
-        self.addresses = many_of(Address, data['addresses'])
-        self.connection_timeout = data['connection_timeout']
-        self.timeout_between_bytes = data['timeout_between_bytes']
+        name = getattr(self, 'name', None)
+        return f'<Origin [{name}]>'
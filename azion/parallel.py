@@ -0,0 +1,109 @@
+"""Process-pool stage for CPU-heavy post-processing of API results.
+
+Once requests run concurrently, building models and computing reports
+over thousands of origins is bound by the GIL. :func:`map_reduce` ships
+raw decoded JSON to worker processes, where models are built and the
+user reducer runs, then merges the partial results.
+
+Payloads are sent in chunks of decoded JSON, pickled as they are:
+the C pickler handles nested dicts several times faster than encoding
+them to JSON first, and that work runs in the parent under the GIL.
+Model objects never cross process boundaries.
+
+Mapper, reducer and combine functions must be picklable, i.e.
+defined at module level.
+
+.. code-block:: python
+
+    def weights(origin):
+        return [address.weight or 0 for address in origin.addresses]
+
+    def add(total, weights):
+        return total + sum(weights)
+
+    total = map_reduce(Origin, payloads, add, 0, operator.add,
+                       mapper=weights)
+"""
+import collections
+import copy
+import functools
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from azion.models import instance_from_data
+
+
+def chunked(iterable, size):
+    """Split an iterable into lists of at most `size` items."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def process_chunk(model, reducer, initial, mapper, chunk):
+    """Build models from a chunk of payloads and reduce them.
+
+    Runs inside the worker process.
+    """
+    accumulator = initial
+    for data in chunk:
+        instance = instance_from_data(model, data)
+        if mapper is not None:
+            instance = mapper(instance)
+        accumulator = reducer(accumulator, instance)
+    return accumulator
+
+
+def map_reduce(model, payloads, reducer, initial, combine, mapper=None,
+               chunksize=1000, max_workers=None):
+    """Build models from raw payloads and reduce them in worker processes.
+
+    :param type model:
+        Model built from every payload, e.g. :class:`~azion.models.Origin`.
+    :param iterable payloads:
+        Decoded JSON objects, as returned by the API.
+    :param callable reducer:
+        `reducer(accumulator, item)` returning the new accumulator.
+    :param initial:
+        Initial accumulator of every chunk. It must be neutral
+        for `combine`, since it is also the start of the merge.
+    :param callable combine:
+        `combine(left, right)` merging two partial accumulators.
+    :param callable mapper:
+        Optional function applied to every model before reducing.
+    :param int chunksize:
+        Number of payloads sent to a worker at once.
+    :param int max_workers:
+        Number of worker processes. Default to the number of CPUs.
+        Use `0` to process every chunk in the calling process.
+    """
+    chunks = chunked(payloads, chunksize)
+
+    if max_workers == 0:
+        # Workers get their own copy of `initial`, so must every
+        # chunk here, since reducers may update it in place
+        partials = (
+            process_chunk(model, reducer, copy.deepcopy(initial), mapper,
+                          chunk)
+            for chunk in chunks)
+        return functools.reduce(combine, partials, copy.deepcopy(initial))
+
+    work = functools.partial(process_chunk, model, reducer, initial, mapper)
+    max_workers = max_workers or os.cpu_count() or 1
+    result = copy.deepcopy(initial)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Keep a bounded number of chunks in flight instead of
+        # pickling and submitting every payload upfront.
+        window = max_workers * 2
+        in_flight = collections.deque()
+        for chunk in chunks:
+            in_flight.append(executor.submit(work, chunk))
+            if len(in_flight) >= window:
+                result = combine(result, in_flight.popleft().result())
+        while in_flight:
+            result = combine(result, in_flight.popleft().result())
+    return result
@@ -0,0 +1,223 @@
+"""Sans-IO description of every request made by :class:`~azion.client.Azion`.
+
+Functions in this module do no I/O. They return :class:`Request`
+objects describing the HTTP method, path, body, expected status and how
+to turn the response into models. Any transport (the default
+`requests` session, an asynchronous client, a batch runner or a test
+double) can execute them:
+
+.. code-block:: python
+
+    request = protocol.get_configuration(1)
+    response = session.request(
+        request.method, request.url(base_url), **request.options())
+    configuration = request.parse(response)
+"""
+from azion.models import (
+    Configuration, Origin, Token, as_boolean, check_fields, decode_json,
+    filter_none, instance_from_data, lazy_model, loaders, many_of, project)
+from azion.responses import handle_multi_status
+from azion.validation import CONFIGURATION, CONFIGURATION_UPDATE, ORIGIN
+
+
+class Request(object):
+    """Description of a request to the API.
+
+    .. attribute:: method
+
+        HTTP method, lowercase.
+
+    .. attribute:: path
+
+        Tuple of path segments, joined by the transport.
+
+    .. attribute:: expected_status
+
+        Status code of a successful response.
+
+    .. attribute:: model
+
+        Model built from the response, if any.
+
+    .. attribute:: many
+
+        Whether the response is a list of `model`.
+
+    .. attribute:: multi_status
+
+        Field used to group a multi-status (207) response.
+
+    .. attribute:: boolean
+
+        Whether the result is only the success of the request.
+
+    .. attribute:: invalidates
+
+        Paths of cached reads made stale by this request.
+    """
+
+    def __init__(self, method, path, expected_status, model=None,
+                 many=False, multi_status=None, boolean=False,
+                 json=None, data=None, auth=None, invalidates=()):
+        self.method = method
+        self.path = tuple(path)
+        self.expected_status = expected_status
+        self.model = model
+        self.many = many
+        self.multi_status = multi_status
+        self.boolean = boolean
+        self.json = json
+        self.data = data
+        self.auth = auth
+        self.invalidates = tuple(tuple(path) for path in invalidates)
+
+    def __repr__(self):
+        path = '/'.join(map(str, self.path))
+        return f'<Request [{self.method.upper()} /{path}]>'
+
+    def url(self, base_url):
+        """Join the path segments to the given base URL."""
+        return '/'.join(map(str, (base_url,) + self.path))
+
+    def options(self):
+        """Keyword arguments for the transport call.
+        Only the options set in this request are included."""
+        options = {}
+        for name in ('data', 'json', 'auth'):
+            value = getattr(self, name)
+            if value is not None:
+                options[name] = value
+        return options
+
+    def decode(self, response):
+        """Decode the response body, raising errors for failed requests.
+
+        Boolean requests decode to `True` or `False`.
+        """
+        if self.boolean:
+            return as_boolean(response, self.expected_status)
+        return decode_json(response, self.expected_status)
+
+    def build(self, data, raw=False, fields=None, lazy=False):
+        """Build the final result from decoded data.
+
+        :param bool raw: return the decoded JSON instead of models.
+        :param tuple fields: only keep these fields (a projection).
+        :param bool lazy: return proxies converting fields on access,
+            see :func:`~azion.models.lazy_model`.
+        """
+        if self.boolean:
+            return data
+        if self.multi_status:
+            return handle_multi_status(data, self.multi_status)
+        if self.model is None:
+            return data
+        if lazy and (raw or fields is not None):
+            raise ValueError('lazy cannot be combined with raw or fields')
+        if fields is not None:
+            fields = check_fields(self.model, fields)
+        if raw:
+            return project(data, fields) if fields is not None else data
+        if lazy:
+            model = lazy_model(self.model)
+            if self.many:
+                return many_of(model, data)
+            return instance_from_data(model, data)
+        if fields is not None:
+            loader = loaders(self.model, fields=fields)
+            return loader.load_many(data) if self.many else loader.load(data)
+        if self.many:
+            return many_of(self.model, data)
+        return instance_from_data(self.model, data)
+
+    def parse(self, response):
+        """Decode the response and build the result."""
+        return self.build(self.decode(response))
+
+
+CONFIGURATIONS = ('content_delivery', 'configurations')
+
+
+def authorize(username, password):
+    return Request(
+        'post', ('tokens',), 201, model=Token,
+        data={}, auth=(username, password))
+
+
+def get_configuration(configuration_id):
+    return Request(
+        'get', ('content_delivery', 'configurations', configuration_id),
+        200, model=Configuration)
+
+
+def list_configurations():
+    return Request(
+        'get', ('content_delivery', 'configurations'),
+        200, model=Configuration, many=True)
+
+
+def create_configuration(**fields):
+    fields = CONFIGURATION.check(filter_none(fields))
+    return Request(
+        'post', ('content_delivery', 'configurations'),
+        201, model=Configuration, json=fields,
+        invalidates=[CONFIGURATIONS])
+
+
+def delete_configuration(configuration_id):
+    return Request(
+        'delete', ('content_delivery', 'configurations', configuration_id),
+        204, boolean=True,
+        invalidates=[CONFIGURATIONS,
+                     CONFIGURATIONS + (configuration_id,),
+                     CONFIGURATIONS + (configuration_id, 'origins')])
+
+
+def partial_update_configuration(configuration_id, **fields):
+    fields = CONFIGURATION_UPDATE.check(filter_none(fields))
+    return Request(
+        'patch', ('content_delivery', 'configurations', configuration_id),
+        200, model=Configuration, json=fields,
+        invalidates=[CONFIGURATIONS, CONFIGURATIONS + (configuration_id,)])
+
+
+def replace_configuration(configuration_id, **fields):
+    fields = CONFIGURATION_UPDATE.check(filter_none(fields))
+    return Request(
+        'put', ('content_delivery', 'configurations', configuration_id),
+        200, model=Configuration, json=fields,
+        invalidates=[CONFIGURATIONS, CONFIGURATIONS + (configuration_id,)])
+
+
+def purge_url(urls, method):
+    return Request(
+        'post', ('purge', 'url'), 207, multi_status='urls',
+        json={'urls': urls, 'method': method})
+
+
+def purge_cache_key(urls, method):
+    return Request(
+        'post', ('purge', 'cachekey'), 201, boolean=True,
+        json={'urls': urls, 'method': method})
+
+
+def purge_wildcard(url, method):
+    return Request(
+        'post', ('purge', 'wildcard'), 201, boolean=True,
+        json={'urls': [url], 'method': method})
+
+
+def list_origins(configuration_id):
+    return Request(
+        'get', ('content_delivery', 'configurations',
+                configuration_id, 'origins'),
+        200, model=Origin, many=True)
+
+
+def create_origin(configuration_id, **fields):
+    fields = ORIGIN.check(filter_none(fields))
+    return Request(
+        'post', ('content_delivery', 'configurations',
+                 configuration_id, 'origins'),
+        201, model=Origin, json=fields,
+        invalidates=[CONFIGURATIONS + (configuration_id, 'origins')])
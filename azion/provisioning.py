@@ -0,0 +1,150 @@
+"""Create many origins at once.
+
+Rolling out an origin to hundreds of configurations is a long series
+of `create_origin` calls. :func:`create_origins` validates every spec
+(see :mod:`azion.validation`) before sending anything, runs the calls
+concurrently within the limits of the client and records progress in
+a checkpoint file, so an interrupted rollout resumes where it stopped.
+
+Origins of the same configuration are created one after the other,
+since concurrent writes to one configuration may conflict. Different
+configurations are provisioned in parallel.
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from azion import protocol
+from azion.exceptions import ValidationError
+from azion.models import Origin, instance_from_data
+from azion.validation import ORIGIN
+
+
+def validate_origin_spec(spec):
+    """Return the list of problems of an origin spec, empty if valid.
+
+    :param dict spec: arguments of
+        :meth:`~azion.client.Azion.create_origin`.
+    """
+    fields = dict(spec)
+    errors = []
+    if fields.pop('configuration_id', None) is None:
+        errors.append('configuration_id is required')
+    return errors + ORIGIN.validate(fields)
+
+
+def spec_key(spec):
+    """Return the key of a spec in the checkpoint file."""
+    encoded = json.dumps(spec, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+class Checkpoint(object):
+    """Origins already created, persisted to a JSON file.
+
+    The file maps the key of every spec to the data of the created
+    origin and is rewritten atomically after every creation.
+
+    :param str path: checkpoint file, or `None` to keep it in memory.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.created = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self.created = json.load(f)
+
+    def get(self, spec):
+        data = self.created.get(spec_key(spec))
+        return instance_from_data(Origin, data)
+
+    def add(self, spec, origin_data):
+        with self.lock:
+            self.created[spec_key(spec)] = origin_data
+            if self.path is None:
+                return
+            temporary = f'{self.path}.tmp'
+            with open(temporary, 'w') as f:
+                json.dump(self.created, f)
+            os.replace(temporary, self.path)
+
+
+def _create_request(spec):
+    """Request creating the origin of a spec, returning the decoded
+    data so it can be saved in the checkpoint."""
+    request = protocol.create_origin(**spec)
+    return protocol.Request(
+        request.method, request.path, request.expected_status,
+        json=request.json, invalidates=request.invalidates)
+
+
+def create_origins(azion, specs, checkpoint=None, max_workers=8):
+    """Create an origin for every spec.
+
+    .. code-block:: python
+
+        specs = [dict(configuration_id=id, name='Images', ...)
+                 for id in configuration_ids]
+        results = create_origins(azion, specs, checkpoint='rollout.json')
+        failed = [(spec, result) for spec, result in zip(specs, results)
+                  if isinstance(result, Exception)]
+
+    Invalid specs are reported with a
+    :class:`~azion.exceptions.ValidationError` and never sent. Specs
+    found in the checkpoint are not created again.
+
+    :param object azion:
+        :class:`~azion.client.Azion` instance.
+    :param list specs:
+        Arguments of :meth:`~azion.client.Azion.create_origin`, as dicts.
+    :param str checkpoint:
+        Path of the checkpoint file. Default to no checkpoint.
+    :param int max_workers:
+        Maximum number of configurations provisioned at once.
+    :return: for every spec, the created :class:`~azion.models.Origin`
+        or the exception that prevented its creation.
+    :rtype: list
+    """
+    specs = list(specs)
+    results = [None] * len(specs)
+    done = Checkpoint(checkpoint)
+
+    queues = {}
+    for index, spec in enumerate(specs):
+        errors = validate_origin_spec(spec)
+        if errors:
+            results[index] = ValidationError(errors)
+            continue
+        origin = done.get(spec)
+        if origin is not None:
+            results[index] = origin
+            continue
+        queues.setdefault(spec['configuration_id'], []).append(index)
+
+    def provision(indexes):
+        for index in indexes:
+            spec = specs[index]
+            try:
+                data = azion.request(_create_request(spec))
+            except Exception as error:
+                results[index] = error
+            else:
+                done.add(spec, data)
+                results[index] = instance_from_data(Origin, data)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = set()
+        for indexes in queues.values():
+            in_flight.add(executor.submit(provision, indexes))
+            if len(in_flight) >= max_workers:
+                finished, in_flight = wait(
+                    in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    future.result()
+        for future in in_flight:
+            future.result()
+    return results
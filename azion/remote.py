@@ -0,0 +1,422 @@
+"""Cache backend shared by a fleet of hosts over the network.
+
+:class:`RemoteBackend` stores cache entries in a server speaking the
+Redis protocol (RESP), so every host reads what one of them fetched.
+:class:`Connection` is a minimal client that sends commands in
+pipelines: a bulk lookup is a single `MGET` round trip, and an
+invalidation is `DEL` and `PUBLISH` in one write.
+
+Entries are serialized compactly: a flag byte, the time they were
+stored and the JSON payload, compressed with zlib when large.
+
+:class:`FakeRedis` runs the same commands in process, to test without
+a server.
+"""
+import json
+import socket
+import struct
+import threading
+import time
+import zlib
+
+from azion import forks
+from azion.exceptions import AzionException
+
+PLAIN = b'j'
+COMPRESSED = b'z'
+STORED_AT = struct.Struct('<d')
+
+
+class RemoteCacheError(AzionException):
+    """The cache server answered a command with an error."""
+    pass
+
+
+def encode_entry(stored_at, value, compress_threshold=1024):
+    """Serialize a `(stored_at, value)` cache entry.
+
+    :param int compress_threshold: compress payloads of at least this
+        many bytes.
+    :rtype: bytes
+    """
+    payload = json.dumps(value, separators=(',', ':')).encode('utf-8')
+    flag = PLAIN
+    if len(payload) >= compress_threshold:
+        payload = zlib.compress(payload, 1)
+        flag = COMPRESSED
+    return flag + STORED_AT.pack(stored_at) + payload
+
+
+def decode_entry(data):
+    """Return the `(stored_at, value)` entry serialized in `data`."""
+    flag = data[:1]
+    stored_at, = STORED_AT.unpack_from(data, 1)
+    payload = data[1 + STORED_AT.size:]
+    if flag == COMPRESSED:
+        payload = zlib.decompress(payload)
+    return stored_at, json.loads(payload)
+
+
+def encode_command(*args):
+    """Encode a command as a RESP array of bulk strings."""
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode('utf-8')
+        elif not isinstance(arg, bytes):
+            arg = str(arg).encode('ascii')
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(stream):
+    """Read one RESP reply from a binary file object.
+
+    Errors are returned as :class:`RemoteCacheError` instances, so
+    the other replies of a pipeline can still be read.
+    """
+    line = stream.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionError('Connection closed by the cache server')
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest.decode('utf-8')
+    if kind == b'-':
+        return RemoteCacheError(rest.decode('utf-8'))
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        length = int(rest)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        length = int(rest)
+        if length < 0:
+            return None
+        return [read_reply(stream) for _ in range(length)]
+    raise RemoteCacheError(f'Unexpected reply: {line!r}')
+
+
+class Connection(object):
+    """Connection to a server speaking the Redis protocol.
+
+    It is safe to share between threads: commands are serialized on
+    a single socket, opened on first use and again after an error.
+
+    :param str host: server host.
+    :param int port: server port.
+    :param float timeout: socket timeout, in seconds.
+    """
+
+    def __init__(self, host='localhost', port=6379, timeout=1.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+        self.stream = None
+        self.lock = threading.Lock()
+        forks.register(self)
+
+    def after_fork(self):
+        """Drop the socket inherited from the parent process. It is
+        closed without a shutdown, so the parent keeps using it."""
+        self.lock = threading.Lock()
+        self._close()
+
+    def connect(self):
+        sock = socket.create_connection(
+            (self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock, sock.makefile('rb')
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+    def _close(self):
+        if self.sock is not None:
+            self.stream.close()
+            self.sock.close()
+        self.sock = self.stream = None
+
+    def execute(self, *args):
+        """Run a command and return its reply."""
+        return self.pipeline([args])[0]
+
+    def pipeline(self, commands):
+        """Send several commands at once and return their replies.
+
+        :param list commands: commands as tuples of arguments.
+        :raises: :class:`RemoteCacheError` if a command failed.
+        """
+        data = b''.join(encode_command(*command) for command in commands)
+        with self.lock:
+            if self.sock is None:
+                self.sock, self.stream = self.connect()
+            try:
+                self.sock.sendall(data)
+                replies = [read_reply(self.stream) for _ in commands]
+            except BaseException:
+                # Replies left unread would answer the next commands
+                self._close()
+                raise
+        for reply in replies:
+            if isinstance(reply, RemoteCacheError):
+                raise reply
+        return replies
+
+    def subscribe(self, channel, callback):
+        """Call `callback` with every message published on `channel`,
+        from a background thread.
+
+        :rtype: :class:`Subscription`
+        """
+        return Subscription(self, channel, callback)
+
+
+class Subscription(object):
+    """Messages of a channel, read by a background thread.
+
+    Child processes subscribe again after `os.fork`, with a thread
+    and a socket of their own.
+    """
+
+    def __init__(self, connection, channel, callback):
+        self.connection = connection
+        self.channel = channel
+        self.callback = callback
+        self.closed = False
+        self._start()
+        forks.register(self)
+
+    def _start(self):
+        self.sock, self.stream = self.connection.connect()
+        self.sock.settimeout(None)
+        self.sock.sendall(encode_command('SUBSCRIBE', self.channel))
+        read_reply(self.stream)
+        self.thread = threading.Thread(
+            target=self._listen, name='azion-subscription', daemon=True)
+        self.thread.start()
+
+    def after_fork(self):
+        self.stream.close()
+        self.sock.close()
+        if self.closed:
+            return
+        try:
+            self._start()
+        except OSError:
+            pass
+
+    def _listen(self):
+        while True:
+            try:
+                reply = read_reply(self.stream)
+            except (OSError, ValueError):
+                return
+            if isinstance(reply, list) and reply[0] == b'message':
+                self.callback(reply[2].decode('utf-8'))
+
+    def close(self):
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self.thread.join()
+        self.stream.close()
+
+
+class FakeRedis(object):
+    """In-process stand-in for :class:`Connection`.
+
+    Implements the commands used by :class:`RemoteBackend`: `GET`,
+    `SET` (with `PX`), `MGET`, `DEL`, `PUBLISH` and `SCAN`.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.data = {}
+        self.expires = {}
+        self.subscribers = {}
+        self.commands = 0
+        self.round_trips = 0
+        # Reentrant: subscribers may run commands when notified
+        self.lock = threading.RLock()
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+    def pipeline(self, commands):
+        with self.lock:
+            self.round_trips += 1
+            self.commands += len(commands)
+            replies = [self._run(*command) for command in commands]
+        for reply in replies:
+            if isinstance(reply, RemoteCacheError):
+                raise reply
+        return replies
+
+    def subscribe(self, channel, callback):
+        with self.lock:
+            self.subscribers.setdefault(channel, []).append(callback)
+        return FakeSubscription(self, channel, callback)
+
+    def _encode(self, value):
+        if isinstance(value, str):
+            return value.encode('utf-8')
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode('ascii')
+
+    def _get(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= self.clock():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def _run(self, name, *args):
+        name = name.upper()
+        if name == 'GET':
+            return self._get(self._encode(args[0]))
+        if name == 'MGET':
+            return [self._get(self._encode(key)) for key in args]
+        if name == 'SET':
+            key = self._encode(args[0])
+            self.data[key] = self._encode(args[1])
+            self.expires.pop(key, None)
+            if len(args) == 4 and self._encode(args[2]).upper() == b'PX':
+                self.expires[key] = self.clock() + int(args[3]) / 1000
+            return 'OK'
+        if name == 'DEL':
+            deleted = 0
+            for key in map(self._encode, args):
+                self.expires.pop(key, None)
+                deleted += self.data.pop(key, None) is not None
+            return deleted
+        if name == 'PUBLISH':
+            channel = self._encode(args[0]).decode('utf-8')
+            callbacks = self.subscribers.get(channel, [])
+            for callback in callbacks:
+                callback(self._encode(args[1]).decode('utf-8'))
+            return len(callbacks)
+        if name == 'SCAN':
+            prefix = self._encode(args[2]).rstrip(b'*')
+            keys = [key for key in self.data if key.startswith(prefix)]
+            return [b'0', keys]
+        return RemoteCacheError(f'ERR unknown command {name}')
+
+
+class FakeSubscription(object):
+
+    def __init__(self, redis, channel, callback):
+        self.redis = redis
+        self.channel = channel
+        self.callback = callback
+
+    def close(self):
+        with self.redis.lock:
+            self.redis.subscribers[self.channel].remove(self.callback)
+
+
+class RemoteBackend(object):
+    """Cache backend stored in a Redis-compatible server.
+
+    .. code-block:: python
+
+        backend = RemoteBackend(Connection('cache.internal'))
+        azion = Azion(token, cache=Cache(backend, ttl=60))
+
+    The server failing never fails an API call: reads are then
+    misses and writes are skipped, and `errors` is incremented. So
+    are entries that cannot be decoded.
+
+    :param object connection: :class:`Connection`, or
+        :class:`FakeRedis` in tests.
+    :param str prefix: prefix of every key.
+    :param str channel: channel where the keys of invalidated
+        entries are published.
+    :param int compress_threshold: compress entries of at least this
+        many bytes.
+    """
+
+    def __init__(self, connection=None, prefix='azion:',
+                 channel='azion:invalidations', compress_threshold=1024):
+        self.connection = connection if connection is not None \
+            else Connection()
+        self.prefix = prefix
+        self.channel = channel
+        self.compress_threshold = compress_threshold
+        self.errors = 0
+
+    def _run(self, commands, default):
+        try:
+            return self.connection.pipeline(commands)
+        except (OSError, RemoteCacheError):
+            self.errors += 1
+            return default
+
+    def _decode(self, data):
+        if data is None:
+            return None
+        try:
+            return decode_entry(data)
+        except (ValueError, struct.error, zlib.error):
+            # Corrupted, or written by something else: a miss
+            self.errors += 1
+            return None
+
+    def get(self, key):
+        """Return the `(stored_at, value)` entry of a key, or `None`."""
+        data, = self._run([('GET', self.prefix + key)], [None])
+        return self._decode(data)
+
+    def get_many(self, keys):
+        """Return the entries of several keys in one round trip.
+
+        :rtype: list of `(stored_at, value)` tuples or `None`.
+        """
+        keys = list(keys)
+        if not keys:
+            return []
+        replies, = self._run(
+            [['MGET'] + [self.prefix + key for key in keys]],
+            [[None] * len(keys)])
+        return [self._decode(data) for data in replies]
+
+    def set(self, key, stored_at, value, ttl=None):
+        command = ['SET', self.prefix + key,
+                   encode_entry(stored_at, value, self.compress_threshold)]
+        if ttl:
+            command += ['PX', int(ttl * 1000)]
+        self._run([command], None)
+
+    def delete(self, key):
+        """Delete an entry and publish its key on `channel`."""
+        self._run([('DEL', self.prefix + key),
+                   ('PUBLISH', self.channel, key)], None)
+
+    def clear(self):
+        cursor = b'0'
+        while True:
+            reply, = self._run(
+                [('SCAN', cursor, 'MATCH', self.prefix + '*')], [None])
+            if reply is None:
+                return
+            cursor, keys = reply
+            if keys:
+                self._run([['DEL'] + keys], None)
+            if cursor == b'0':
+                return
+
+    def subscribe(self, callback):
+        """Call `callback` with the key of every entry invalidated by
+        any host, e.g. to drop it from a local cache.
+
+        :returns: subscription object with a `close` method.
+        """
+        return self.connection.subscribe(self.channel, callback)
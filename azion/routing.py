@@ -0,0 +1,119 @@
+"""Map a `Host` header to the configuration that serves it.
+
+Exact names (domain names and CNAMEs) are kept in a dict. Wildcard
+CNAMEs like `*.example.com` are kept in a trie of reversed labels, so
+the most specific wildcard wins.
+
+The index is immutable: :meth:`HostResolver.refresh` builds a new one
+and swaps it in with a single assignment, so readers never block.
+"""
+
+
+def normalize_host(host):
+    """Lowercase a host and strip its port and trailing dot."""
+    host = host.strip().lower()
+    if host.startswith('['):
+        return host.split(']', 1)[0] + ']'
+    host = host.rsplit(':', 1)[0] if host.count(':') == 1 else host
+    return host.rstrip('.')
+
+
+def configuration_names(configuration):
+    """Return every name served by a configuration: its domain name
+    and CNAMEs."""
+    cname = configuration.cname or []
+    if isinstance(cname, str):
+        cname = cname.split(',')
+    names = [configuration.domain_name] + list(cname)
+    return [normalize_host(name) for name in names if name and name.strip()]
+
+
+class HostIndex(object):
+    """Immutable lookup structure built from a list of configurations."""
+
+    # Key used inside the trie to store the configuration
+    # of a wildcard ending at that node.
+    WILDCARD = '*'
+
+    def __init__(self, configurations):
+        self.exact = {}
+        self.wildcards = {}
+        self.n_wildcards = 0
+        for configuration in configurations:
+            for name in configuration_names(configuration):
+                if name.startswith('*.'):
+                    self._insert_wildcard(name[2:], configuration)
+                else:
+                    self.exact.setdefault(name, configuration)
+
+    def _insert_wildcard(self, suffix, configuration):
+        node = self.wildcards
+        for label in reversed(suffix.split('.')):
+            node = node.setdefault(label, {})
+        if self.WILDCARD not in node:
+            node[self.WILDCARD] = configuration
+            self.n_wildcards += 1
+
+    def resolve(self, host):
+        configuration = self.exact.get(host)
+        if configuration is not None:
+            return configuration
+        if not self.wildcards:
+            return None
+
+        labels = host.split('.')
+        node = self.wildcards
+        match = None
+        # A wildcard matches at least one extra label,
+        # so the first label never ends a match.
+        for label in reversed(labels[1:]):
+            node = node.get(label)
+            if node is None:
+                break
+            match = node.get(self.WILDCARD, match)
+        return match
+
+    def __len__(self):
+        """Number of names indexed, exact and wildcard."""
+        return len(self.exact) + self.n_wildcards
+
+
+class HostResolver(object):
+    """Resolve hosts to configurations.
+
+    .. code-block:: python
+
+        resolver = HostResolver(azion.list_configurations())
+        configuration = resolver.resolve('www.example.com:443')
+
+    :param list configurations:
+        Configurations used to build the initial index.
+    """
+
+    def __init__(self, configurations=()):
+        self.index = HostIndex(configurations)
+
+    def refresh(self, configurations):
+        """Rebuild the index from a new list of configurations.
+
+        The new index is built aside and swapped atomically;
+        concurrent :meth:`resolve` calls see either the old or
+        the new index, never a partial one.
+        """
+        self.index = HostIndex(configurations)
+
+    def refresh_from(self, azion):
+        """Rebuild the index from
+        :func:`~azion.client.Azion.list_configurations`."""
+        self.refresh(azion.list_configurations())
+
+    def resolve(self, host):
+        """Return the configuration serving `host`, or `None`.
+
+        :param str host: a `Host` header value, optionally with port.
+        """
+        index = self.index
+        configuration = index.exact.get(host)
+        if configuration is not None:
+            return configuration
+        return index.resolve(normalize_host(host))
@@ -0,0 +1,337 @@
+"""Compact binary encoding of models.
+
+:func:`dumps` encodes a model, or a list of models of the same type,
+in the MessagePack format, and :func:`loads` decodes it back:
+
+.. code-block:: python
+
+    data = dumps(azion.list_origins(configuration_id))
+    origins = loads(data)
+
+Fields are stored by position, in schema order, with nested addresses
+as nested arrays and dates as MessagePack timestamps, so a list of
+origins takes about a third of the bytes of its JSON. The payload starts with
+:data:`SCHEMA_VERSION`, which changes whenever a schema changes in a
+way that makes older payloads unreadable; :func:`loads` refuses
+payloads of another version.
+
+Encoding uses the `msgpack` package when it is installed, and falls
+back to :func:`packb` and :func:`unpackb` otherwise: a pure-Python
+codec implementing only the types found in models, which is slower
+than JSON. Both produce the same bytes, so payloads can be written
+with one and read with the other.
+"""
+import datetime
+import struct
+
+import pendulum
+
+from azion.models import Model, dumpers
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+SCHEMA_VERSION = 1
+
+TIMESTAMP = -1
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def dumps(obj):
+    """Encode a model or a list of models.
+
+    :rtype: bytes
+    """
+    if isinstance(obj, list):
+        model = next((type(item) for item in obj if item is not None),
+                     None)
+        values = []
+        if model is not None:
+            to_values = dumpers(model).to_values
+            values = [None if item is None else to_values(item)
+                      for item in obj]
+        return _packb([SCHEMA_VERSION, _schema_name(model), True, values])
+    model = type(obj)
+    return _packb([SCHEMA_VERSION, _schema_name(model), False,
+                   dumpers(model).to_values(obj)])
+
+
+def loads(data):
+    """Decode the output of :func:`dumps`.
+
+    :raises: `ValueError` if the payload has another schema version
+        or an unknown model.
+    """
+    version, name, many, values = _unpackb(data)
+    if version != SCHEMA_VERSION:
+        raise ValueError(f'Unsupported schema version {version}, '
+                         f'expected {SCHEMA_VERSION}')
+    if name is None:
+        return []
+    try:
+        model = Model.registry[name]
+    except KeyError:
+        raise ValueError(f'Unknown model {name}') from None
+    from_values = dumpers(model).from_values
+    if many:
+        return [None if item is None else from_values(item)
+                for item in values]
+    return from_values(values)
+
+
+def _schema_name(model):
+    """Name of the model declaring the schema of `model`, so lazy
+    and custom subclasses are encoded as their base model."""
+    if model is None:
+        return None
+    for base in model.__mro__:
+        if 'schema' in base.__dict__:
+            return base.__name__
+    raise TypeError(f'{model.__name__} has no schema')
+
+
+def packb(obj):
+    """Encode `obj` in MessagePack.
+
+    Supports `None`, booleans, integers, floats, strings, bytes,
+    lists, tuples, dicts and aware datetime objects (as timestamps).
+    """
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+
+def _pack(obj, out):
+    if obj is None:
+        out.append(0xc0)
+    elif obj is True:
+        out.append(0xc3)
+    elif obj is False:
+        out.append(0xc2)
+    elif isinstance(obj, int):
+        _pack_int(obj, out)
+    elif isinstance(obj, float):
+        out += struct.pack('>Bd', 0xcb, obj)
+    elif isinstance(obj, str):
+        encoded = obj.encode('utf-8')
+        _pack_header(len(encoded), out, 0xa0, 32, 0xd9, 0xda, 0xdb)
+        out += encoded
+    elif isinstance(obj, (bytes, bytearray)):
+        _pack_header(len(obj), out, None, 0, 0xc4, 0xc5, 0xc6)
+        out += obj
+    elif isinstance(obj, (list, tuple)):
+        _pack_header(len(obj), out, 0x90, 16, None, 0xdc, 0xdd)
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, dict):
+        _pack_header(len(obj), out, 0x80, 16, None, 0xde, 0xdf)
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    elif isinstance(obj, datetime.datetime):
+        payload = _timestamp(obj)
+        if len(payload) in (4, 8):
+            out += struct.pack('>Bb', 0xd6 if len(payload) == 4 else 0xd7,
+                               TIMESTAMP)
+        else:
+            out += struct.pack('>BBb', 0xc7, len(payload), TIMESTAMP)
+        out += payload
+    else:
+        raise TypeError(f'Cannot encode {type(obj).__name__}')
+
+
+def _pack_int(value, out):
+    if 0 <= value < 0x80 or -32 <= value < 0:
+        out += struct.pack('>b' if value < 0 else '>B', value)
+    elif value >= 0:
+        for code, fmt, limit in ((0xcc, 'B', 1 << 8), (0xcd, 'H', 1 << 16),
+                                 (0xce, 'I', 1 << 32), (0xcf, 'Q', 1 << 64)):
+            if value < limit:
+                out += struct.pack(f'>B{fmt}', code, value)
+                return
+        raise OverflowError(value)
+    else:
+        for code, fmt, limit in ((0xd0, 'b', 1 << 7), (0xd1, 'h', 1 << 15),
+                                 (0xd2, 'i', 1 << 31), (0xd3, 'q', 1 << 63)):
+            if value >= -limit:
+                out += struct.pack(f'>B{fmt}', code, value)
+                return
+        raise OverflowError(value)
+
+
+def _pack_header(length, out, fix, fix_limit, code8, code16, code32):
+    if fix is not None and length < fix_limit:
+        out.append(fix | length)
+    elif code8 is not None and length < 1 << 8:
+        out += struct.pack('>BB', code8, length)
+    elif length < 1 << 16:
+        out += struct.pack('>BH', code16, length)
+    else:
+        out += struct.pack('>BI', code32, length)
+
+
+def _timestamp_parts(date):
+    if date.tzinfo is None:
+        raise ValueError('Cannot encode a naive datetime')
+    delta = date - EPOCH
+    return delta.days * 86400 + delta.seconds, delta.microseconds * 1000
+
+
+def _timestamp(date):
+    """Payload of the timestamp extension encoding `date`, in the
+    smallest of its formats."""
+    seconds, nanoseconds = _timestamp_parts(date)
+    if 0 <= seconds < 1 << 34:
+        if not nanoseconds and seconds < 1 << 32:
+            return struct.pack('>I', seconds)
+        # timestamp 64: 30 bits of nanoseconds, 34 bits of seconds
+        return struct.pack('>Q', nanoseconds << 34 | seconds)
+    return struct.pack('>Iq', nanoseconds, seconds)
+
+
+def unpackb(data):
+    """Decode MessagePack data encoded by :func:`packb`.
+
+    Timestamps are decoded to UTC `pendulum` datetime objects.
+    """
+    obj, offset = _unpack(memoryview(data), 0)
+    if offset != len(data):
+        raise ValueError('Extra data after the encoded object')
+    return obj
+
+
+def _unpack(data, offset):
+    code = data[offset]
+    offset += 1
+    if code < 0x80:
+        return code, offset
+    if code >= 0xe0:
+        return code - 0x100, offset
+    if 0xa0 <= code <= 0xbf:
+        return _string(data, offset, code & 0x1f)
+    if 0x90 <= code <= 0x9f:
+        return _array(data, offset, code & 0x0f)
+    if 0x80 <= code <= 0x8f:
+        return _map(data, offset, code & 0x0f)
+    if code == 0xc0:
+        return None, offset
+    if code == 0xc2:
+        return False, offset
+    if code == 0xc3:
+        return True, offset
+    if code in _FIXEXT:
+        return _unpack_ext(data, offset, _FIXEXT[code])
+
+    fmt = _FORMATS.get(code)
+    if fmt is None:
+        raise ValueError(f'Unsupported MessagePack type 0x{code:02x}')
+    kind, size = fmt
+    value, = size.unpack_from(data, offset)
+    offset += size.size
+    if kind == 'number':
+        return value, offset
+    if kind == 'str':
+        return _string(data, offset, value)
+    if kind == 'bin':
+        return bytes(data[offset:offset + value]), offset + value
+    if kind == 'array':
+        return _array(data, offset, value)
+    if kind == 'map':
+        return _map(data, offset, value)
+    return _unpack_ext(data, offset, value)
+
+
+def _string(data, offset, length):
+    end = offset + length
+    return str(data[offset:end], 'utf-8'), end
+
+
+def _array(data, offset, length):
+    items = []
+    for _ in range(length):
+        item, offset = _unpack(data, offset)
+        items.append(item)
+    return items, offset
+
+
+def _map(data, offset, length):
+    items = {}
+    for _ in range(length):
+        key, offset = _unpack(data, offset)
+        items[key], offset = _unpack(data, offset)
+    return items, offset
+
+
+def _unpack_ext(data, offset, length):
+    ext_type, = struct.unpack_from('>b', data, offset)
+    offset += 1
+    payload = bytes(data[offset:offset + length])
+    return _ext(ext_type, payload), offset + length
+
+
+def _ext(ext_type, payload):
+    if ext_type != TIMESTAMP:
+        raise ValueError(f'Unsupported extension type {ext_type}')
+    if len(payload) == 4:
+        seconds, = struct.unpack('>I', payload)
+        nanoseconds = 0
+    elif len(payload) == 8:
+        packed, = struct.unpack('>Q', payload)
+        seconds, nanoseconds = packed & (1 << 34) - 1, packed >> 34
+    else:
+        nanoseconds, seconds = struct.unpack('>Iq', payload)
+    return pendulum.instance(
+        EPOCH + datetime.timedelta(seconds=seconds,
+                                   microseconds=nanoseconds // 1000))
+
+
+_FORMATS = {
+    0xcc: ('number', struct.Struct('>B')),
+    0xcd: ('number', struct.Struct('>H')),
+    0xce: ('number', struct.Struct('>I')),
+    0xcf: ('number', struct.Struct('>Q')),
+    0xd0: ('number', struct.Struct('>b')),
+    0xd1: ('number', struct.Struct('>h')),
+    0xd2: ('number', struct.Struct('>i')),
+    0xd3: ('number', struct.Struct('>q')),
+    0xca: ('number', struct.Struct('>f')),
+    0xcb: ('number', struct.Struct('>d')),
+    0xd9: ('str', struct.Struct('>B')),
+    0xda: ('str', struct.Struct('>H')),
+    0xdb: ('str', struct.Struct('>I')),
+    0xc4: ('bin', struct.Struct('>B')),
+    0xc5: ('bin', struct.Struct('>H')),
+    0xc6: ('bin', struct.Struct('>I')),
+    0xdc: ('array', struct.Struct('>H')),
+    0xdd: ('array', struct.Struct('>I')),
+    0xde: ('map', struct.Struct('>H')),
+    0xdf: ('map', struct.Struct('>I')),
+    0xc7: ('ext', struct.Struct('>B')),
+    0xc8: ('ext', struct.Struct('>H')),
+    0xc9: ('ext', struct.Struct('>I')),
+}
+# fixext types, by size of their payload
+_FIXEXT = {0xd4: 1, 0xd5: 2, 0xd6: 4, 0xd7: 8, 0xd8: 16}
+
+
+def _default(obj):
+    # `msgpack` only encodes exact datetime objects natively, and
+    # pendulum ones are subclasses
+    if isinstance(obj, datetime.datetime):
+        return msgpack.Timestamp(*_timestamp_parts(obj))
+    raise TypeError(f'Cannot encode {type(obj).__name__}')
+
+
+if msgpack is not None:
+    def _packb(obj):
+        return msgpack.packb(obj, default=_default)
+
+    def _unpackb(data):
+        # dates come back as UTC datetime objects, which the model
+        # dumpers turn into pendulum ones
+        return msgpack.unpackb(data, timestamp=3)
+else:  # pragma: no cover
+    _packb = packb
+    _unpackb = unpackb
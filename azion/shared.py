@@ -0,0 +1,189 @@
+"""Cache backend shared by every process of a host.
+
+Prefork servers run many workers, each with its own memory. With
+:class:`MmapBackend` the cache entries live in a memory-mapped file, so
+an entry fetched by one worker is served to all of them.
+
+The file is a fixed table of slots. A key is always stored in the slot
+given by its hash, and a newer key evicts an older one that maps to the
+same slot. Every slot starts with a sequence number (a seqlock):
+writers make it odd before changing the slot and even again after, so
+readers never take a lock. They copy the slot and retry if the
+sequence changed meanwhile. Writers serialize through `flock` on the
+file across processes, and through a lock across threads.
+"""
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import contextlib
+import struct
+import threading
+
+from azion import forks
+
+MAGIC = b'AZC1'
+HEADER = struct.Struct('<4sII')
+# sequence, key hash, stored_at, key length, value length
+SLOT_HEADER = struct.Struct('<QQdII')
+
+
+def key_hash(key):
+    """Hash of a key, stable across processes (unlike `hash()`)."""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class MmapBackend(object):
+    """Cache backend stored in a memory-mapped file.
+
+    .. code-block:: python
+
+        backend = MmapBackend('/dev/shm/azion-cache')
+        azion = Azion(token, cache=Cache(backend, ttl=60))
+
+    :param str path: file shared by every process. Put it on a
+        `tmpfs` such as `/dev/shm` to keep it in memory.
+    :param int slots: number of entries the file holds.
+    :param int slot_size: maximum size of a serialized entry, in bytes.
+        Larger entries are not cached.
+    """
+
+    retries = 100
+
+    def __init__(self, path, slots=1024, slot_size=64 * 1024):
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.oversized = 0
+        self.size = HEADER.size + slots * slot_size
+        self.lock = threading.Lock()
+        self._open()
+        forks.register(self)
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            self._check_layout(fd)
+            self.map = mmap.mmap(fd, self.size)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        except BaseException:
+            os.close(fd)
+            raise
+        self.fd = fd
+
+    def _check_layout(self, fd):
+        """Initialise a new file, or make sure an existing one has the
+        same layout. It is never resized: other processes may have it
+        mapped."""
+        stored_size = os.fstat(fd).st_size
+        if not stored_size:
+            os.ftruncate(fd, self.size)
+            os.pwrite(fd, HEADER.pack(MAGIC, self.slots, self.slot_size), 0)
+            return
+        header = os.pread(fd, HEADER.size, 0)
+        if stored_size != self.size or len(header) != HEADER.size or \
+                HEADER.unpack(header) != (MAGIC, self.slots, self.slot_size):
+            raise ValueError(f'{self.path} holds a cache with another layout')
+
+    def after_fork(self):
+        # The inherited descriptor shares its `flock` with the parent,
+        # so writers of both processes would not exclude each other
+        self.lock = threading.Lock()
+        if self.map.closed:
+            return
+        self.map.close()
+        os.close(self.fd)
+        self._open()
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+    def _offset(self, hashed):
+        return HEADER.size + (hashed % self.slots) * self.slot_size
+
+    def get(self, key):
+        """Return the `(stored_at, value)` entry of a key, or `None`.
+
+        Lock-free: the slot is copied and the copy is discarded if a
+        writer changed the slot meanwhile.
+        """
+        hashed = key_hash(key)
+        offset = self._offset(hashed)
+        encoded_key = key.encode('utf-8')
+        for _ in range(self.retries):
+            sequence, stored_hash, stored_at, key_length, value_length = \
+                SLOT_HEADER.unpack_from(self.map, offset)
+            if sequence % 2:
+                continue
+            if stored_hash != hashed or not value_length:
+                payload = None
+            else:
+                start = offset + SLOT_HEADER.size
+                payload = self.map[start:start + key_length + value_length]
+            if SLOT_HEADER.unpack_from(self.map, offset)[0] != sequence:
+                continue
+            if payload is None or payload[:key_length] != encoded_key:
+                return None
+            return stored_at, json.loads(payload[key_length:])
+        return None
+
+    def set(self, key, stored_at, value, ttl=None):
+        encoded_key = key.encode('utf-8')
+        encoded = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        if SLOT_HEADER.size + len(encoded_key) + len(encoded) > \
+                self.slot_size:
+            self.oversized += 1
+            self.delete(key)
+            return
+        self._write(key_hash(key), stored_at, encoded_key, encoded)
+
+    def delete(self, key):
+        hashed = key_hash(key)
+        offset = self._offset(hashed)
+        with self._locked():
+            # Checked under the writer lock, so a concurrent write can
+            # neither hide the key nor replace it before the tombstone
+            if SLOT_HEADER.unpack_from(self.map, offset)[1] == hashed:
+                self._fill(offset, 0, 0, b'', b'')
+
+    def _write(self, hashed, stored_at, encoded_key, encoded):
+        with self._locked():
+            self._fill(self._offset(hashed), hashed if encoded else 0,
+                       stored_at, encoded_key, encoded)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Exclude other writers, of this process and of others."""
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _fill(self, offset, hashed, stored_at, encoded_key, encoded):
+        """Write a slot. The caller holds the writer locks."""
+        sequence = SLOT_HEADER.unpack_from(self.map, offset)[0]
+        # Odd sequence: readers know a write is in progress
+        struct.pack_into('<Q', self.map, offset, sequence + 1)
+        start = offset + SLOT_HEADER.size
+        self.map[start:start + len(encoded_key) + len(encoded)] = (
+            encoded_key + encoded)
+        SLOT_HEADER.pack_into(
+            self.map, offset, sequence + 1, hashed, stored_at,
+            len(encoded_key), len(encoded))
+        struct.pack_into('<Q', self.map, offset, sequence + 2)
+
+    def version(self, key):
+        """Return the version (sequence number) of the slot holding
+        `key`. It changes every time the slot is written."""
+        return SLOT_HEADER.unpack_from(
+            self.map, self._offset(key_hash(key)))[0]
+
+    def clear(self):
+        for slot in range(self.slots):
+            self._write(slot, 0, b'', b'')
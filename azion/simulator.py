@@ -0,0 +1,649 @@
+"""Local simulator of the Azion API, for load tests.
+
+:class:`Simulator` is an asyncio HTTP server implementing the
+endpoints used by :class:`~azion.client.Azion`: tokens, configurations,
+origins and the three purge endpoints. It keeps its data in memory and
+validates payloads like the API does, with the schemas of
+:mod:`azion.validation`.
+
+To exercise the concurrency, retry and batching behavior of the
+client, it adds latency drawn from a distribution (:class:`Latency`),
+injects errors and timeouts (:class:`Faults`) and enforces the rate
+limit of the API (:class:`RateLimit`):
+
+.. code-block:: python
+
+    simulator = Simulator(latency=Latency('lognormal', 0.05, 0.5),
+                          faults=Faults({429: 0.01, 503: 0.01}))
+    with simulator:
+        session = Session()
+        session.base_url = simulator.url
+        azion = Azion(token='token', session=session)
+        azion.purge_url(urls)
+    print(simulator.stats())
+
+It can also run on its own:
+
+.. code-block:: console
+
+    $ python -m azion.simulator --port 8080 --latency lognormal:0.05:0.5 \\
+        --errors 429=0.01,503=0.01 --configurations 100 --origins 3
+"""
+import argparse
+import asyncio
+import base64
+import collections
+import datetime
+import http
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.parse
+import zlib
+
+from azion.validation import (
+    CONFIGURATION, CONFIGURATION_UPDATE, ORIGIN, Field, Schema)
+
+PURGE = Schema({
+    'urls': Field(list, required=True, minimum=1, items=str),
+    'method': Field(str, required=True, choices=('delete',)),
+})
+
+CONFIGURATION_DEFAULTS = {
+    'active': True, 'delivery_protocol': 'http',
+    'digital_certificate': None, 'cname': [], 'cname_access_only': False,
+    'rawlogs': False,
+}
+CONFIGURATION_FIELDS = ('name',) + tuple(CONFIGURATION_DEFAULTS)
+
+ORIGIN_DEFAULTS = {
+    'origin_path': '', 'origin_type': 'single_origin', 'method': '',
+    'origin_protocol_policy': 'preserve', 'connection_timeout': 60,
+    'timeout_between_bytes': 120,
+}
+ADDRESS_DEFAULTS = {
+    'weight': None, 'server_role': 'primary', 'is_active': True,
+}
+
+CONFIGURATION_ROUTE = re.compile(
+    r'^/content_delivery/configurations/(\d+)$')
+ORIGINS_ROUTE = re.compile(
+    r'^/content_delivery/configurations/(\d+)/origins$')
+
+
+class Latency(object):
+    """Distribution of the time taken to answer a request.
+
+    :param str kind: `constant`, `uniform` (between `median - spread`
+        and `median + spread`), `lognormal` (`spread` is the standard
+        deviation of the logarithm) or `exponential`.
+    :param float median: median latency in seconds.
+    :param float spread: dispersion of the distribution.
+    """
+
+    kinds = ('constant', 'uniform', 'lognormal', 'exponential')
+
+    def __init__(self, kind='constant', median=0.0, spread=0.0):
+        if kind not in self.kinds:
+            raise ValueError(f'Unknown latency distribution: {kind}')
+        self.kind = kind
+        self.median = median
+        self.spread = spread
+
+    @classmethod
+    def parse(cls, text):
+        """Parse `kind:median[:spread]`, as accepted by the command
+        line, `lognormal:0.05:0.5` for instance."""
+        kind, *numbers = text.split(':')
+        return cls(kind, *map(float, numbers))
+
+    def sample(self, rng=random):
+        """Return a latency in seconds."""
+        if self.kind == 'uniform':
+            return max(0.0, rng.uniform(self.median - self.spread,
+                                        self.median + self.spread))
+        if self.kind == 'lognormal':
+            return self.median * math.exp(rng.gauss(0, self.spread))
+        if self.kind == 'exponential' and self.median > 0:
+            # The median of an exponential distribution is mean * ln 2
+            return rng.expovariate(math.log(2) / self.median)
+        return self.median
+
+
+class Faults(object):
+    """Errors injected in responses.
+
+    :param dict errors: probability of answering with each status
+        code, `{429: 0.01, 503: 0.02}` for instance.
+    :param float timeout_rate: probability of never answering.
+    :param float timeout: seconds a timed out request keeps the
+        connection open before closing it.
+    """
+
+    def __init__(self, errors=None, timeout_rate=0.0, timeout=30.0):
+        self.errors = dict(errors or {})
+        self.timeout_rate = timeout_rate
+        self.timeout = timeout
+        if sum(self.errors.values()) + timeout_rate > 1:
+            raise ValueError('Fault probabilities add up to more than 1')
+
+    @classmethod
+    def parse(cls, text, timeout_rate=0.0, timeout=30.0):
+        """Parse `status=probability,...`, as accepted by the command
+        line, `429=0.01,503=0.02` for instance."""
+        errors = {}
+        for item in filter(None, text.split(',')):
+            status, probability = item.split('=')
+            errors[int(status)] = float(probability)
+        return cls(errors, timeout_rate, timeout)
+
+    def pick(self, rng=random):
+        """Return the status code to inject, `'timeout'` or `None`."""
+        draw = rng.random()
+        if draw < self.timeout_rate:
+            return 'timeout'
+        draw -= self.timeout_rate
+        for status, probability in self.errors.items():
+            if draw < probability:
+                return status
+            draw -= probability
+        return None
+
+
+class RateLimit(object):
+    """Requests allowed per token in fixed windows, like the API,
+    which allows 80 requests per minute.
+
+    :param int limit: requests allowed per window.
+    :param float window: length of a window in seconds.
+    """
+
+    def __init__(self, limit=80, window=60.0, clock=time.monotonic):
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        self.windows = {}
+
+    def hit(self, key):
+        """Count a request of `key`.
+
+        :return: whether it is allowed, the remaining requests and
+            the seconds until the window resets.
+        :rtype: tuple
+        """
+        now = self.clock()
+        start, count = self.windows.get(key, (None, 0))
+        if start is None or now >= start + self.window:
+            start, count = now, 0
+        allowed = count < self.limit
+        if allowed:
+            count += 1
+        self.windows[key] = (start, count)
+        return allowed, self.limit - count, start + self.window - now
+
+
+class Response(object):
+    """Response of the simulator, before it is written."""
+
+    def __init__(self, status, payload=None, headers=None):
+        self.status = status
+        self.payload = payload
+        self.headers = headers or {}
+
+    def encode(self, keep_alive=True):
+        body = b''
+        if self.payload is not None:
+            body = json.dumps(self.payload,
+                              separators=(',', ':')).encode('utf-8')
+        reason = http.HTTPStatus(self.status).phrase
+        headers = dict(self.headers)
+        headers['Content-Length'] = str(len(body))
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        if body:
+            headers['Content-Type'] = 'application/json'
+        lines = [f'HTTP/1.1 {self.status} {reason}']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        head = '\r\n'.join(lines) + '\r\n\r\n'
+        return head.encode('latin-1') + body
+
+
+def error(status, detail):
+    return Response(status, {'detail': detail})
+
+
+class Simulator(object):
+    """In-memory implementation of the Azion API.
+
+    :param str host: address to listen on.
+    :param int port: port to listen on, `0` for any free port.
+    :param object latency: :class:`Latency` of every response.
+        Default to none.
+    :param object faults: :class:`Faults` injected. Default to none.
+    :param object rate_limit: :class:`RateLimit` enforced per token.
+        Default to no limit.
+    :param bool strict_auth: only accept tokens created through
+        `/tokens` or given in `tokens`. By default any token is
+        accepted.
+    :param tuple tokens: tokens accepted with `strict_auth`.
+    :param tuple authorized_domains: domains that may be purged,
+        default to any domain. Purges of other domains fail with 403.
+    :param int seed: seed of the random generator, for reproducible
+        runs.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=None, faults=None,
+                 rate_limit=None, strict_auth=False, tokens=(),
+                 authorized_domains=None, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.faults = faults
+        self.rate_limit = rate_limit
+        self.strict_auth = strict_auth
+        self.tokens = set(tokens)
+        self.authorized_domains = (None if authorized_domains is None
+                                   else set(authorized_domains))
+        self.random = random.Random(seed)
+
+        self.configurations = {}
+        self.origins = {}
+        self.purges = []
+        self.ids = collections.Counter()
+
+        self.statuses = collections.Counter()
+        self.routes = collections.Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.tasks = set()
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}'
+
+    def stats(self):
+        """Return metrics of the requests received.
+
+        :rtype: dict
+        """
+        return {
+            'requests': sum(self.statuses.values()),
+            'statuses': dict(self.statuses),
+            'routes': dict(self.routes),
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+        }
+
+    def populate(self, configurations, origins=0):
+        """Create `configurations` configurations with `origins`
+        origins each."""
+        for _ in range(configurations):
+            configuration = self.create_configuration({
+                'name': f'Configuration {self.ids["configuration"] + 1}'})
+            for index in range(origins):
+                self.create_origin(configuration['id'], {
+                    'name': f'Origin {index}',
+                    'host_header': 'www.example.com',
+                    'addresses': [{'address': 'www.origin.com'}]})
+
+    def create_configuration(self, fields):
+        self.ids['configuration'] += 1
+        id = self.ids['configuration']
+        configuration = dict(CONFIGURATION_DEFAULTS, id=id,
+                             domain_name=f'{id}k.ha.azioncdn.net')
+        configuration.update((name, value) for name, value in fields.items()
+                             if name in CONFIGURATION_FIELDS)
+        self.configurations[id] = configuration
+        self.origins[id] = []
+        return configuration
+
+    def create_origin(self, configuration_id, fields):
+        self.ids['origin'] += 1
+        origin = dict(ORIGIN_DEFAULTS, id=self.ids['origin'])
+        origin.update(fields)
+        origin['addresses'] = [dict(ADDRESS_DEFAULTS, **address)
+                               for address in fields['addresses']]
+        self.origins[configuration_id].append(origin)
+        return origin
+
+    def handle(self, method, target, headers, body=b''):
+        """Answer a request, without latency nor faults.
+
+        :param str method: HTTP method, uppercase.
+        :param str target: path of the request.
+        :param dict headers: request headers, with lowercase names.
+        :param bytes body: decoded request body.
+        :rtype: :class:`Response`
+        """
+        path = urllib.parse.urlsplit(target).path.rstrip('/')
+        if path == '/tokens':
+            if method != 'POST':
+                return error(405, f'Method "{method}" not allowed.')
+            return self.create_token(headers)
+
+        token = self.authenticate(headers)
+        if token is None:
+            return error(401, 'Invalid token.')
+        limit_headers = {}
+        if self.rate_limit is not None:
+            allowed, remaining, reset = self.rate_limit.hit(token)
+            limit_headers = {
+                'X-RateLimit-Limit': str(self.rate_limit.limit),
+                'X-RateLimit-Remaining': str(remaining),
+                'X-RateLimit-Reset': (
+                    datetime.datetime.now(datetime.timezone.utc) +
+                    datetime.timedelta(seconds=reset)).isoformat(),
+            }
+            if not allowed:
+                limit_headers['Retry-After'] = str(math.ceil(reset))
+                response = error(429, 'Request was throttled.')
+                response.headers.update(limit_headers)
+                return response
+
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            response = error(400, 'JSON parse error.')
+        else:
+            response = self.route(method, path, data)
+        response.headers.update(limit_headers)
+        return response
+
+    def create_token(self, headers):
+        scheme, _, credentials = headers.get('authorization', '').partition(
+            ' ')
+        try:
+            username, _, password = base64.b64decode(
+                credentials).decode('utf-8').partition(':')
+        except ValueError:
+            username = None
+        if scheme.lower() != 'basic' or not username:
+            return error(401, 'Invalid username/password.')
+        token = '%032x' % self.random.getrandbits(128)
+        self.tokens.add(token)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return Response(201, {
+            'token': token,
+            'created_at': now.isoformat(),
+            'expires_at': (now + datetime.timedelta(days=1)).isoformat()})
+
+    def authenticate(self, headers):
+        """Return the token of the request, or `None` if it is not
+        accepted."""
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        if scheme.lower() != 'token' or not token:
+            return None
+        if self.strict_auth and token not in self.tokens:
+            return None
+        return token
+
+    def route(self, method, path, data):
+        if path == '/content_delivery/configurations':
+            self.routes['configurations'] += 1
+            if method == 'GET':
+                return Response(200, list(self.configurations.values()))
+            if method == 'POST':
+                return self.validated(
+                    CONFIGURATION, data,
+                    lambda: Response(201, self.create_configuration(data)))
+            return error(405, f'Method "{method}" not allowed.')
+
+        match = CONFIGURATION_ROUTE.match(path)
+        if match:
+            self.routes['configuration'] += 1
+            return self.configuration(method, int(match.group(1)), data)
+
+        match = ORIGINS_ROUTE.match(path)
+        if match:
+            self.routes['origins'] += 1
+            id = int(match.group(1))
+            if id not in self.configurations:
+                return error(404, 'Not found.')
+            if method == 'GET':
+                return Response(200, self.origins[id])
+            if method == 'POST':
+                return self.validated(
+                    ORIGIN, data,
+                    lambda: Response(201, self.create_origin(id, data)))
+            return error(405, f'Method "{method}" not allowed.')
+
+        if path in ('/purge/url', '/purge/cachekey', '/purge/wildcard'):
+            kind = path.rsplit('/', 1)[1]
+            self.routes[f'purge_{kind}'] += 1
+            if method != 'POST':
+                return error(405, f'Method "{method}" not allowed.')
+            return self.validated(
+                PURGE, data, lambda: self.purge(kind, data['urls']))
+        return error(404, 'Not found.')
+
+    def validated(self, schema, data, respond):
+        if not isinstance(data, dict):
+            return Response(400, {'errors': ['body must be an object']})
+        errors = schema.validate(data)
+        if errors:
+            return Response(400, {'errors': errors})
+        return respond()
+
+    def configuration(self, method, id, data):
+        configuration = self.configurations.get(id)
+        if configuration is None:
+            return error(404, 'Not found.')
+        if method == 'GET':
+            return Response(200, configuration)
+        if method == 'DELETE':
+            del self.configurations[id]
+            del self.origins[id]
+            return Response(204)
+        if method in ('PATCH', 'PUT'):
+            def update():
+                if method == 'PUT':
+                    configuration.update(CONFIGURATION_DEFAULTS)
+                configuration.update(data)
+                return Response(200, configuration)
+            return self.validated(CONFIGURATION_UPDATE, data, update)
+        return error(405, f'Method "{method}" not allowed.')
+
+    def authorized(self, url):
+        if self.authorized_domains is None:
+            return True
+        url = url.split('://', 1)[-1]
+        return url.split('/', 1)[0] in self.authorized_domains
+
+    def purge(self, kind, urls):
+        authorized = [url for url in urls if self.authorized(url)]
+        denied = [url for url in urls if not self.authorized(url)]
+        self.purges.append((kind, authorized))
+        if kind != 'url':
+            if denied:
+                return error(403, 'Unauthorized domain for your account')
+            return Response(201, {'detail': 'Purge request successfully '
+                                            'created'})
+        results = []
+        if denied:
+            results.append({'status': 'HTTP/1.1 403 FORBIDDEN',
+                            'urls': denied,
+                            'details': 'Unauthorized domain for your '
+                                       'account'})
+        if authorized:
+            results.append({'status': 'HTTP/1.1 201 CREATED',
+                            'urls': authorized,
+                            'details': 'Purge request successfully '
+                                       'created'})
+        return Response(207, results)
+
+    async def respond(self, method, target, headers, body):
+        """Answer a request with latency and faults.
+
+        :return: the response, or `None` to time out.
+        """
+        if self.latency is not None:
+            await asyncio.sleep(self.latency.sample(self.random))
+        fault = self.faults.pick(self.random) if self.faults else None
+        if fault == 'timeout':
+            await asyncio.sleep(self.faults.timeout)
+            return None
+        if fault is not None:
+            response = error(fault, 'Injected error.')
+            if fault == 429:
+                response.headers['Retry-After'] = '1'
+            return response
+
+        encoding = headers.get('content-encoding', 'identity')
+        if encoding in ('gzip', 'deflate'):
+            try:
+                body = zlib.decompress(body, 47)
+            except zlib.error:
+                return error(400, 'Invalid request body encoding.')
+        elif encoding != 'identity':
+            return error(415, f'Unsupported content encoding "{encoding}".')
+        return self.handle(method, target, headers, body)
+
+    async def serve_connection(self, reader, writer):
+        """Answer the requests of a connection until it is closed."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode(
+                    'latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                body = await reader.readexactly(length) if length else b''
+
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                try:
+                    response = await self.respond(
+                        method, target, headers, body)
+                finally:
+                    self.in_flight -= 1
+                if response is None:
+                    self.statuses['timeout'] += 1
+                    break
+                self.statuses[response.status] += 1
+                keep_alive = (version == 'HTTP/1.1' and
+                              headers.get('connection') != 'close')
+                writer.write(response.encode(keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _accept(self, reader, writer):
+        task = self.loop.create_task(self.serve_connection(reader, writer))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def start(self):
+        """Start serving in a background thread."""
+        started = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._accept, self.host, self.port))
+            self.port = self.server.sockets[0].getsockname()[1]
+            started.set()
+            self.loop.run_forever()
+            self._close()
+
+        self.thread = threading.Thread(target=run, daemon=True,
+                                       name='azion-simulator')
+        self.thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        """Stop serving and close open connections."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def _close(self):
+        self.server.close()
+        for task in list(self.tasks):
+            task.cancel()
+        self.loop.run_until_complete(
+            asyncio.gather(*self.tasks, return_exceptions=True))
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+
+    def serve_forever(self):
+        """Serve until interrupted with `Ctrl+C`."""
+        self.start()
+        try:
+            self.thread.join()
+        except KeyboardInterrupt:
+            self.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m azion.simulator',
+        description='Serve a local simulator of the Azion API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument(
+        '--latency', type=Latency.parse, default=None,
+        help='distribution of latencies, as kind:median[:spread] where '
+             'kind is one of ' + ', '.join(Latency.kinds))
+    parser.add_argument(
+        '--errors', default='',
+        help='injected errors, as status=probability,...')
+    parser.add_argument('--timeout-rate', type=float, default=0.0,
+                        help='probability of never answering a request')
+    parser.add_argument('--timeout', type=float, default=30.0,
+                        help='seconds before closing timed out requests')
+    parser.add_argument(
+        '--rate-limit', default=None,
+        help='requests allowed per token, as limit[/window seconds]')
+    parser.add_argument('--strict-auth', action='store_true',
+                        help='only accept tokens created through /tokens')
+    parser.add_argument('--configurations', type=int, default=0,
+                        help='number of configurations to create')
+    parser.add_argument('--origins', type=int, default=0,
+                        help='number of origins of every configuration')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    rate_limit = None
+    if args.rate_limit:
+        limit, _, window = args.rate_limit.partition('/')
+        rate_limit = RateLimit(int(limit), float(window or 60))
+    faults = None
+    if args.errors or args.timeout_rate:
+        faults = Faults.parse(args.errors, args.timeout_rate, args.timeout)
+
+    simulator = Simulator(
+        args.host, args.port, latency=args.latency, faults=faults,
+        rate_limit=rate_limit, strict_auth=args.strict_auth, seed=args.seed)
+    simulator.populate(args.configurations, args.origins)
+    print(f'Serving the Azion API simulator on {simulator.url}')
+    simulator.serve_forever()
+    print(json.dumps(simulator.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
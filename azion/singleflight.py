@@ -0,0 +1,73 @@
+"""Coalesce identical calls in flight.
+
+When many threads ask for the same resource at once, e.g. right after
+a cache expiry, only the first one calls the API. The others wait for
+it and share its result or its exception.
+"""
+import threading
+
+from azion import forks
+
+
+class Call(object):
+    """A call in flight, shared by every caller of the same key."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class Group(object):
+    """Group of calls deduplicated by key.
+
+    .. code-block:: python
+
+        group = Group()
+        group.do(url, lambda: session.get(url))
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.coalesced = 0
+        forks.register(self)
+
+    def after_fork(self):
+        """Forget the calls in flight in the parent process, which
+        never complete in the child."""
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        """Call `fn` unless a call with the same key is in flight,
+        in which case wait for it and return its result.
+
+        If the call raises, every waiter gets the same exception.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
@@ -0,0 +1,216 @@
+"""Validation of request payloads before they are sent.
+
+A payload the API is certain to reject costs a round trip and a share
+of the rate limit. Schemas in this module describe the fields accepted
+by the write endpoints, and are compiled once into a flat list of
+checks, so validating a payload takes a few microseconds:
+
+.. code-block:: python
+
+    errors = CONFIGURATION_UPDATE.validate({'delivery_protocol': 'ftp'})
+
+Every problem of the payload is reported, not only the first one.
+`None` values are treated as absent, as they are never sent.
+"""
+from azion.exceptions import ValidationError
+
+ONE_YEAR = 365 * 24 * 60 * 60
+
+DELIVERY_PROTOCOLS = ('http', 'http,https')
+ORIGIN_PROTOCOL_POLICIES = ('preserve', 'http', 'https')
+CDN_CACHE_SETTINGS = ('honor', 'override')
+ORIGIN_TYPES = ('single_origin', 'load_balancer')
+METHODS = ('', 'ip_hash', 'least_connections', 'round_robin')
+SERVER_ROLES = ('primary', 'backup')
+
+
+class Field(object):
+    """Rules of a single field.
+
+    :param type types: accepted type or tuple of types.
+    :param bool required: whether the field must be present.
+    :param tuple choices: accepted values.
+    :param int minimum: minimum value, or minimum length of strings
+        and lists.
+    :param int maximum: maximum value.
+    :param object items: type of list items, or :class:`Schema`
+        of the dicts they hold.
+    """
+
+    def __init__(self, types, required=False, choices=None, minimum=None,
+                 maximum=None, items=None):
+        self.types = types
+        self.required = required
+        self.choices = choices
+        self.minimum = minimum
+        self.maximum = maximum
+        self.items = items
+
+    def compile(self, name):
+        """Return the checks of this field, as functions taking
+        the value and returning an error message or `None`."""
+        checks = [_type_check(name, self.types)]
+        if self.choices is not None:
+            checks.append(_choice_check(name, self.choices))
+        if self.minimum is not None or self.maximum is not None:
+            checks.append(_range_check(name, self.minimum, self.maximum))
+        return checks
+
+
+def _type_check(name, types):
+    if not isinstance(types, tuple):
+        types = (types,)
+    # bool is a subclass of int, but never a valid number here
+    reject_bool = bool not in types
+    names = ' or '.join(kind.__name__ for kind in types)
+    message = f'{name} must be of type {names}'
+
+    def check(value):
+        if not isinstance(value, types) or (
+                reject_bool and isinstance(value, bool)):
+            return message
+    return check
+
+
+def _choice_check(name, choices):
+    accepted = frozenset(choices)
+    message = f'{name} must be one of {", ".join(map(repr, choices))}'
+
+    def check(value):
+        if value not in accepted:
+            return message
+    return check
+
+
+def _range_check(name, minimum, maximum):
+    def check(value):
+        if isinstance(value, (str, list)):
+            if minimum is not None and len(value) < minimum:
+                return f'{name} must have a length of at least {minimum}'
+            if maximum is not None and len(value) > maximum:
+                return f'{name} must have a length of at most {maximum}'
+        elif minimum is not None and value < minimum:
+            return f'{name} must be at least {minimum}'
+        elif maximum is not None and value > maximum:
+            return f'{name} must be at most {maximum}'
+    return check
+
+
+class Schema(object):
+    """Fields accepted in a payload, compiled into checks.
+
+    :param dict fields: :class:`Field` of every accepted key.
+    :param bool allow_unknown: whether keys without a field are
+        accepted.
+    """
+
+    def __init__(self, fields, allow_unknown=False):
+        self.fields = fields
+        self.allow_unknown = allow_unknown
+        self.required = tuple(name for name, field in fields.items()
+                              if field.required)
+        self.checks = {}
+        self.nested = {}
+        for name, field in fields.items():
+            self.checks[name] = tuple(field.compile(name))
+            if field.items is not None:
+                self.nested[name] = field.items
+
+    def validate(self, data, prefix=''):
+        """Return the list of problems of `data`, empty if valid."""
+        errors = [f'{prefix}{name} is required' for name in self.required
+                  if data.get(name) is None]
+        checks = self.checks
+        for name, value in data.items():
+            if value is None:
+                continue
+            field_checks = checks.get(name)
+            if field_checks is None:
+                if not self.allow_unknown:
+                    errors.append(f'{prefix}{name} is unknown')
+                continue
+            failed = False
+            for check in field_checks:
+                error = check(value)
+                if error is not None:
+                    errors.append(prefix + error)
+                    failed = True
+                    break
+            if not failed and name in self.nested:
+                errors += self._validate_items(
+                    self.nested[name], value, f'{prefix}{name}')
+        return errors
+
+    def _validate_items(self, items, values, prefix):
+        errors = []
+        for index, value in enumerate(values):
+            label = f'{prefix}[{index}]'
+            if isinstance(items, Schema):
+                if isinstance(value, dict):
+                    errors += items.validate(value, f'{label}.')
+                else:
+                    errors.append(f'{label} must be of type dict')
+            elif not isinstance(value, items):
+                errors.append(
+                    f'{label} must be of type {items.__name__}')
+        return errors
+
+    def check(self, data):
+        """Validate `data`.
+
+        :raises: :class:`~azion.exceptions.ValidationError` listing
+            every problem found.
+        """
+        errors = self.validate(data)
+        if errors:
+            raise ValidationError(errors)
+        return data
+
+
+TTL = dict(types=int, minimum=0, maximum=ONE_YEAR)
+TIMEOUT = dict(types=int, minimum=1, maximum=3600)
+
+CONFIGURATION_UPDATE = Schema({
+    'name': Field(str, minimum=1),
+    'cname': Field(list, items=str),
+    'cname_access_only': Field(bool),
+    'delivery_protocol': Field(str, choices=DELIVERY_PROTOCOLS),
+    'digital_certificate': Field(int, minimum=1),
+    'rawlogs': Field(bool),
+    'active': Field(bool),
+})
+
+CONFIGURATION = Schema({
+    'name': Field(str, required=True, minimum=1),
+    'origin_address': Field(str, required=True, minimum=1),
+    'origin_host_header': Field(str, required=True, minimum=1),
+    'cname': Field(list, items=str),
+    'cname_access_only': Field(bool),
+    'delivery_protocol': Field(str, choices=DELIVERY_PROTOCOLS),
+    'digital_certificate': Field(int, minimum=1),
+    'origin_protocol_policy': Field(
+        str, choices=ORIGIN_PROTOCOL_POLICIES),
+    'browser_cache_settings': Field(bool),
+    'browser_cache_settings_maximum_ttl': Field(**TTL),
+    'cdn_cache_settings': Field(str, choices=CDN_CACHE_SETTINGS),
+    'cdn_cache_settings_maximum_ttl': Field(**TTL),
+})
+
+ADDRESS = Schema({
+    'address': Field(str, required=True, minimum=1),
+    'weight': Field(int, minimum=0),
+    'server_role': Field(str, choices=SERVER_ROLES),
+    'is_active': Field(bool),
+})
+
+ORIGIN = Schema({
+    'name': Field(str, required=True, minimum=1),
+    'origin_type': Field(str, choices=ORIGIN_TYPES),
+    'method': Field(str, choices=METHODS),
+    'host_header': Field(str, required=True, minimum=1),
+    'origin_protocol_policy': Field(
+        str, choices=ORIGIN_PROTOCOL_POLICIES),
+    'addresses': Field(list, required=True, minimum=1, items=ADDRESS),
+    'connection_timeout': Field(**TIMEOUT),
+    'timeout_between_bytes': Field(**TIMEOUT),
+})
@@ -0,0 +1,208 @@
+"""Watch configurations and origins for changes.
+
+The API has no change feed, so :class:`Watcher` polls it. Every payload
+is reduced to a digest and compared with the previous one, so unchanged
+resources are skipped without a field by field comparison. Only
+field-level differences are reported.
+
+Origins need one request per configuration. Instead of fetching all of
+them on every poll, a slice of the configurations is visited per poll
+in round robin, spreading the load evenly over time.
+"""
+import itertools
+import random
+import time
+
+from azion.export import configuration_record, origin_record, record_digest
+
+
+class Change(object):
+    """A change detected between two polls.
+
+    .. attribute:: kind
+
+        One of `added`, `removed` or `changed`.
+
+    .. attribute:: resource
+
+        Either `configuration` or `origin`.
+
+    .. attribute:: id
+
+        ID of the changed resource.
+
+    .. attribute:: configuration_id
+
+        ID of the configuration owning the resource.
+
+    .. attribute:: diff
+
+        Dict mapping each changed field to an `(old, new)` tuple.
+    """
+
+    def __init__(self, kind, resource, id, configuration_id, diff):
+        self.kind = kind
+        self.resource = resource
+        self.id = id
+        self.configuration_id = configuration_id
+        self.diff = diff
+
+    def __repr__(self):
+        return f'<Change [{self.kind} {self.resource} {self.id}]>'
+
+
+def diff_records(old, new):
+    """Return the fields that differ between two records.
+
+    :param dict old: previous record. `None` when the resource was added.
+    :param dict new: current record. `None` when the resource was removed.
+    :rtype: dict
+    """
+    old = old or {}
+    new = new or {}
+    return {
+        field: (old.get(field), new.get(field))
+        for field in sorted(set(old) | set(new))
+        if old.get(field) != new.get(field)
+    }
+
+
+def _compare(resource, configuration_id, previous, current):
+    """Compare two `{id: (digest, record)}` snapshots."""
+    changes = []
+    for id in sorted(set(previous) | set(current)):
+        old = previous.get(id)
+        new = current.get(id)
+        if old and new and old[0] == new[0]:
+            continue
+        if old is None:
+            kind = 'added'
+        elif new is None:
+            kind = 'removed'
+        else:
+            kind = 'changed'
+        changes.append(Change(
+            kind, resource, id,
+            id if configuration_id is None else configuration_id,
+            diff_records(old and old[1], new and new[1])))
+    return changes
+
+
+def _snapshot(records):
+    return {
+        record['id']: (record_digest(record), record) for record in records}
+
+
+class Watcher(object):
+    """Poll configurations and origins and report their changes.
+
+    The first poll records a baseline and reports nothing. The polling
+    interval is halved when changes are found and grows back
+    otherwise, staying within `min_interval` and `max_interval`.
+
+    :param object azion:
+        :class:`~azion.client.Azion` instance.
+    :param float interval:
+        Initial interval between polls, in seconds.
+    :param float min_interval:
+        Shortest interval between polls.
+    :param float max_interval:
+        Longest interval between polls.
+    :param int origins_per_poll:
+        How many configurations have their origins fetched on each
+        poll. Default to all of them.
+    :param float jitter:
+        Random fraction added to or removed from every interval
+        so many watchers do not poll in lockstep.
+    """
+
+    def __init__(self, azion, interval=30, min_interval=5,
+                 max_interval=300, origins_per_poll=None, jitter=0.1,
+                 sleep=time.sleep):
+        self.azion = azion
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.origins_per_poll = origins_per_poll
+        self.jitter = jitter
+        self.sleep = sleep
+
+        self.listing_digest = None
+        self.configurations = None
+        self.origins = {}
+        self.cursor = 0
+
+    def poll(self):
+        """Poll the API once and return the list of changes."""
+        changes = self._poll_configurations()
+        changes.extend(self._poll_origins())
+
+        if changes:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        return changes
+
+    def _poll_configurations(self):
+        records = [configuration_record(configuration) for configuration
+                   in self.azion.list_configurations()]
+        digest = record_digest(records)
+        if digest == self.listing_digest:
+            return []
+        self.listing_digest = digest
+
+        current = _snapshot(records)
+        previous, self.configurations = self.configurations, current
+        if previous is None:
+            return []
+
+        for removed in set(previous) - set(current):
+            self.origins.pop(removed, None)
+        return _compare('configuration', None, previous, current)
+
+    def _poll_origins(self):
+        ids = sorted(self.configurations)
+        if not ids:
+            return []
+        count = min(self.origins_per_poll or len(ids), len(ids))
+        start = self.cursor % len(ids)
+        batch = list(itertools.islice(
+            itertools.cycle(ids), start, start + count))
+        self.cursor = start + count
+
+        changes = []
+        for configuration_id in batch:
+            current = _snapshot(
+                origin_record(origin) for origin
+                in self.azion.list_origins(configuration_id))
+            previous = self.origins.get(configuration_id)
+            self.origins[configuration_id] = current
+            if previous is not None:
+                changes.extend(
+                    _compare('origin', configuration_id, previous, current))
+        return changes
+
+    def next_interval(self):
+        """Return the time to wait before the next poll,
+        with jitter applied."""
+        spread = self.interval * self.jitter
+        return max(0, self.interval + random.uniform(-spread, spread))
+
+    def __iter__(self):
+        """Poll forever, yielding every change as it is detected."""
+        while True:
+            yield from self.poll()
+            self.sleep(self.next_interval())
+
+
+def watch(azion, **kwargs):
+    """Yield changes of configurations and origins forever.
+
+    .. code-block:: python
+
+        for change in watch(azion, interval=60):
+            print(change.kind, change.resource, change.id, change.diff)
+
+    Keyword arguments are passed to :class:`Watcher`.
+    """
+    return iter(Watcher(azion, **kwargs))
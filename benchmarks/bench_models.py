@@ -0,0 +1,83 @@
+"""Compare model construction with the generated loaders against
+the previous `load_data` methods.
+
+Run with `python benchmarks/bench_models.py`.
+"""
+import timeit
+
+from azion.models import Origin, many_of
+
+
+def origin_data(id):
+    return {
+        'id': id, 'name': f'Origin {id}', 'origin_type': 'single_origin',
+        'method': '', 'host_header': 'www.example.com',
+        'origin_protocol_policy': 'http',
+        'addresses': [{'address': f'origin{n}.example.com', 'weight': None,
+                       'server_role': 'primary', 'is_active': True}
+                      for n in range(3)],
+        'connection_timeout': 60, 'timeout_between_bytes': 120}
+
+
+def legacy_instance_from_data(model, data):
+    if not data:
+        return None
+    return model(data)
+
+
+def legacy_many_of(model, data):
+    if not data:
+        return []
+    return [legacy_instance_from_data(model, resource) for
+            resource in data]
+
+
+class LegacyAddress(object):
+    """`Address` as it was before generated loaders."""
+
+    def __init__(self, data):
+        self.load_data(data)
+
+    def load_data(self, data):
+        self.address = data['address']
+        self.weight = data['weight']
+        self.server_role = data['server_role']
+        self.is_active = data['is_active']
+
+
+class LegacyOrigin(object):
+    """`Origin` as it was before generated loaders."""
+
+    def __init__(self, data):
+        self.load_data(data)
+
+    def load_data(self, data):
+        self.id = data['id']
+        self.name = data['name']
+        self.origin_type = data['origin_type']
+        self.method = data['method']
+        self.host_header = data['host_header']
+        self.origin_protocol_policy = data['origin_protocol_policy']
+        self.addresses = legacy_many_of(LegacyAddress, data['addresses'])
+        self.connection_timeout = data['connection_timeout']
+        self.timeout_between_bytes = data['timeout_between_bytes']
+
+
+def main(size=10000, repeat=5):
+    payload = [origin_data(id) for id in range(size)]
+    cases = [
+        ('load_data', lambda: legacy_many_of(LegacyOrigin, payload)),
+        ('many_of', lambda: many_of(Origin, payload)),
+        ('many_of tolerant', lambda: many_of(Origin, payload, True)),
+        ('Origin(data)', lambda: [Origin(data) for data in payload]),
+    ]
+    baseline = None
+    for name, case in cases:
+        elapsed = min(timeit.repeat(case, number=1, repeat=repeat))
+        baseline = baseline or elapsed
+        print(f'{name:<20} {elapsed * 1000:8.1f} ms '
+              f'{baseline / elapsed:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
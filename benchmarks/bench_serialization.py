@@ -0,0 +1,48 @@
+"""Measure the round-trip cost of serializing models.
+
+Run with `python benchmarks/bench_serialization.py`.
+"""
+import json
+import timeit
+
+from azion.models import Origin, many_of
+from azion.serialization import dumps, loads
+
+
+def origin_data(id):
+    return {
+        'id': id, 'name': f'Origin {id}', 'origin_type': 'single_origin',
+        'method': '', 'host_header': 'www.example.com',
+        'origin_protocol_policy': 'http',
+        'addresses': [{'address': f'origin{n}.example.com', 'weight': None,
+                       'server_role': 'primary', 'is_active': True}
+                      for n in range(3)],
+        'connection_timeout': 60, 'timeout_between_bytes': 120}
+
+
+def json_round_trip(origins):
+    encoded = json.dumps([origin.to_dict() for origin in origins],
+                         separators=(',', ':'))
+    return many_of(Origin, json.loads(encoded)), len(encoded)
+
+
+def binary_round_trip(origins):
+    encoded = dumps(origins)
+    return loads(encoded), len(encoded)
+
+
+def main(size=10000, repeat=5):
+    origins = many_of(Origin, [origin_data(id) for id in range(size)])
+    cases = [
+        ('to_dict + JSON', lambda: json_round_trip(origins)),
+        ('binary', lambda: binary_round_trip(origins)),
+    ]
+    for name, case in cases:
+        elapsed = min(timeit.repeat(case, number=1, repeat=repeat))
+        encoded_size = case()[1]
+        print(f'{name:<16} {elapsed * 1000:8.1f} ms '
+              f'{encoded_size:>10} bytes')
+
+
+if __name__ == '__main__':
+    main()
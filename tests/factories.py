@@ -0,0 +1,47 @@
+"""Helpers to build models and fake clients for unit tests."""
+from unittest import mock
+
+from azion.concurrency import AdaptiveLimiter
+from azion.models import Configuration, Origin
+
+
+def configuration_data(id, name='My configuration', **kwargs):
+    data = {
+        'id': id, 'name': name,
+        'domain_name': f'{id}a.ha.azion.net', 'active': True,
+        'delivery_protocol': 'http', 'digital_certificate': None,
+        'cname': ['www.example.com'], 'cname_access_only': False,
+        'rawlogs': False}
+    data.update(kwargs)
+    return data
+
+
+def origin_data(id, addresses=('www.myorigin.com',), **kwargs):
+    data = {
+        'id': id, 'name': 'Dummy origin', 'origin_type': 'single_origin',
+        'method': '', 'host_header': 'www.example.com',
+        'origin_protocol_policy': 'http',
+        'addresses': [{'address': address, 'weight': None,
+                       'server_role': 'primary', 'is_active': True}
+                      for address in addresses],
+        'connection_timeout': 60, 'timeout_between_bytes': 120}
+    data.update(kwargs)
+    return data
+
+
+def make_configuration(id, name='My configuration', **kwargs):
+    return Configuration(configuration_data(id, name, **kwargs))
+
+
+def make_origin(id, addresses=('www.myorigin.com',), **kwargs):
+    return Origin(origin_data(id, addresses, **kwargs))
+
+
+def create_client(configurations, origins):
+    """Fake `Azion` client returning the given models."""
+    client = mock.Mock()
+    client.limiter = AdaptiveLimiter()
+    client.cached.return_value = {}
+    client.list_configurations.return_value = configurations
+    client.list_origins.side_effect = lambda id: origins.get(id, [])
+    return client
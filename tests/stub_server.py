@@ -0,0 +1,54 @@
+"""Minimal local HTTP server used by tests that need real sockets."""
+import http.server
+import json
+import socketserver
+import threading
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """Answer every request with the JSON body configured in the
+    server, recording the received requests."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def handle_request(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        self.server.requests.append((self.command, self.path,
+                                     dict(self.headers), body))
+        status, payload = self.server.respond(self)
+        encoded = json.dumps(payload).encode('utf-8') if payload else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = handle_request
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, respond):
+        super(StubServer, self).__init__(('127.0.0.1', 0), StubHandler)
+        self.respond = respond
+        self.requests = []
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def __enter__(self):
+        thread = threading.Thread(
+            target=self.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
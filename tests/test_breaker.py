@@ -0,0 +1,112 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from azion.breaker import Breakers, CircuitBreaker, endpoint_family
+from azion.client import Azion, Session
+from azion.exceptions import (
+    BulkheadFull, CircuitOpen, NotFound, ServerError)
+
+from .test_client import create_mocked_session
+from .test_concurrency import Clock, create_error
+
+
+class TestCircuitBreaker(object):
+
+    def test_endpoint_family(self):
+        assert endpoint_family(('purge', 'url')) == 'purge'
+        assert endpoint_family(
+            ('content_delivery', 'configurations', 1)) == 'content_delivery'
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == 'closed'
+        breaker.record_failure()
+        assert breaker.state == 'open'
+        with pytest.raises(CircuitOpen):
+            breaker.allow()
+
+    def test_half_open_trial(self):
+        clock = Clock()
+        breaker = CircuitBreaker(
+            failure_threshold=1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+
+        clock.now = 10
+        breaker.allow()
+        assert breaker.state == 'half_open'
+        with pytest.raises(CircuitOpen):
+            breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == 'open'
+
+        clock.now = 20
+        breaker.allow()
+        breaker.record_success()
+        assert breaker.state == 'closed'
+
+
+class TestBreakers(object):
+
+    def test_guard_isolates_families(self):
+        breakers = Breakers(failure_threshold=1)
+        with pytest.raises(ServerError):
+            with breakers.guard(('purge', 'url')):
+                raise create_error(ServerError, 503)
+        with pytest.raises(CircuitOpen):
+            with breakers.guard(('purge', 'wildcard')):
+                pass
+        with breakers.guard(('content_delivery', 'configurations')):
+            pass
+        assert breakers.states() == {
+            'purge': 'open', 'content_delivery': 'closed'}
+
+    def test_client_errors_do_not_open_circuit(self):
+        breakers = Breakers(failure_threshold=1)
+        with pytest.raises(NotFound):
+            with breakers.guard(('content_delivery',)):
+                raise create_error(NotFound, 404)
+        assert breakers.states() == {'content_delivery': 'closed'}
+
+    def test_bulkhead(self):
+        breakers = Breakers(bulkheads={'purge': 1})
+        entered = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with breakers.guard(('purge', 'url')):
+                entered.set()
+                release.wait()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        entered.wait()
+        with pytest.raises(BulkheadFull):
+            with breakers.guard(('purge', 'url')):
+                pass
+        with breakers.guard(('content_delivery',)):
+            pass
+        release.set()
+        thread.join()
+
+    def test_isolate_mounts_pool_per_family(self):
+        session = Session()
+        Breakers(bulkheads={'purge': 3}).isolate(session)
+        purge = session.get_adapter('https://api.azion.net/purge/url')
+        other = session.get_adapter('https://api.azion.net/tokens')
+        assert purge is not other
+        assert purge._pool_maxsize == 3
+
+    def test_client_uses_breakers(self):
+        mocked_session = create_mocked_session()
+        mocked_session.get.return_value = mock.Mock(status_code=503)
+        client = Azion(
+            session=mocked_session, breakers=Breakers(failure_threshold=1))
+        with pytest.raises(ServerError):
+            client.get_configuration(1)
+        with pytest.raises(CircuitOpen):
+            client.get_configuration(1)
+        assert mocked_session.get.call_count == 1
@@ -0,0 +1,116 @@
+import gzip
+import io
+import json
+
+from azion.buffers import BufferPool, encode_json_into, read_into
+from azion.client import Azion, Session
+
+from .factories import configuration_data
+from .stub_server import StubHandler, StubServer
+
+
+class GzipHandler(StubHandler):
+    """Answer with a gzip-compressed JSON body."""
+
+    def do_GET(self):
+        status, payload = self.server.respond(self)
+        encoded = gzip.compress(json.dumps(payload).encode('utf-8'))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+
+class TestBufferPool(object):
+
+    def test_reuse(self):
+        pool = BufferPool(size=16)
+        buffer = pool.acquire()
+        pool.release(buffer)
+        assert pool.acquire() is buffer
+        assert pool.allocations == 1
+
+    def test_acquire_grows_buffer(self):
+        pool = BufferPool(size=16)
+        pool.release(pool.acquire())
+        assert len(pool.acquire(100)) >= 100
+
+    def test_large_buffers_are_dropped(self):
+        pool = BufferPool(size=16, max_size=32)
+        pool.release(bytearray(64))
+        assert not pool.buffers
+
+    def test_encode_json_into(self):
+        buffer = bytearray(4)
+        size = encode_json_into({'urls': ['a', 'b'], 'method': 'delete'},
+                                buffer)
+        assert json.loads(bytes(buffer[:size])) == {
+            'urls': ['a', 'b'], 'method': 'delete'}
+
+    def test_read_into(self):
+        buffer = bytearray(3)
+        size = read_into(io.BytesIO(b'0123456789'), buffer, chunk_size=4)
+        assert bytes(buffer[:size]) == b'0123456789'
+
+
+class TestBufferedSession(object):
+
+    def test_json_round_trip(self):
+        def respond(handler):
+            return 200, configuration_data(1, name='ção')
+
+        with StubServer(respond) as server:
+            session = Session(buffer_pool=BufferPool(size=8))
+            session.base_url = server.url
+            client = Azion(session=session)
+            configuration = client.get_configuration(1)
+            assert configuration.name == 'ção'
+            assert session.buffer_pool.buffers
+
+    def test_gzip_response(self):
+        def respond(handler):
+            return 200, configuration_data(1, name='ção')
+
+        with StubServer(respond) as server:
+            server.RequestHandlerClass = GzipHandler
+            session = Session(buffer_pool=BufferPool(size=8))
+            session.base_url = server.url
+            configuration = Azion(session=session).get_configuration(1)
+            assert configuration.name == 'ção'
+
+    def test_request_body_from_pool(self):
+        def respond(handler):
+            return 201, None
+
+        with StubServer(respond) as server:
+            session = Session(buffer_pool=BufferPool())
+            session.base_url = server.url
+            client = Azion(session=session)
+            assert client.purge_cache_key(['www.domain.com/'])
+            _, path, headers, body = server.requests[0]
+            assert path == '/purge/cachekey'
+            assert json.loads(body) == {
+                'urls': ['www.domain.com/'], 'method': 'delete'}
+
+    def test_request_body_larger_than_buffer(self):
+        def respond(handler):
+            return 201, None
+
+        urls = [f'www.domain.com/{index}' for index in range(100)]
+        with StubServer(respond) as server:
+            session = Session(buffer_pool=BufferPool(size=64))
+            session.base_url = server.url
+            client = Azion(session=session)
+            assert client.purge_cache_key(urls)
+            _, _, _, body = server.requests[0]
+            assert len(body) > 64
+            assert json.loads(body) == {'urls': urls, 'method': 'delete'}
+
+    def test_empty_body(self):
+        with StubServer(lambda handler: (200, None)) as server:
+            session = Session(buffer_pool=BufferPool())
+            response = session.get(server.url)
+            assert response.json() is None
+            assert response.content == b''
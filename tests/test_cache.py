@@ -0,0 +1,232 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from azion import protocol
+from azion.cache import Cache, MemoryBackend, cache_key
+from azion.client import Azion, Session
+from azion.concurrency import AdaptiveLimiter
+from azion.exceptions import (
+    BulkheadFull, CircuitOpen, NotFound, ServerError)
+
+from .factories import configuration_data
+from .stub_server import StubServer
+from .test_client import create_mocked_session
+from .test_concurrency import Clock, create_error
+from .test_stress import echo
+
+
+def create_cache(**kwargs):
+    clock = Clock()
+    return clock, Cache(clock=clock, **kwargs)
+
+
+class TestCache(object):
+
+    def test_cache_key_hides_token(self):
+        key = cache_key('https://api.azion.net/foo', 'secret')
+        assert 'secret' not in key
+        assert key.endswith('https://api.azion.net/foo')
+        assert cache_key('https://api.azion.net/foo') == (
+            'https://api.azion.net/foo')
+
+    def test_fresh_hit(self):
+        clock, cache = create_cache(ttl=10)
+        loader = mock.Mock(return_value=1)
+        assert cache.fetch('key', loader) == 1
+        clock.now = 10
+        assert cache.fetch('key', loader) == 1
+        assert loader.call_count == 1
+        assert cache.stats()['hits'] == 1
+
+    def test_expired_entry_is_reloaded(self):
+        clock, cache = create_cache(ttl=10)
+        loader = mock.Mock(side_effect=[1, 2])
+        cache.fetch('key', loader)
+        clock.now = 11
+        assert cache.fetch('key', loader) == 2
+
+    def test_stale_while_revalidate(self):
+        clock, cache = create_cache(ttl=10, stale_while_revalidate=10)
+        cache.fetch('key', lambda: 1)
+        clock.now = 15
+        refreshed = threading.Event()
+
+        def loader():
+            refreshed.set()
+            return 2
+
+        assert cache.fetch('key', loader) == 1
+        assert refreshed.wait(1)
+        cache.executor.shutdown(wait=True)
+        assert cache.backend.get('key') == (15, 2)
+        assert cache.stats()['stale_hits'] == 1
+
+    def test_stale_if_error(self):
+        clock, cache = create_cache(ttl=10, stale_if_error=100)
+        cache.fetch('key', lambda: 1)
+
+        def failing():
+            raise create_error(ServerError, 503)
+
+        clock.now = 50
+        assert cache.fetch('key', failing) == 1
+        assert cache.stats()['errors_served'] == 1
+
+        clock.now = 111
+        with pytest.raises(ServerError):
+            cache.fetch('key', failing)
+
+    @pytest.mark.parametrize('error', [CircuitOpen, BulkheadFull])
+    def test_stale_if_rejected(self, error):
+        clock, cache = create_cache(ttl=10, stale_if_error=100)
+        cache.fetch('key', lambda: 1)
+        clock.now = 50
+
+        def rejected():
+            raise error('rejected')
+
+        assert cache.fetch('key', rejected) == 1
+
+    def test_client_errors_are_not_hidden(self):
+        clock, cache = create_cache(ttl=10, stale_if_error=100)
+        cache.fetch('key', lambda: 1)
+        clock.now = 50
+
+        def failing():
+            raise create_error(NotFound, 404)
+
+        with pytest.raises(NotFound):
+            cache.fetch('key', failing)
+
+    def test_load_started_before_invalidation_is_not_stored(self):
+        clock, cache = create_cache(ttl=10)
+
+        def loader():
+            cache.invalidate('key')
+            return 'outdated'
+
+        assert cache.fetch('key', loader) == 'outdated'
+        assert cache.backend.get('key') is None
+        assert cache.fetch('key', lambda: 'new') == 'new'
+        assert cache.fetch('key', lambda: 'other') == 'new'
+
+    def test_refresh_started_before_invalidation_is_not_stored(self):
+        clock, cache = create_cache(ttl=10, stale_while_revalidate=10)
+        cache.fetch('key', lambda: 1)
+        clock.now = 15
+        started, invalidated = threading.Event(), threading.Event()
+
+        def loader():
+            started.set()
+            invalidated.wait(1)
+            return 2
+
+        assert cache.fetch('key', loader) == 1
+        assert started.wait(1)
+        cache.invalidate('key')
+        invalidated.set()
+        cache.executor.shutdown(wait=True)
+        assert cache.backend.get('key') is None
+
+    def test_invalidated_while_storing(self):
+        clock, cache = create_cache(ttl=10)
+        store = cache.backend.set
+
+        def set(*args):
+            # Invalidated between the check and the write
+            cache.invalidate('key')
+            store(*args)
+
+        cache.backend.set = set
+        cache.fetch('key', lambda: 'outdated')
+        assert cache.backend.get('key') is None
+
+    def test_generations_are_pruned(self):
+        clock, cache = create_cache(ttl=10)
+
+        def loader():
+            cache.invalidate('key')
+            return 1
+
+        cache.fetch('key', loader)
+        cache.invalidate('other')
+        assert cache.loading == {}
+        assert cache.generations == {}
+
+    def test_memory_backend(self):
+        backend = MemoryBackend()
+        backend.set('key', 1, 'value')
+        assert backend.get('key') == (1, 'value')
+        backend.delete('key')
+        assert backend.get('key') is None
+
+
+class TestClientCache(object):
+
+    def create_client(self):
+        mocked_session = create_mocked_session()
+        mocked_session.auth.token = 'foobar'
+        response = mock.Mock(status_code=200)
+        response.json.return_value = configuration_data(1)
+        mocked_session.get.return_value = response
+        mocked_session.patch.return_value = response
+        return mocked_session, Azion(session=mocked_session, cache=Cache())
+
+    def test_reads_are_cached(self):
+        mocked_session, client = self.create_client()
+        first = client.get_configuration(1)
+        second = client.get_configuration(1)
+        assert first.id == second.id == 1
+        assert first is not second
+        assert mocked_session.get.call_count == 1
+
+    def test_models_are_copies(self):
+        mocked_session, client = self.create_client()
+        client.get_configuration(1).cname.append('www.other.com')
+        client.get_configuration(1).cname.append('www.other.com')
+        assert client.get_configuration(1).cname == ['www.example.com']
+
+    def test_refresh_uses_thread_options(self):
+        clock = Clock()
+        with StubServer(echo) as server:
+            session = Session()
+            session.base_url = server.url
+            cache = Cache(ttl=10, stale_while_revalidate=10, clock=clock)
+            client = Azion(token='token', session=session, cache=cache)
+            with session.thread_options(headers={'X-Thread': 'caller'}):
+                client.get_configuration(1)
+                clock.now = 15
+                client.get_configuration(1)
+            cache.executor.shutdown(wait=True)
+        assert [request[2]['X-Thread'] for request in server.requests] == [
+            'caller', 'caller']
+
+    def test_hits_do_not_take_slots(self):
+        mocked_session, client = self.create_client()
+        client.limiter = AdaptiveLimiter()
+        for _ in range(3):
+            client.get_configuration(1)
+        stats = client.limiter.stats()
+        assert stats['successes'] == 1
+        assert list(stats['baselines']) == [
+            'get content_delivery/configurations/{id}']
+
+    def test_raw_results_are_copies(self):
+        mocked_session, client = self.create_client()
+        client.get_configuration(1, raw=True)['name'] = 'Changed'
+        client.get_configuration(1, raw=True)['name'] = 'Changed'
+        assert client.get_configuration(1).name == 'My configuration'
+        [raw] = client.cached([protocol.get_configuration(1)],
+                              raw=True).values()
+        raw['name'] = 'Changed'
+        assert client.get_configuration(1, raw=True)['name'] == (
+            'My configuration')
+
+    def test_writes_invalidate(self):
+        mocked_session, client = self.create_client()
+        client.get_configuration(1)
+        client.partial_update_configuration(1, name='Renamed')
+        client.get_configuration(1)
+        assert mocked_session.get.call_count == 2
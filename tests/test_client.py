@@ -4,6 +4,8 @@ import requests
 
 from azion.client import Azion, Session
 
+from .factories import configuration_data
+
 
 def build_url(*args, **kwargs):
     """Mock `build_url` by injecting the real function
@@ -26,7 +28,9 @@ def create_mocked_session():
     session.post.return_value = None
     session.put.return_value = None
     session.base_url = 'https://api.azion.net'
+    session.pool_maxsize = 10
     session.build_url = build_url
+    session.bind_thread_options.side_effect = lambda fn: fn
 
     return session
 
@@ -117,7 +121,7 @@ class TestAzionClient(object):
             }
         )
 
-    @mock.patch('azion.client.handle_multi_status')
+    @mock.patch('azion.protocol.handle_multi_status')
     def test_purge_url(self, mock_handler):
         mocked_session = create_mocked_session()
         client = Azion(session=mocked_session)
@@ -224,3 +228,17 @@ class TestAzionClient(object):
                 'timeout_between_bytes': 120
             }
         )
+
+
+class TestReadOptions(object):
+
+    def test_list_configurations_projection(self):
+        mocked_session = create_mocked_session()
+        response = mock.Mock(status_code=200)
+        response.json.return_value = [configuration_data(1)]
+        mocked_session.get.return_value = response
+        client = Azion(session=mocked_session)
+        assert client.list_configurations(raw=True, fields=['id']) == [
+            {'id': 1}]
+        configuration, = client.list_configurations(lazy=True)
+        assert configuration.domain_name == '1a.ha.azion.net'
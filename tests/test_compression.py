@@ -0,0 +1,70 @@
+import gzip
+import json
+
+import pytest
+
+from azion import compression
+from azion.buffers import BufferPool
+from azion.client import Azion, Session
+
+from .stub_server import StubServer
+
+URLS = [f'www.domain.com/{index}.jpg' for index in range(100)]
+
+
+class TestCompression(object):
+
+    def test_accept_encoding(self):
+        assert 'gzip' in compression.accept_encoding()
+        assert Session().headers['Accept-Encoding'] == (
+            compression.accept_encoding())
+
+    def test_only_encodings_decoded_by_urllib3(self, monkeypatch):
+        monkeypatch.setattr(compression, 'zstandard', object())
+        monkeypatch.setattr(compression, 'brotli', object())
+        monkeypatch.setattr('urllib3.response.HAS_ZSTD', False,
+                            raising=False)
+        monkeypatch.setattr('urllib3.response.brotli', None, raising=False)
+        assert compression.available_encodings() == ['gzip', 'deflate']
+        monkeypatch.setattr('urllib3.response.HAS_ZSTD', True)
+        assert compression.available_encodings() == [
+            'zstd', 'gzip', 'deflate']
+
+    def test_compress(self):
+        assert gzip.decompress(compression.compress(b'foo')) == b'foo'
+        with pytest.raises(ValueError):
+            compression.compress(b'foo', 'deflate')
+
+    @pytest.mark.parametrize('buffer_pool', [None, BufferPool()])
+    def test_compressed_request_body(self, buffer_pool):
+        with StubServer(lambda handler: (201, None)) as server:
+            session = Session(buffer_pool=buffer_pool, compress_threshold=64)
+            session.base_url = server.url
+            assert Azion(session=session).purge_cache_key(URLS)
+
+            _, _, headers, body = server.requests[0]
+            assert headers['Content-Encoding'] == 'gzip'
+            assert json.loads(gzip.decompress(body))['urls'] == URLS
+
+    def test_small_bodies_are_not_compressed(self):
+        with StubServer(lambda handler: (201, None)) as server:
+            session = Session(compress_threshold=10 ** 6)
+            session.base_url = server.url
+            assert Azion(session=session).purge_cache_key(URLS)
+            _, _, headers, body = server.requests[0]
+            assert 'Content-Encoding' not in headers
+            assert json.loads(body)['urls'] == URLS
+
+    def test_fallback_when_not_supported(self):
+        def respond(handler):
+            if handler.headers.get('Content-Encoding'):
+                return 415, {'detail': 'Unsupported media type'}
+            return 201, None
+
+        with StubServer(respond) as server:
+            session = Session(compress_threshold=64)
+            session.base_url = server.url
+            assert Azion(session=session).purge_cache_key(URLS)
+            assert session.compress_threshold is None
+            assert len(server.requests) == 2
+            assert json.loads(server.requests[1][3])['urls'] == URLS
@@ -0,0 +1,116 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from azion.concurrency import AdaptiveLimiter, endpoint_key, is_overload
+from azion.exceptions import (
+    BadRequest, QueueFull, ServerError, TooManyRequests)
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def create_error(error_class, status_code):
+    response = mock.Mock(status_code=status_code)
+    response.json.return_value = {}
+    return error_class(response)
+
+
+class TestAdaptiveLimiter(object):
+
+    def test_is_overload(self):
+        assert is_overload(create_error(TooManyRequests, 429))
+        assert is_overload(create_error(ServerError, 503))
+        assert not is_overload(create_error(BadRequest, 400))
+        assert not is_overload(ValueError())
+
+    def test_additive_increase(self):
+        limiter = AdaptiveLimiter(initial=2, maximum=3)
+        for _ in range(3):
+            limiter.acquire()
+            limiter.release(0.1)
+        assert limiter.limit == 3
+        for _ in range(10):
+            limiter.acquire()
+            limiter.release(0.1)
+        assert limiter.limit == 3
+
+    def test_multiplicative_decrease_on_overload(self):
+        clock = Clock()
+        limiter = AdaptiveLimiter(initial=16, clock=clock)
+        with pytest.raises(TooManyRequests):
+            with limiter.slot():
+                clock.now += 0.1
+                raise create_error(TooManyRequests, 429)
+        assert limiter.limit == 8
+        assert limiter.stats()['overloads'] == 1
+
+        # Failures within the same round trip count once
+        limiter.acquire()
+        limiter.release(0.05, overload=True)
+        assert limiter.limit == 8
+
+        clock.now += 1
+        limiter.acquire()
+        limiter.release(0.1, overload=True)
+        assert limiter.limit == 4
+
+    def test_decrease_on_latency_inflation(self):
+        limiter = AdaptiveLimiter(initial=10, latency_tolerance=2)
+        limiter.acquire()
+        limiter.release(0.1)
+        limiter.acquire()
+        limiter.release(1.0)
+        assert limiter.limit == 5
+
+    def test_baseline_per_endpoint(self):
+        limiter = AdaptiveLimiter(initial=10, latency_tolerance=2)
+        limiter.acquire()
+        limiter.release(0.1, key='get purge')
+        # Another endpoint being slower is not an inflation
+        limiter.acquire()
+        limiter.release(1.0, key='post purge/url')
+        assert limiter.limit == 10
+        limiter.acquire()
+        limiter.release(1.0, key='get purge')
+        assert limiter.limit == 5
+
+    def test_endpoint_key(self):
+        assert endpoint_key('get', ('content_delivery', 'configurations',
+                                    1, 'origins')) == (
+            'get content_delivery/configurations/{id}/origins')
+
+    def test_other_errors_do_not_adapt(self):
+        limiter = AdaptiveLimiter(initial=4)
+        with pytest.raises(ValueError):
+            with limiter.slot():
+                raise ValueError()
+        assert limiter.stats() == {
+            'limit': 4, 'in_flight': 0, 'latencies': {},
+            'baselines': {}, 'successes': 0, 'overloads': 0}
+
+    def test_blocks_above_limit(self):
+        limiter = AdaptiveLimiter(initial=1)
+        limiter.acquire()
+        with pytest.raises(QueueFull):
+            limiter.acquire(timeout=0.01)
+
+        released = threading.Timer(0.01, limiter.release, args=(0.1,))
+        released.start()
+        limiter.acquire(timeout=1)
+        assert limiter.stats()['in_flight'] == 1
+
+    def test_reentrant_slot(self):
+        limiter = AdaptiveLimiter(initial=1, maximum=1)
+        with limiter.slot(timeout=0.01):
+            with limiter.slot(timeout=0.01):
+                assert limiter.stats()['in_flight'] == 1
+        assert limiter.stats()['in_flight'] == 0
+        assert limiter.stats()['successes'] == 1
@@ -0,0 +1,182 @@
+import inspect
+import pickle
+import socket
+
+import pytest
+import requests
+from urllib3.connectionpool import HTTPConnectionPool
+
+from azion.client import Azion, Session
+from azion.connections import (
+    DNSCache, DNSCacheAdapter, connection_pool, warmup)
+
+from .stub_server import StubServer
+from .test_concurrency import Clock
+
+
+class Resolver(object):
+    """Resolve every host to the loopback address, counting calls."""
+
+    def __init__(self, address='127.0.0.1'):
+        self.address = address
+        self.calls = []
+
+    def __call__(self, host, port, family=0, type=0):
+        self.calls.append((host, port))
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '',
+                 (self.address, port))]
+
+
+def idle_connections(session, url):
+    pool = connection_pool(session, url)
+    return [connection for connection in list(pool.pool.queue)
+            if connection is not None and connection.sock is not None]
+
+
+class TestDNSCache(object):
+
+    def test_resolve_once_within_ttl(self):
+        clock = Clock()
+        resolver = Resolver()
+        cache = DNSCache(ttl=60, resolver=resolver, clock=clock)
+        assert cache.resolve('api.azion.net', 443) == ['127.0.0.1']
+        clock.now = 59
+        assert cache.resolve('api.azion.net', 443) == ['127.0.0.1']
+        assert len(resolver.calls) == 1
+        assert cache.stats() == {'hits': 1, 'misses': 1, 'hosts': 1}
+
+    def test_resolve_again_after_ttl(self):
+        clock = Clock()
+        resolver = Resolver()
+        cache = DNSCache(ttl=60, resolver=resolver, clock=clock)
+        cache.resolve('api.azion.net', 443)
+        clock.now = 60
+        cache.resolve('api.azion.net', 443)
+        assert len(resolver.calls) == 2
+
+    def test_invalidate(self):
+        resolver = Resolver()
+        cache = DNSCache(resolver=resolver)
+        cache.resolve('api.azion.net', 443)
+        cache.invalidate('api.azion.net', 443)
+        cache.resolve('api.azion.net', 443)
+        assert len(resolver.calls) == 2
+        cache.clear()
+        assert cache.stats()['hosts'] == 0
+
+    def test_unique_addresses(self):
+        def resolver(host, port, family, type):
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, '',
+                     ('10.0.0.1', port)),
+                    (socket.AF_INET, socket.SOCK_STREAM, 6, '',
+                     ('10.0.0.2', port)),
+                    (socket.AF_INET, socket.SOCK_STREAM, 6, '',
+                     ('10.0.0.1', port))]
+
+        cache = DNSCache(resolver=resolver)
+        assert cache.resolve('api.azion.net', 443) == [
+            '10.0.0.1', '10.0.0.2']
+
+
+class TestDNSCacheAdapter(object):
+
+    def test_connect_to_cached_address(self):
+        resolver = Resolver()
+        with StubServer(lambda handler: (200, {'ok': True})) as server:
+            port = server.server_address[1]
+            session = requests.Session()
+            session.mount('http://', DNSCacheAdapter(
+                DNSCache(resolver=resolver)))
+            for _ in range(3):
+                response = session.get(f'http://stub.invalid:{port}/')
+                assert response.json() == {'ok': True}
+            # New connections resolve through the cache too
+            session.close()
+            session.get(f'http://stub.invalid:{port}/')
+        assert resolver.calls == [('stub.invalid', port)]
+        assert server.requests[0][2]['Host'] == f'stub.invalid:{port}'
+
+    def test_invalidate_on_connection_failure(self):
+        with StubServer(lambda handler: (200, None)) as server:
+            port = server.server_address[1]
+        cache = DNSCache(resolver=Resolver())
+        session = requests.Session()
+        session.mount('http://', DNSCacheAdapter(cache))
+        with pytest.raises(requests.ConnectionError):
+            session.get(f'http://stub.invalid:{port}/')
+        assert cache.stats()['hosts'] == 0
+
+    def test_try_every_cached_address(self):
+        def resolver(host, port, family, type):
+            # Nothing listens on the first address
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, '',
+                     ('127.0.0.2', port)),
+                    (socket.AF_INET, socket.SOCK_STREAM, 6, '',
+                     ('127.0.0.1', port))]
+
+        cache = DNSCache(resolver=resolver)
+        with StubServer(lambda handler: (200, {'ok': True})) as server:
+            port = server.server_address[1]
+            session = requests.Session()
+            session.mount('http://', DNSCacheAdapter(cache))
+            response = session.get(f'http://stub.invalid:{port}/')
+            assert response.json() == {'ok': True}
+        assert cache.stats()['hosts'] == 1
+
+    def test_unpickled_adapter(self):
+        adapter = pickle.loads(pickle.dumps(
+            DNSCacheAdapter(DNSCache(resolver=Resolver()))))
+        assert isinstance(adapter.dns_cache, DNSCache)
+        assert adapter.dns_cache.stats()['hosts'] == 0
+
+    def test_session_dns_cache(self):
+        cache = DNSCache(resolver=Resolver())
+        session = Session(dns_cache=cache, pool_maxsize=4)
+        adapter = session.get_adapter(session.base_url)
+        assert isinstance(adapter, DNSCacheAdapter)
+        assert adapter._pool_maxsize == 4
+        assert adapter.dns_cache is cache
+
+
+class TestWarmup(object):
+
+    def test_open_idle_connections(self):
+        with StubServer(lambda handler: (200, None)) as server:
+            session = Session(pool_maxsize=4)
+            assert warmup(session, server.url, 3) == 3
+            assert len(idle_connections(session, server.url)) == 3
+            # Connections are opened, no request is sent
+            assert server.requests == []
+            session.get(server.url)
+            assert len(idle_connections(session, server.url)) == 3
+
+    def test_private_pool_api(self):
+        # warmup borrows connections with these private methods
+        assert list(inspect.signature(
+            HTTPConnectionPool._get_conn).parameters) == ['self', 'timeout']
+        assert list(inspect.signature(
+            HTTPConnectionPool._put_conn).parameters) == ['self', 'conn']
+
+    def test_limited_to_pool_size(self):
+        with StubServer(lambda handler: (200, None)) as server:
+            session = Session(pool_maxsize=2)
+            assert warmup(session, server.url, 10) == 2
+
+    def test_failed_connections_are_skipped(self):
+        with StubServer(lambda handler: (200, None)) as server:
+            url = server.url
+        session = Session(pool_maxsize=2)
+        assert warmup(session, url, 2) == 0
+        assert idle_connections(session, url) == []
+
+    def test_client_warmup(self):
+        resolver = Resolver()
+        with StubServer(lambda handler: (200, None)) as server:
+            port = server.server_address[1]
+            session = Session(pool_maxsize=3,
+                              dns_cache=DNSCache(resolver=resolver))
+            session.base_url = f'http://stub.invalid:{port}'
+            client = Azion(session=session)
+            assert client.warmup() == 3
+            assert len(idle_connections(session, session.base_url)) == 3
+        assert len(resolver.calls) == 1
@@ -1,7 +1,7 @@
 import json
+from unittest import mock
 
-
-from azion.exceptions import BadRequest, handle_error
+from azion.exceptions import BadRequest, ServerError, handle_error
 
 
 class Response(object):
@@ -21,3 +21,14 @@ class TestExceptions(object):
         assert error.status_code == 400
         assert response == error.response
         assert repr(error) == '<BadRequest [400]>'
+
+    def test_handle_unknown_server_error(self):
+        response = Response()
+        response.status_code = 502
+        error = handle_error(response)
+        assert isinstance(error, ServerError)
+
+    def test_errors_without_json_body(self):
+        response = mock.Mock(status_code=500)
+        response.json.side_effect = ValueError
+        assert handle_error(response).errors is None
@@ -0,0 +1,92 @@
+import csv
+import json
+import os
+from unittest import mock
+
+import pytest
+
+from azion import export
+
+from .factories import create_client, make_configuration, make_origin
+
+
+class TestExport(object):
+
+    def test_iter_inventory(self):
+        client = create_client(
+            [make_configuration(1), make_configuration(2)],
+            {1: [make_origin(10)]})
+        pairs = dict(
+            (configuration.id, origins) for configuration, origins in
+            export.iter_inventory(client, max_workers=1))
+        assert sorted(pairs) == [1, 2]
+        assert pairs[1][0].id == 10
+        assert pairs[2] == []
+
+    def test_iter_inventory_projection(self):
+        client = create_client([make_configuration(1)], {})
+        client.list_origins.side_effect = None
+        client.list_origins.return_value = [{'id': 10}]
+        pairs = list(export.iter_inventory(
+            client, raw=True, fields=('id',)))
+        assert pairs[0][1] == [{'id': 10}]
+        client.list_origins.assert_called_once_with(
+            1, raw=True, fields=('id',))
+
+    def test_export_ndjson(self, tmpdir):
+        client = create_client(
+            [make_configuration(1)], {1: [make_origin(10)]})
+        path = str(tmpdir.join('inventory.ndjson'))
+        assert export.export_inventory(client, path) == 1
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        assert records[0]['id'] == 1
+        assert records[0]['origins'][0]['addresses'][0]['address'] == 'www.myorigin.com'  # noqa
+
+    def test_export_csv(self, tmpdir):
+        client = create_client(
+            [make_configuration(1)],
+            {1: [make_origin(10, addresses=('a.com', 'b.com'))]})
+        path = str(tmpdir.join('inventory.csv'))
+        export.export_inventory(client, path, fmt='csv')
+        with open(path) as f:
+            rows = list(csv.DictReader(f))
+        assert [row['address_address'] for row in rows] == ['a.com', 'b.com']
+        assert rows[0]['configuration_cname'] == 'www.example.com'
+
+    def test_export_parquet(self, tmpdir):
+        pyarrow = pytest.importorskip('pyarrow')
+        import pyarrow.parquet
+        path = str(tmpdir.join('inventory.parquet'))
+        with open(path, 'wb') as f:
+            # The first row group has no origins: every origin and
+            # address column of the batch is None
+            writer = export.ParquetWriter(f, batch_size=1)
+            writer.write(export.configuration_record(
+                make_configuration(1), []))
+            writer.write(export.configuration_record(
+                make_configuration(2), [make_origin(10)]))
+            writer.close()
+        table = pyarrow.parquet.read_table(path)
+        assert table.schema == export.parquet_schema()
+        assert table.column('origin_id').to_pylist() == [None, 10]
+        assert table.schema.field('address_weight').type == pyarrow.int64()
+
+    def test_unsupported_format(self, tmpdir):
+        with pytest.raises(ValueError):
+            export.export_inventory(
+                mock.Mock(), str(tmpdir.join('x')), fmt='xml')
+
+    def test_export_incremental(self, tmpdir):
+        origins = {1: [make_origin(10)], 2: [make_origin(20)]}
+        client = create_client(
+            [make_configuration(1), make_configuration(2)], origins)
+        directory = str(tmpdir)
+
+        assert sorted(export.export_incremental(client, directory)) == [1, 2]
+        assert export.export_incremental(client, directory) == []
+
+        client.list_configurations.return_value = [
+            make_configuration(1, name='Renamed')]
+        assert export.export_incremental(client, directory) == [1]
+        assert not os.path.exists(os.path.join(directory, '2.ndjson'))
@@ -0,0 +1,117 @@
+from azion.frames import Column, ConfigurationFrame, OriginFrame
+from azion.models import Address, Configuration, Origin, lazy_model
+
+from .factories import configuration_data, origin_data
+
+
+def create_configuration_frame():
+    return ConfigurationFrame.from_json([
+        configuration_data(1, delivery_protocol='http'),
+        configuration_data(2, delivery_protocol='http,https', active=False),
+        configuration_data(3, delivery_protocol='http'),
+    ])
+
+
+class TestConfigurationFrame(object):
+
+    def test_from_json(self):
+        frame = create_configuration_frame()
+        assert len(frame) == 3
+        assert list(frame['id']) == [1, 2, 3]
+
+    def test_lazy_rows(self):
+        frame = create_configuration_frame()
+        configuration = frame[-1]
+        assert isinstance(configuration, lazy_model(Configuration))
+        # Fields are read from the columns on first access
+        assert 'id' not in configuration.__dict__
+        assert configuration.id == 3
+        assert configuration.cname == ['www.example.com']
+        assert [c.id for c in frame] == [1, 2, 3]
+
+    def test_filter(self):
+        frame = create_configuration_frame()
+        assert list(frame.filter(active=True)['id']) == [1, 3]
+        assert len(frame.filter(active=True, delivery_protocol='x')) == 0
+        mask = [id != 1 for id in frame['id']]
+        assert list(frame.filter(mask, active=True)['id']) == [3]
+
+    def test_compare_list_columns(self):
+        frame = OriginFrame.from_json([
+            origin_data(10, connection_timeout=60),
+            origin_data(11, connection_timeout=None),
+            origin_data(12, connection_timeout=20),
+        ])
+        column = frame['connection_timeout']
+        assert isinstance(column, Column)
+        assert (column > 30) == [True, False, False]
+        assert (column != 60) == [False, True, True]
+        assert list(frame.filter(column > 30)['id']) == [10]
+        assert list(frame.filter(column <= 60)['id']) == [10, 12]
+        assert list(frame.filter(frame['name'] != 'x')['id']) == [
+            10, 11, 12]
+
+    def test_count_and_group_by(self):
+        frame = create_configuration_frame()
+        assert frame.count_by('delivery_protocol') == {
+            'http': 2, 'http,https': 1}
+        assert frame.count_by('active') == {True: 2, False: 1}
+        groups = frame.group_by('delivery_protocol')
+        assert list(groups['http']['id']) == [1, 3]
+
+    def test_bool_column_with_none(self):
+        frame = ConfigurationFrame.from_json([
+            configuration_data(1, active=None),
+            configuration_data(2, active=False),
+        ])
+        assert frame[0].active is None
+        assert list(frame.filter(active=False)['id']) == [2]
+        assert frame.count_by('active') == {None: 1, False: 1}
+
+    def test_slice(self):
+        frame = create_configuration_frame()
+        assert list(frame[1:]['id']) == [2, 3]
+
+
+class TestOriginFrame(object):
+
+    def test_addresses(self):
+        frame = OriginFrame.from_json([
+            origin_data(10, addresses=('a', 'b')),
+            origin_data(11, addresses=('c',)),
+        ])
+        assert len(frame.addresses) == 3
+        assert frame.addresses.count_by('server_role') == {'primary': 3}
+        assert isinstance(frame.addresses[0], Address)
+
+        origin = frame[1]
+        assert isinstance(origin, Origin)
+        assert [a.address for a in origin.addresses] == ['c']
+        assert origin.to_dict() == origin_data(11, addresses=('c',))
+
+    def test_take_keeps_addresses(self):
+        frame = OriginFrame.from_json([
+            origin_data(10, addresses=('a', 'b')),
+            origin_data(11, addresses=('c',)),
+        ])
+        selected = frame.filter(id=11)
+        assert len(selected) == 1
+        assert list(selected.addresses['address']) == ['c']
+        assert [a.address for a in selected[0].addresses] == ['c']
+
+    def test_rows_after_reordering(self):
+        frame = OriginFrame.from_json([
+            origin_data(10, addresses=('a', 'b')),
+            origin_data(11, addresses=('c',)),
+            origin_data(12, addresses=()),
+        ])
+        assert frame.address_positions(0) == [0, 1]
+        reordered = frame.take([2, 1, 0])
+        assert [[a.address for a in origin.addresses]
+                for origin in reordered] == [[], ['c'], ['a', 'b']]
+        assert reordered.address_positions(1) == [2]
+
+    def test_empty(self):
+        frame = OriginFrame.from_json(None)
+        assert len(frame) == 0
+        assert len(frame.addresses) == 0
@@ -0,0 +1,76 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from azion.client import Azion
+from azion.exceptions import QueueFull
+from azion.futures import Submitter, as_completed
+
+from .test_client import create_mocked_session
+
+
+class TestSubmitter(object):
+
+    def test_submit_client_method(self):
+        mocked_session = create_mocked_session()
+        client = Azion(session=mocked_session)
+        future = client.submit.get_configuration(1)
+        assert isinstance(future, Future)
+        assert future.result() is None
+        mocked_session.get.assert_called_once_with(
+            'https://api.azion.net/content_delivery/configurations/1')
+        client.close()
+
+    def test_pool_sized_to_session(self):
+        mocked_session = create_mocked_session()
+        mocked_session.pool_maxsize = 3
+        submitter = Azion(session=mocked_session).submit
+        assert submitter.max_workers == 3
+        assert submitter.max_pending == 12
+
+    def test_private_attributes_are_not_submitted(self):
+        submitter = Submitter(
+            Azion(session=create_mocked_session()), max_workers=1)
+        with pytest.raises(AttributeError):
+            submitter._submitter
+
+    def test_lifecycle_methods_are_not_submitted(self):
+        client = Azion(session=create_mocked_session())
+        for name in ('close', 'login', 'after_fork'):
+            with pytest.raises(AttributeError):
+                getattr(client.submit, name)
+        client.close()
+
+    def test_backpressure(self):
+        release = threading.Event()
+        submitter = Submitter(
+            Azion(session=create_mocked_session()),
+            max_workers=1, max_pending=1, timeout=0.01)
+        future = submitter.submit(release.wait)
+        with pytest.raises(QueueFull):
+            submitter.submit(lambda: None)
+        release.set()
+        future.result()
+        assert submitter.submit(lambda: 1).result() == 1
+        submitter.shutdown()
+
+    def test_cancel_pending(self):
+        release = threading.Event()
+        submitter = Submitter(
+            Azion(session=create_mocked_session()), max_workers=1)
+        running = submitter.submit(release.wait)
+        pending = submitter.submit(lambda: 1)
+        assert submitter.cancel() == 1
+        assert pending.cancelled()
+        release.set()
+        assert running.result() is True
+        submitter.shutdown()
+
+    def test_as_completed(self):
+        submitter = Submitter(
+            Azion(session=create_mocked_session()), max_workers=2)
+        futures = submitter.map(lambda x: x * 2, [1, 2, 3])
+        results = sorted(future.result() for future in as_completed(futures))
+        assert results == [2, 4, 6]
+        submitter.shutdown()
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from azion.client import Azion, Session
+from azion.hedging import HedgePolicy, LatencyTracker
+
+from .stub_server import StubServer
+from .test_client import create_mocked_session
+from .test_stress import echo
+
+
+class TestLatencyTracker(object):
+
+    def test_percentile(self):
+        tracker = LatencyTracker(size=100)
+        assert tracker.percentile(0.95) is None
+        for latency in range(1, 101):
+            tracker.add(latency)
+        assert tracker.percentile(0.95) == 96
+        assert tracker.percentile(0.5) == 51
+
+
+class TestHedgePolicy(object):
+
+    def test_no_hedge_without_samples(self):
+        policy = HedgePolicy(min_samples=5)
+        assert policy.run(lambda: 1) == 1
+        assert policy.stats()['hedges'] == 0
+        assert len(policy.latencies) == 1
+
+    def test_hedge_wins_over_slow_attempt(self):
+        policy = HedgePolicy(delay=0.01, budget=1)
+        calls = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(None)
+            if len(calls) == 1:
+                release.wait(1)
+                return 'slow'
+            return 'fast'
+
+        assert policy.run(fetch) == 'fast'
+        release.set()
+        stats = policy.stats()
+        assert stats['hedges'] == 1
+        assert stats['hedge_wins'] == 1
+        policy.shutdown()
+
+    def test_budget(self):
+        policy = HedgePolicy(delay=0, budget=0.5)
+
+        def fetch():
+            time.sleep(0.01)
+            return 1
+
+        for _ in range(4):
+            assert policy.run(fetch) == 1
+        stats = policy.stats()
+        assert stats['hedges'] == 2
+        assert stats['budget_denied'] == 2
+        policy.shutdown()
+
+    def test_failed_attempt_waits_for_other(self):
+        policy = HedgePolicy(delay=0.01, budget=1)
+        calls = []
+
+        def fetch():
+            calls.append(None)
+            if len(calls) == 1:
+                time.sleep(0.05)
+                return 'primary'
+            raise ValueError('hedge failed')
+
+        assert policy.run(fetch) == 'primary'
+        policy.shutdown()
+
+    def test_all_attempts_fail(self):
+        policy = HedgePolicy(delay=0, budget=1)
+
+        def fetch():
+            time.sleep(0.01)
+            raise ValueError('boom')
+
+        with pytest.raises(ValueError):
+            policy.run(fetch)
+        policy.shutdown()
+
+    def test_client_hedges_only_gets(self):
+        mocked_session = create_mocked_session()
+        policy = HedgePolicy(delay=0, budget=1)
+        client = Azion(session=mocked_session, hedging=policy)
+        client.delete_configuration(1)
+        assert policy.stats()['requests'] == 0
+        client.get_configuration(1)
+        assert policy.stats()['requests'] == 1
+        policy.shutdown()
+
+    def test_attempts_use_thread_options(self):
+        with StubServer(echo) as server:
+            session = Session()
+            session.base_url = server.url
+            policy = HedgePolicy(delay=0, budget=1)
+            client = Azion(token='token', session=session, hedging=policy)
+            with session.thread_options(headers={'X-Thread': 'caller'}):
+                configuration = client.get_configuration(1)
+            assert configuration.name == 'token token caller'
+            assert policy.stats()['hedges'] == 1
+            assert {request[2]['X-Thread']
+                    for request in server.requests} == {'caller'}
+            policy.shutdown()
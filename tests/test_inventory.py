@@ -0,0 +1,63 @@
+from azion.inventory import Inventory
+from azion.models import Configuration, Origin
+
+from .factories import create_client, make_configuration, make_origin
+
+
+def create_inventory():
+    client = create_client(
+        [make_configuration(1, digital_certificate=99),
+         make_configuration(2, active=False, cname=['cdn.example.org'])],
+        {1: [make_origin(10, addresses=('10.0.0.1', 'www.myorigin.com'))],
+         2: [make_origin(20)]})
+    inventory = Inventory()
+    inventory.refresh(client)
+    return client, inventory
+
+
+class TestInventory(object):
+
+    def test_refresh(self):
+        _, inventory = create_inventory()
+        assert len(inventory) == 2
+        configuration = inventory.get_configuration(1)
+        assert isinstance(configuration, Configuration)
+        assert configuration.digital_certificate == 99
+        assert inventory.get_configuration(3) is None
+
+    def test_query_configurations(self):
+        _, inventory = create_inventory()
+        assert [c.id for c in inventory.configurations(
+            digital_certificate=99)] == [1]
+        assert [c.id for c in inventory.configurations(
+            cname='cdn.example.org')] == [2]
+        assert [c.id for c in inventory.configurations(
+            domain_name='1a.ha.azion.net')] == [1]
+        assert [c.id for c in inventory.configurations(active=False)] == [2]
+        assert inventory.configurations(active=False, cname='nope') == []
+
+    def test_query_origins(self):
+        _, inventory = create_inventory()
+        origins = inventory.origins(address='www.myorigin.com')
+        assert sorted(origin.id for origin in origins) == [10, 20]
+        assert isinstance(origins[0], Origin)
+        assert [o.id for o in inventory.origins(address='10.0.0.1')] == [10]
+        assert [o.id for o in inventory.origins(configuration_id=2)] == [20]
+
+    def test_incremental_refresh(self):
+        client, inventory = create_inventory()
+        assert inventory.refresh(client) == set()
+
+        client.list_configurations.return_value = [
+            make_configuration(1, digital_certificate=100)]
+        assert inventory.refresh(client) == {1, 2}
+        assert inventory.configurations(digital_certificate=99) == []
+        assert len(inventory) == 1
+
+    def test_partial_refresh_keeps_other_configurations(self):
+        client, inventory = create_inventory()
+        changed = inventory.refresh(
+            client, [make_configuration(2, name='Renamed')])
+        assert changed == {2}
+        assert len(inventory) == 2
+        assert inventory.get_configuration(2).name == 'Renamed'
@@ -1,6 +1,11 @@
 import datetime
 
-from azion import models
+import pytest
+
+from azion import models, protocol
+from azion.models import Origin
+
+from .factories import configuration_data, origin_data
 
 
 class TestModels(object):
@@ -37,3 +42,61 @@ class TestConfiguration(object):
                 'cname': ''}
         configuration = models.Configuration(data)
         assert repr(configuration) == '<Configuration [My cool configuration (11111a.ha.azion.net)]>'  # noqa
+
+    def test_repr_of_projection(self):
+        [configuration] = protocol.list_configurations().build(
+            [configuration_data(1)], fields=['id'])
+        assert repr(configuration) == '<Configuration [None (None)]>'
+        [origin] = protocol.list_origins(1).build(
+            [origin_data(1)], fields=['id'])
+        assert repr(origin) == '<Origin [None]>'
+
+
+class TestLoaders(object):
+
+    def test_many_of_builds_nested_models(self):
+        origins = models.many_of(Origin, [
+            origin_data(1, addresses=('a.example.com', 'b.example.com')),
+            None])
+        assert isinstance(origins[0], Origin)
+        assert [address.address for address in origins[0].addresses] == [
+            'a.example.com', 'b.example.com']
+        assert isinstance(origins[0].addresses[0], models.Address)
+        assert origins[1] is None
+
+    def test_strict_mode_requires_every_field(self):
+        data = origin_data(1)
+        del data['method']
+        with pytest.raises(KeyError):
+            models.many_of(Origin, [data])
+
+    def test_tolerant_mode(self):
+        data = origin_data(1, unknown='ignored')
+        del data['method']
+        del data['addresses']
+        origin = models.instance_from_data(Origin, data, tolerant=True)
+        assert origin.method is None
+        assert origin.addresses is None
+        assert not hasattr(origin, 'unknown')
+
+        token = models.instance_from_data(
+            models.Token, {'token': 'foo'}, tolerant=True)
+        assert token.created_at is None
+
+    def test_converters(self):
+        token = models.Token({'token': 'foo',
+                              'created_at': '2016-11-18T14:10:58Z',
+                              'expires_at': '2016-11-19T14:10:58Z'})
+        assert token.created_at.day == 18
+
+    def test_custom_load_data_is_called(self):
+
+        class Custom(models.Configuration):
+
+            def load_data(self, data):
+                super().load_data(data)
+                self.label = data['name'].upper()
+
+        configuration, = models.many_of(Custom, [configuration_data(1)])
+        assert configuration.label == 'MY CONFIGURATION'
+        assert configuration.id == 1
@@ -0,0 +1,52 @@
+import operator
+
+from azion.models import Origin
+from azion.parallel import chunked, map_reduce
+
+from .factories import origin_data
+
+
+def active_addresses(origin):
+    return sum(1 for address in origin.addresses if address.is_active)
+
+
+def count_roles(counts, origin):
+    for address in origin.addresses:
+        counts[address.server_role] = counts.get(address.server_role, 0) + 1
+    return counts
+
+
+def merge_counts(left, right):
+    merged = dict(left)
+    for key, value in right.items():
+        merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+class TestParallel(object):
+
+    def test_chunked(self):
+        assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+    def test_map_reduce_inline(self):
+        payloads = [origin_data(id, addresses=('a', 'b')) for id in range(5)]
+        total = map_reduce(Origin, payloads, operator.add, 0, operator.add,
+                           mapper=active_addresses, chunksize=2,
+                           max_workers=0)
+        assert total == 10
+
+    def test_map_reduce_processes(self):
+        payloads = [origin_data(id, addresses=('a', 'b')) for id in range(50)]
+        counts = map_reduce(Origin, payloads, count_roles, {}, merge_counts,
+                            chunksize=7, max_workers=2)
+        assert counts == {'primary': 100}
+
+    def test_inline_matches_processes(self):
+        payloads = [origin_data(id, addresses=('a', 'b')) for id in range(50)]
+        initial = {}
+        results = [map_reduce(Origin, payloads, count_roles, initial,
+                              merge_counts, chunksize=7,
+                              max_workers=max_workers)
+                   for max_workers in (0, 2)]
+        assert results == [{'primary': 100}] * 2
+        assert initial == {}
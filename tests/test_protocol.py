@@ -0,0 +1,110 @@
+from unittest import mock
+
+import pytest
+
+from azion import protocol
+from azion.exceptions import NotFound
+from azion.models import Configuration, Origin
+
+from .factories import configuration_data, origin_data
+
+
+def create_response(status_code, data=None):
+    response = mock.Mock(status_code=status_code)
+    response.json.return_value = data
+    return response
+
+
+class TestProtocol(object):
+
+    def test_request_url_and_options(self):
+        request = protocol.list_origins(1)
+        assert request.method == 'get'
+        assert request.url('https://api.azion.net') == (
+            'https://api.azion.net/content_delivery/configurations/1/origins')
+        assert request.options() == {}
+        assert repr(request) == (
+            '<Request [GET /content_delivery/configurations/1/origins]>')
+
+    def test_body_filters_none(self):
+        request = protocol.partial_update_configuration(
+            1, name='Foo', active=None)
+        assert request.options() == {'json': {'name': 'Foo'}}
+
+    def test_parse_model(self):
+        request = protocol.get_configuration(1)
+        configuration = request.parse(
+            create_response(200, configuration_data(1)))
+        assert isinstance(configuration, Configuration)
+
+    def test_parse_many(self):
+        request = protocol.list_origins(1)
+        origins = request.parse(
+            create_response(200, [origin_data(10), origin_data(11)]))
+        assert [origin.id for origin in origins] == [10, 11]
+        assert all(isinstance(origin, Origin) for origin in origins)
+
+    def test_parse_boolean(self):
+        request = protocol.delete_configuration(1)
+        assert request.parse(create_response(204)) is True
+
+    def test_parse_multi_status(self):
+        request = protocol.purge_url(['www.domain.com/'], 'delete')
+        result = request.parse(create_response(207, [{
+            'status': 'HTTP/1.1 201 CREATED',
+            'urls': ['www.domain.com/'],
+            'details': 'Purge request successfully created'}]))
+        assert result.succeed()[201]['urls'] == ['www.domain.com/']
+
+    def test_parse_error(self):
+        request = protocol.get_configuration(1)
+        with pytest.raises(NotFound):
+            request.parse(create_response(404, {'detail': 'Not found'}))
+
+
+class TestBuildOptions(object):
+
+    def test_raw(self):
+        data = [configuration_data(1), configuration_data(2)]
+        assert protocol.list_configurations().build(data, raw=True) is data
+
+    def test_raw_projection(self):
+        data = [configuration_data(1)]
+        result = protocol.list_configurations().build(
+            data, raw=True, fields=('id', 'domain_name'))
+        assert result == [{'id': 1, 'domain_name': '1a.ha.azion.net'}]
+
+    def test_model_projection(self):
+        configuration = protocol.get_configuration(1).build(
+            {'id': 1, 'domain_name': '1a.ha.azion.net'},
+            fields=['domain_name', 'id'])
+        assert isinstance(configuration, Configuration)
+        assert configuration.domain_name == '1a.ha.azion.net'
+        assert not hasattr(configuration, 'name')
+
+    def test_unknown_fields(self):
+        with pytest.raises(ValueError):
+            protocol.list_origins(1).build([], fields=('colour',))
+
+    def test_lazy(self):
+        data = [origin_data(1, addresses=('a.example.com',))]
+        origin, = protocol.list_origins(1).build(data, lazy=True)
+        assert isinstance(origin, Origin)
+        assert 'name' not in vars(origin)
+        assert origin.name == 'Dummy origin'
+        assert 'name' in vars(origin)
+        assert origin.addresses[0].address == 'a.example.com'
+        with pytest.raises(AttributeError):
+            origin.colour
+
+    def test_lazy_converts_dates(self):
+        request = protocol.authorize('user', 'password')
+        token = request.build({'token': 'foo',
+                               'created_at': '2016-11-18T14:10:58Z',
+                               'expires_at': '2016-11-19T14:10:58Z'},
+                              lazy=True)
+        assert token.created_at.day == 18
+
+    def test_lazy_and_raw(self):
+        with pytest.raises(ValueError):
+            protocol.list_origins(1).build([], raw=True, lazy=True)
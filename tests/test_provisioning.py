@@ -0,0 +1,142 @@
+import json
+import threading
+from unittest import mock
+
+from azion.client import Azion, Session
+from azion.concurrency import AdaptiveLimiter
+from azion.exceptions import Conflict, ValidationError
+from azion.models import Origin
+from azion.provisioning import (
+    _create_request, create_origins, validate_origin_spec)
+
+from .factories import create_client, origin_data
+from .test_concurrency import create_error
+
+
+def origin_spec(configuration_id, name='Dummy origin', **kwargs):
+    spec = dict(
+        configuration_id=configuration_id, name=name,
+        origin_type='single_origin', method=None,
+        host_header='www.example.com', origin_protocol_policy='http',
+        addresses=[{'address': 'www.myorigin.com', 'weight': None,
+                    'server_role': 'primary'}],
+        connection_timeout=60, timeout_between_bytes=120)
+    spec.update(kwargs)
+    return spec
+
+
+def create_provisioning_client():
+    client = create_client([], {})
+    counter = iter(range(1, 1000))
+    lock = threading.Lock()
+
+    def request(request):
+        with lock:
+            return origin_data(next(counter), name=request.json['name'])
+
+    client.request.side_effect = request
+    return client
+
+
+class TestValidateOriginSpec(object):
+
+    def test_valid(self):
+        assert validate_origin_spec(origin_spec(1)) == []
+
+    def test_reports_every_error(self):
+        spec = origin_spec(
+            1, origin_protocol_policy='ftp', connection_timeout=0,
+            addresses=[{'address': '', 'weight': -1}])
+        errors = validate_origin_spec(spec)
+        assert len(errors) == 4
+
+    def test_missing_and_unknown_fields(self):
+        spec = origin_spec(1, colour='blue')
+        del spec['name']
+        assert validate_origin_spec(spec) == [
+            'name is required', 'colour is unknown']
+
+
+class TestCreateOrigins(object):
+
+    def test_results_follow_specs(self):
+        client = create_provisioning_client()
+        specs = [origin_spec(1, 'a'), origin_spec(2, 'b', method='fast'),
+                 origin_spec(1, 'c')]
+        results = create_origins(client, specs)
+        assert isinstance(results[0], Origin)
+        assert isinstance(results[1], ValidationError)
+        assert [results[0].name, results[2].name] == ['a', 'c']
+        assert client.request.call_count == 2
+
+    def test_errors_are_returned(self):
+        client = create_provisioning_client()
+        client.request.side_effect = [
+            origin_data(1), create_error(Conflict, 409)]
+        results = create_origins(client, [origin_spec(1, 'a'),
+                                          origin_spec(1, 'b')])
+        assert isinstance(results[0], Origin)
+        assert isinstance(results[1], Conflict)
+
+    def test_same_configuration_is_serialized(self):
+        client = create_provisioning_client()
+        running = set()
+        overlaps = []
+        lock = threading.Lock()
+        origins = iter(range(1, 100))
+
+        def request(request):
+            configuration_id = request.path[2]
+            with lock:
+                if configuration_id in running:
+                    overlaps.append(configuration_id)
+                running.add(configuration_id)
+            threading.Event().wait(0.001)
+            with lock:
+                running.discard(configuration_id)
+                return origin_data(next(origins))
+
+        client.request.side_effect = request
+        specs = [origin_spec(id % 3, f'origin {id}') for id in range(30)]
+        results = create_origins(client, specs, max_workers=3)
+        assert all(isinstance(result, Origin) for result in results)
+        assert overlaps == []
+
+    def test_resume_from_checkpoint(self, tmpdir):
+        checkpoint = str(tmpdir.join('checkpoint.json'))
+        client = create_provisioning_client()
+        client.request.side_effect = [
+            origin_data(1, name='a'), create_error(Conflict, 409)]
+        specs = [origin_spec(1, 'a'), origin_spec(2, 'b')]
+        create_origins(client, specs, checkpoint=checkpoint)
+        with open(checkpoint) as f:
+            assert len(json.load(f)) == 1
+
+        client = create_provisioning_client()
+        results = create_origins(client, specs, checkpoint=checkpoint)
+        assert [origin.name for origin in results] == ['a', 'b']
+        assert client.request.call_count == 1
+
+    def test_client_method(self):
+        client = Azion(session=mock.Mock())
+        with mock.patch('azion.provisioning.create_origins') as create:
+            client.create_origins([origin_spec(1)], checkpoint='foo')
+        create.assert_called_once_with(
+            client, [origin_spec(1)], checkpoint='foo', max_workers=8)
+
+    def test_submit_with_single_slot(self):
+        client = Azion(session=Session(),
+                       limiter=AdaptiveLimiter(initial=1, maximum=1))
+        client.request = create_provisioning_client().request
+        future = client.submit.create_origins(
+            [origin_spec(1, 'a'), origin_spec(2, 'b')])
+        results = future.result(timeout=5)
+        assert [origin.name for origin in results] == ['a', 'b']
+        client.close()
+
+    def test_create_request_returns_data(self):
+        request = _create_request(origin_spec(1))
+        assert request.model is None
+        assert request.build(origin_data(1)) == origin_data(1)
+        assert request.invalidates == (
+            ('content_delivery', 'configurations', 1, 'origins'),)
@@ -0,0 +1,244 @@
+import socket
+import socketserver
+import threading
+from unittest import mock
+
+import pytest
+
+from azion import export
+from azion.cache import Cache
+from azion.client import Azion
+from azion.remote import (Connection, FakeRedis, RemoteBackend,
+                          RemoteCacheError, decode_entry, encode_command,
+                          encode_entry, read_reply)
+
+from .factories import configuration_data, make_configuration, origin_data
+from .test_client import create_mocked_session
+from .test_concurrency import Clock
+
+
+def encode_reply(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, RemoteCacheError):
+        return b'-%s\r\n' % str(reply).encode('utf-8')
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, str):
+        return b'+%s\r\n' % reply.encode('utf-8')
+    if isinstance(reply, list):
+        return b'*%d\r\n' % len(reply) + b''.join(map(encode_reply, reply))
+    return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    """Run the commands received on a FakeRedis."""
+
+    def handle(self):
+        while True:
+            try:
+                command = read_reply(self.rfile)
+            except ConnectionError:
+                return
+            name = command[0].decode('utf-8')
+            reply = self.server.redis._run(name, *command[1:])
+            self.wfile.write(encode_reply(reply))
+
+
+class RESPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RESPHandler)
+        self.redis = FakeRedis()
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       args=(0.05,), daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class TestSerialization(object):
+
+    def test_round_trip(self):
+        value = configuration_data(1)
+        assert decode_entry(encode_entry(10.5, value)) == (10.5, value)
+
+    def test_large_entries_are_compressed(self):
+        value = [configuration_data(i) for i in range(50)]
+        encoded = encode_entry(1, value, compress_threshold=1024)
+        assert encoded[:1] == b'z'
+        assert decode_entry(encoded) == (1, value)
+        assert encode_entry(1, 'small')[:1] == b'j'
+
+    def test_encode_command(self):
+        assert encode_command('SET', 'key', b'\x00', 10) == (
+            b'*4\r\n$3\r\nSET\r\n$3\r\nkey\r\n$1\r\n\x00\r\n$2\r\n10\r\n')
+
+
+class TestRemoteBackend(object):
+
+    def create_backend(self):
+        clock = Clock()
+        redis = FakeRedis(clock=clock)
+        return clock, redis, RemoteBackend(redis)
+
+    def test_set_get_delete(self):
+        clock, redis, backend = self.create_backend()
+        assert backend.get('key') is None
+        backend.set('key', 1.0, {'id': 1}, ttl=10)
+        assert backend.get('key') == (1.0, {'id': 1})
+        assert b'azion:key' in redis.data
+        backend.delete('key')
+        assert backend.get('key') is None
+
+    def test_entries_expire(self):
+        clock, redis, backend = self.create_backend()
+        backend.set('key', 1.0, {'id': 1}, ttl=10)
+        clock.now = 11
+        assert backend.get('key') is None
+
+    def test_get_many_is_one_round_trip(self):
+        clock, redis, backend = self.create_backend()
+        backend.set('a', 1, 'A')
+        backend.set('c', 1, 'C')
+        round_trips = redis.round_trips
+        assert backend.get_many(['a', 'b', 'c']) == [
+            (1, 'A'), None, (1, 'C')]
+        assert redis.round_trips == round_trips + 1
+
+    def test_delete_publishes_invalidation(self):
+        clock, redis, backend = self.create_backend()
+        callback = mock.Mock()
+        subscription = backend.subscribe(callback)
+        backend.delete('key')
+        callback.assert_called_once_with('key')
+        subscription.close()
+        backend.delete('key')
+        assert callback.call_count == 1
+
+    def test_clear(self):
+        clock, redis, backend = self.create_backend()
+        redis.execute('SET', 'other', 'value')
+        backend.set('a', 1, 'A')
+        backend.clear()
+        assert backend.get('a') is None
+        assert redis.data == {b'other': b'value'}
+
+    def test_server_errors_are_misses(self):
+        connection = mock.Mock()
+        connection.pipeline.side_effect = ConnectionRefusedError()
+        backend = RemoteBackend(connection)
+        assert backend.get('key') is None
+        assert backend.get_many(['key']) == [None]
+        backend.set('key', 1, 'value')
+        assert backend.errors == 3
+
+    def test_undecodable_entries_are_misses(self):
+        clock, redis, backend = self.create_backend()
+        redis.execute('SET', 'azion:short', b'j')
+        redis.execute('SET', 'azion:zlib', b'z' + b'\x00' * 8 + b'garbage')
+        redis.execute('SET', 'azion:json', b'j' + b'\x00' * 8 + b'{')
+        assert backend.get('short') is None
+        assert backend.get_many(['zlib', 'json']) == [None, None]
+        assert backend.errors == 3
+
+    def test_cache_get_many(self):
+        clock, redis, backend = self.create_backend()
+        cache = Cache(backend, ttl=10, clock=clock)
+        cache.store('a', 'A')
+        cache.store('b', 'B')
+        clock.now = 5
+        cache.store('b', 'new B')
+        clock.now = 12
+        assert cache.get_many(['a', 'b', 'c']) == {'b': 'new B'}
+        assert cache.stats()['misses'] == 2
+
+    def test_client_writes_publish_invalidations(self):
+        clock, redis, backend = self.create_backend()
+        session = create_mocked_session()
+        session.auth.token = 'foobar'
+        response = mock.Mock(status_code=200)
+        response.json.return_value = configuration_data(1)
+        session.get.return_value = response
+        session.patch.return_value = response
+        client = Azion(session=session,
+                       cache=Cache(backend, ttl=10, clock=clock))
+        invalidated = []
+        backend.subscribe(invalidated.append)
+
+        client.get_configuration(1)
+        client.partial_update_configuration(1, name='foo')
+        assert 'foobar' not in ''.join(invalidated)
+        assert any(key.endswith('/content_delivery/configurations/1')
+                   for key in invalidated)
+
+    def test_inventory_reads_cache_at_once(self):
+        clock, redis, backend = self.create_backend()
+        session = create_mocked_session()
+        session.auth.token = 'foobar'
+        response = mock.Mock(status_code=200)
+        response.json.return_value = [origin_data(20)]
+        session.get.return_value = response
+        client = Azion(session=session,
+                       cache=Cache(backend, ttl=10, clock=clock))
+        client.list_origins(2)
+        client.list_origins(3)
+        round_trips = redis.round_trips
+
+        configurations = [make_configuration(id) for id in (1, 2, 3)]
+        pairs = dict(
+            (configuration.id, [origin.id for origin in origins])
+            for configuration, origins in export.iter_inventory(
+                client, configurations, max_workers=1))
+        assert pairs == {1: [20], 2: [20], 3: [20]}
+        assert session.get.call_count == 3
+        # One MGET, then a GET and a SET for the missing configuration
+        assert redis.round_trips == round_trips + 3
+
+
+class TestConnection(object):
+
+    def test_pipeline_against_server(self):
+        with RESPServer() as server:
+            connection = Connection(*server.server_address)
+            backend = RemoteBackend(connection)
+            backend.set('key', 1.0, {'id': 1}, ttl=10)
+            assert backend.get('key') == (1.0, {'id': 1})
+            assert backend.get_many(['key', 'missing']) == [
+                (1.0, {'id': 1}), None]
+            assert connection.execute('DEL', 'azion:key') == 1
+            with pytest.raises(RemoteCacheError):
+                connection.execute('FLUSHALL')
+            connection.close()
+
+    def test_reconnects_after_error(self):
+        with RESPServer() as server:
+            connection = Connection(*server.server_address)
+            connection.execute('SET', 'key', 'value')
+            connection.sock.shutdown(socket.SHUT_RDWR)
+            with pytest.raises(OSError):
+                connection.execute('GET', 'key')
+            assert connection.execute('GET', 'key') == b'value'
+            connection.close()
+
+    def test_closes_after_any_error(self):
+        with RESPServer() as server:
+            connection = Connection(*server.server_address)
+            connection.execute('SET', 'key', 'value')
+            # A malformed reply, e.g. `$x`
+            stream = connection.stream
+            connection.stream = mock.Mock()
+            connection.stream.readline.side_effect = ValueError
+            with pytest.raises(ValueError):
+                connection.execute('GET', 'key')
+            stream.close()
+            assert connection.sock is None
+            assert connection.execute('GET', 'key') == b'value'
+            connection.close()
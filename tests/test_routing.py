@@ -0,0 +1,48 @@
+from azion.routing import HostResolver, normalize_host
+
+from .factories import create_client, make_configuration
+
+
+def create_resolver():
+    return HostResolver([
+        make_configuration(1, cname=['www.example.com', 'Static.Example.com']),
+        make_configuration(2, cname=['*.example.com']),
+        make_configuration(3, cname=['*.img.example.com']),
+        make_configuration(4, cname='')])
+
+
+class TestRouting(object):
+
+    def test_normalize_host(self):
+        assert normalize_host('WWW.Example.com:8080') == 'www.example.com'
+        assert normalize_host('www.example.com.') == 'www.example.com'
+        assert normalize_host('[::1]:443') == '[::1]'
+
+    def test_resolve_exact(self):
+        resolver = create_resolver()
+        assert resolver.resolve('www.example.com').id == 1
+        assert resolver.resolve('static.example.com:443').id == 1
+        assert resolver.resolve('4a.ha.azion.net').id == 4
+
+    def test_resolve_wildcard(self):
+        resolver = create_resolver()
+        assert resolver.resolve('foo.example.com').id == 2
+        assert resolver.resolve('a.b.example.com').id == 2
+        assert resolver.resolve('x.img.example.com').id == 3
+        assert resolver.resolve('example.com') is None
+        assert resolver.resolve('www.example.org') is None
+
+    def test_len(self):
+        # 4 domain names, 2 exact CNAMEs and 2 wildcards
+        assert len(create_resolver().index) == 8
+        resolver = HostResolver([
+            make_configuration(1, cname=['*.example.com']),
+            make_configuration(2, cname=['*.example.com'])])
+        assert len(resolver.index) == 3
+
+    def test_refresh(self):
+        resolver = create_resolver()
+        client = create_client([make_configuration(5, cname=['new.io'])], {})
+        resolver.refresh_from(client)
+        assert resolver.resolve('new.io').id == 5
+        assert resolver.resolve('www.example.com') is None
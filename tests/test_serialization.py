@@ -0,0 +1,120 @@
+import datetime
+import json
+
+import pendulum
+import pytest
+
+from azion import protocol
+from azion.models import Configuration, Origin, Token
+from azion.serialization import (SCHEMA_VERSION, dumps, loads, packb,
+                                 unpackb)
+
+from .factories import make_configuration, make_origin, origin_data
+
+
+def create_token():
+    return Token({'token': 'foo',
+                  'created_at': '2016-11-18T14:10:58.024903Z',
+                  'expires_at': '2016-11-19T14:10:58Z'})
+
+
+class TestToDict(object):
+
+    def test_round_trip(self):
+        origin = make_origin(1, addresses=('a.example.com', 'b.example.com'))
+        data = origin.to_dict()
+        assert data == origin_data(1, addresses=(
+            'a.example.com', 'b.example.com'))
+        assert Origin.from_dict(data).to_dict() == data
+
+    def test_dates(self):
+        token = create_token()
+        data = token.to_dict()
+        assert json.dumps(data)
+        copy = Token.from_dict(data)
+        assert copy.created_at == token.created_at
+
+    def test_projection(self):
+        configuration = protocol.get_configuration(1).build(
+            {'id': 1, 'name': 'Foo'}, fields=('id', 'name'))
+        assert configuration.to_dict() == {'id': 1, 'name': 'Foo'}
+
+    def test_lazy(self):
+        origin, = protocol.list_origins(1).build(
+            [origin_data(1)], lazy=True)
+        assert origin.to_dict() == origin_data(1)
+
+
+class TestBinary(object):
+
+    @pytest.mark.parametrize('value', [
+        None, True, False, 0, 127, 128, 255, 65536, 2 ** 40, -1, -32, -33,
+        -200, -70000, -2 ** 40, 1.5, '', 'x' * 31, 'x' * 40, 'y' * 70000,
+        'ção', b'\x00\x01', [], list(range(20)), {'a': [None, True]},
+        {str(i): i for i in range(20)},
+    ])
+    def test_codec_round_trip(self, value):
+        assert unpackb(packb(value)) == value
+
+    def test_codec_known_encoding(self):
+        assert packb([1, 'a', None, True]) == b'\x94\x01\xa1a\xc0\xc3'
+
+    def test_timestamps(self):
+        for date in (pendulum.datetime(2016, 11, 18, 14, 10, 58, 24903),
+                     pendulum.datetime(2016, 11, 18),
+                     pendulum.datetime(1960, 1, 1),
+                     pendulum.datetime(2600, 1, 1)):
+            decoded = unpackb(packb(date))
+            assert decoded == date
+            assert isinstance(decoded, pendulum.DateTime)
+
+    def test_naive_datetime(self):
+        with pytest.raises(ValueError):
+            packb(datetime.datetime(2016, 1, 1))
+
+    def test_model_round_trip(self):
+        origin = make_origin(1, addresses=('a.example.com', 'b.example.com'))
+        copy = loads(dumps(origin))
+        assert isinstance(copy, Origin)
+        assert copy.to_dict() == origin.to_dict()
+
+        token = loads(dumps(create_token()))
+        assert token.created_at == create_token().created_at
+        assert isinstance(token.created_at, pendulum.DateTime)
+
+    def test_list_round_trip(self):
+        configurations = [make_configuration(1), None, make_configuration(2)]
+        copies = loads(dumps(configurations))
+        assert copies[1] is None
+        assert [copy.id for copy in (copies[0], copies[2])] == [1, 2]
+        assert isinstance(copies[0], Configuration)
+        assert loads(dumps([])) == []
+
+    def test_smaller_than_json(self):
+        origins = [make_origin(id) for id in range(10)]
+        encoded = json.dumps([origin.to_dict() for origin in origins])
+        assert len(dumps(origins)) < len(encoded) / 2
+
+    def test_msgpack_compatible(self):
+        msgpack = pytest.importorskip('msgpack')
+        token = create_token()
+        data = dumps(token)
+        assert data == packb([SCHEMA_VERSION, 'Token', False,
+                              [token.token, token.created_at,
+                               token.expires_at]])
+        assert unpackb(data)[3][1] == token.created_at
+        assert msgpack.unpackb(data, timestamp=3)[3][1] == token.created_at
+        utc = datetime.timezone.utc
+        for date in (datetime.datetime(2016, 11, 18, tzinfo=utc),
+                     datetime.datetime(1960, 1, 1, 0, 0, 0, 5, tzinfo=utc),
+                     datetime.datetime(2600, 1, 1, tzinfo=utc)):
+            assert packb(date) == msgpack.packb(date, datetime=True)
+
+    def test_schema_version(self):
+        data = packb([SCHEMA_VERSION + 1, 'Origin', False, []])
+        with pytest.raises(ValueError):
+            loads(data)
+
+    def test_unknown_model(self):
+        with pytest.raises(ValueError):
+            loads(packb([SCHEMA_VERSION, 'Unknown', False, []]))
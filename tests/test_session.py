@@ -29,3 +29,9 @@ class TestSession(object):
         base_url = 'https://www.example.com'
         url = session.build_url('foo', 'bar', '1', base_url=base_url)
         assert url == 'https://www.example.com/foo/bar/1'
+
+    def test_pool_maxsize(self):
+        session = Session(pool_maxsize=32)
+        adapter = session.get_adapter('https://api.azion.net')
+        assert session.pool_maxsize == 32
+        assert adapter._pool_maxsize == 32
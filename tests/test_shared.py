@@ -0,0 +1,139 @@
+import fcntl
+import multiprocessing
+import os
+import signal
+import threading
+
+import pytest
+
+from azion.cache import Cache
+from azion.shared import MmapBackend, key_hash
+
+
+def write_entry(path):
+    backend = MmapBackend(path, slots=16, slot_size=1024)
+    backend.set('configuration', 10.0, {'id': 1, 'name': 'Shared'})
+    backend.close()
+
+
+class TestMmapBackend(object):
+
+    def create_backend(self, tmpdir, **kwargs):
+        options = dict(slots=16, slot_size=1024)
+        options.update(kwargs)
+        return MmapBackend(str(tmpdir.join('cache')), **options)
+
+    def test_key_hash_is_stable(self):
+        assert key_hash('foo') == key_hash('foo')
+        assert key_hash('foo') != key_hash('bar')
+
+    def test_set_get_delete(self, tmpdir):
+        backend = self.create_backend(tmpdir)
+        assert backend.get('key') is None
+        backend.set('key', 1.5, [{'id': 1}])
+        assert backend.get('key') == (1.5, [{'id': 1}])
+        version = backend.version('key')
+        backend.set('key', 2.5, [{'id': 2}])
+        assert backend.version('key') == version + 2
+        backend.delete('key')
+        assert backend.get('key') is None
+
+    def test_delete_without_reading(self, tmpdir):
+        backend = self.create_backend(tmpdir, slots=1)
+        backend.set('key', 1.5, 'value')
+        # Readers giving up under contention do not skip the delete
+        backend.retries = 0
+        backend.delete('key')
+        backend.retries = MmapBackend.retries
+        assert backend.get('key') is None
+        # Nor does a delete evict another key of the slot
+        backend.set('other', 1.5, 'value')
+        version = backend.version('other')
+        backend.delete('key')
+        assert backend.version('other') == version
+        assert backend.get('other') == (1.5, 'value')
+
+    def test_oversized_entries_are_skipped(self, tmpdir):
+        backend = self.create_backend(tmpdir, slot_size=64)
+        backend.set('key', 1, 'x' * 100)
+        assert backend.get('key') is None
+        assert backend.oversized == 1
+
+    def test_colliding_keys_evict(self, tmpdir):
+        backend = self.create_backend(tmpdir, slots=1)
+        backend.set('a', 1, 'first')
+        backend.set('b', 1, 'second')
+        assert backend.get('a') is None
+        assert backend.get('b') == (1, 'second')
+
+    def test_layout_mismatch(self, tmpdir):
+        self.create_backend(tmpdir).close()
+        with open(str(tmpdir.join('cache')), 'r+b') as f:
+            f.write(b'XXXX')
+        with pytest.raises(ValueError):
+            self.create_backend(tmpdir)
+
+    def test_size_mismatch_keeps_file(self, tmpdir):
+        self.create_backend(tmpdir).close()
+        path = str(tmpdir.join('cache'))
+        size = os.path.getsize(path)
+        with pytest.raises(ValueError):
+            self.create_backend(tmpdir, slots=32)
+        assert os.path.getsize(path) == size
+        assert self.create_backend(tmpdir).slots == 16
+
+    def test_concurrent_writes(self, tmpdir):
+        backend = self.create_backend(tmpdir, slots=1)
+
+        def write(index):
+            for _ in range(200):
+                backend.set(f'key {index}', index, [index] * 10)
+
+        threads = [threading.Thread(target=write, args=(index,))
+                   for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert backend.version('key 0') == 1600
+        assert sum(backend.get(f'key {index}') is not None
+                   for index in range(4)) == 1
+
+    @pytest.mark.skipif(not hasattr(os, 'register_at_fork'),
+                        reason='os.register_at_fork is not available')
+    def test_reopened_after_fork(self, tmpdir):
+        backend = self.create_backend(tmpdir)
+        backend.set('key', 1, 'parent')
+        locked, done = os.pipe(), os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            signal.alarm(10)
+            fcntl.flock(backend.fd, fcntl.LOCK_EX)
+            code = 0 if backend.get('key') == (1, 'parent') else 1
+            os.write(locked[1], b'x')
+            os.read(done[0], 1)
+            os._exit(code)
+        os.read(locked[0], 1)
+        try:
+            # The child locked its own descriptor, not the parent's
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(backend.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        finally:
+            os.write(done[1], b'x')
+            _, status = os.waitpid(pid, 0)
+        assert os.WEXITSTATUS(status) == 0
+        backend.close()
+
+    def test_shared_between_processes(self, tmpdir):
+        path = str(tmpdir.join('cache'))
+        backend = MmapBackend(path, slots=16, slot_size=1024)
+        process = multiprocessing.Process(target=write_entry, args=(path,))
+        process.start()
+        process.join()
+        assert backend.get('configuration') == (
+            10.0, {'id': 1, 'name': 'Shared'})
+
+    def test_cache_backend(self, tmpdir):
+        cache = Cache(self.create_backend(tmpdir), ttl=60)
+        assert cache.fetch('key', lambda: {'id': 1}) == {'id': 1}
+        assert cache.fetch('key', lambda: {'id': 2}) == {'id': 1}
@@ -0,0 +1,290 @@
+import base64
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from azion.client import Azion, Session
+from azion.exceptions import (
+    NotFound, ServerError, TooManyRequests, Unauthorized)
+from azion.simulator import Faults, Latency, RateLimit, Simulator
+
+from .test_concurrency import Clock
+
+TOKEN = {'authorization': 'token secret'}
+
+
+def basic(username, password):
+    credentials = f'{username}:{password}'.encode('utf-8')
+    return {'authorization': 'Basic ' + base64.b64encode(
+        credentials).decode('ascii')}
+
+
+def configuration_fields(**kwargs):
+    fields = {'name': 'Dummy', 'origin_address': 'www.origin.com',
+              'origin_host_header': 'www.example.com'}
+    fields.update(kwargs)
+    return fields
+
+
+def client_for(simulator, **options):
+    session = Session(**options)
+    session.base_url = simulator.url
+    return Azion(token='secret', session=session)
+
+
+class TestLatency(object):
+
+    def test_constant(self):
+        assert Latency('constant', 0.1).sample() == 0.1
+
+    def test_uniform(self):
+        latency = Latency('uniform', 0.1, 0.05)
+        samples = [latency.sample(random.Random(n)) for n in range(100)]
+        assert all(0.05 <= sample <= 0.15 for sample in samples)
+
+    def test_median(self):
+        rng = random.Random(1)
+        for kind in ('lognormal', 'exponential'):
+            latency = Latency(kind, 0.1, 0.5)
+            samples = sorted(latency.sample(rng) for _ in range(2000))
+            assert samples[1000] == pytest.approx(0.1, rel=0.15)
+
+    def test_parse(self):
+        latency = Latency.parse('lognormal:0.05:0.5')
+        assert (latency.kind, latency.median, latency.spread) == (
+            'lognormal', 0.05, 0.5)
+        with pytest.raises(ValueError):
+            Latency.parse('pareto:1')
+
+
+class TestFaults(object):
+
+    def test_pick(self):
+        faults = Faults({429: 0.2, 503: 0.1}, timeout_rate=0.1)
+        rng = random.Random(1)
+        picks = [faults.pick(rng) for _ in range(10000)]
+        assert picks.count(429) == pytest.approx(2000, rel=0.1)
+        assert picks.count(503) == pytest.approx(1000, rel=0.1)
+        assert picks.count('timeout') == pytest.approx(1000, rel=0.1)
+        assert picks.count(None) == pytest.approx(6000, rel=0.1)
+
+    def test_parse(self):
+        faults = Faults.parse('429=0.01,503=0.02', timeout_rate=0.1)
+        assert faults.errors == {429: 0.01, 503: 0.02}
+        assert faults.timeout_rate == 0.1
+
+    def test_probabilities_over_one(self):
+        with pytest.raises(ValueError):
+            Faults({500: 0.6}, timeout_rate=0.5)
+
+
+class TestRateLimit(object):
+
+    def test_fixed_window(self):
+        clock = Clock()
+        limit = RateLimit(2, 60, clock=clock)
+        assert limit.hit('a') == (True, 1, 60)
+        assert limit.hit('a') == (True, 0, 60)
+        clock.now = 10
+        assert limit.hit('a') == (False, 0, 50)
+        assert limit.hit('b')[0]
+        clock.now = 60
+        assert limit.hit('a') == (True, 1, 60)
+
+
+class TestHandle(object):
+
+    def test_create_token(self):
+        simulator = Simulator(strict_auth=True)
+        response = simulator.handle('POST', '/tokens', basic('foo', 'bar'))
+        assert response.status == 201
+        token = response.payload['token']
+        headers = {'authorization': f'token {token}'}
+        response = simulator.handle(
+            'GET', '/content_delivery/configurations', headers)
+        assert response.status == 200
+        assert simulator.handle(
+            'GET', '/content_delivery/configurations', TOKEN).status == 401
+
+    def test_authentication_required(self):
+        simulator = Simulator()
+        assert simulator.handle('POST', '/tokens', {}).status == 401
+        assert simulator.handle('GET', '/purge/url', {}).status == 401
+
+    def test_configurations(self):
+        simulator = Simulator()
+        path = '/content_delivery/configurations'
+        body = json.dumps(configuration_fields()).encode()
+        created = simulator.handle('POST', path, TOKEN, body).payload
+        assert created['name'] == 'Dummy'
+        assert 'origin_address' not in created
+        assert simulator.handle('GET', path, TOKEN).payload == [created]
+
+        path = f'{path}/{created["id"]}'
+        body = b'{"delivery_protocol": "http,https"}'
+        response = simulator.handle('PATCH', path, TOKEN, body)
+        assert response.payload['delivery_protocol'] == 'http,https'
+        response = simulator.handle('PUT', path, TOKEN, b'{"name": "New"}')
+        assert response.payload['delivery_protocol'] == 'http'
+        assert response.payload['name'] == 'New'
+        assert simulator.handle('DELETE', path, TOKEN).status == 204
+        assert simulator.handle('GET', path, TOKEN).status == 404
+
+    def test_invalid_payloads(self):
+        simulator = Simulator()
+        path = '/content_delivery/configurations'
+        response = simulator.handle('POST', path, TOKEN, b'{"name": 1}')
+        assert response.status == 400
+        assert 'name must be of type str' in response.payload['errors']
+        assert simulator.handle('POST', path, TOKEN, b'{').status == 400
+        assert simulator.handle('POST', path, TOKEN, b'[]').status == 400
+
+    def test_origins(self):
+        simulator = Simulator()
+        simulator.populate(2, origins=3)
+        path = '/content_delivery/configurations/2/origins'
+        origins = simulator.handle('GET', path, TOKEN).payload
+        assert len(origins) == 3
+        assert origins[0]['addresses'][0]['server_role'] == 'primary'
+        assert simulator.handle(
+            'GET', '/content_delivery/configurations/3/origins',
+            TOKEN).status == 404
+
+    def test_purge_multi_status(self):
+        simulator = Simulator(authorized_domains=['www.domain.com'])
+        body = json.dumps({'urls': ['www.domain.com/a', 'www.other.com/b'],
+                           'method': 'delete'}).encode()
+        response = simulator.handle('POST', '/purge/url', TOKEN, body)
+        assert response.status == 207
+        assert [item['status'] for item in response.payload] == [
+            'HTTP/1.1 403 FORBIDDEN', 'HTTP/1.1 201 CREATED']
+        response = simulator.handle('POST', '/purge/cachekey', TOKEN, body)
+        assert response.status == 403
+        assert simulator.purges == [('url', ['www.domain.com/a']),
+                                    ('cachekey', ['www.domain.com/a'])]
+
+    def test_not_found_and_not_allowed(self):
+        simulator = Simulator()
+        assert simulator.handle('GET', '/unknown', TOKEN).status == 404
+        assert simulator.handle('GET', '/purge/url', TOKEN).status == 405
+        assert simulator.handle('GET', '/tokens', {}).status == 405
+
+    def test_rate_limit(self):
+        simulator = Simulator(rate_limit=RateLimit(1, 60, clock=Clock()))
+        path = '/content_delivery/configurations'
+        response = simulator.handle('GET', path, TOKEN)
+        assert response.headers['X-RateLimit-Remaining'] == '0'
+        response = simulator.handle('GET', path, TOKEN)
+        assert response.status == 429
+        assert response.headers['Retry-After'] == '60'
+
+
+class TestServer(object):
+
+    def test_client_round_trip(self):
+        with Simulator() as simulator:
+            client = client_for(simulator)
+            token = client.authorize('foo', 'bar')
+            client.login(token.token)
+
+            configuration = client.create_configuration(
+                **configuration_fields())
+            assert client.get_configuration(configuration.id).name == 'Dummy'
+            client.partial_update_configuration(
+                configuration.id, delivery_protocol='http,https')
+            assert [item.delivery_protocol
+                    for item in client.list_configurations()] == [
+                        'http,https']
+
+            origin = client.create_origin(
+                configuration.id, name='Images', origin_type='single_origin',
+                method='', host_header='www.a.com',
+                origin_protocol_policy='http',
+                addresses=[{'address': 'www.origin.com'}],
+                connection_timeout=60, timeout_between_bytes=120)
+            assert client.list_origins(configuration.id)[0].id == origin.id
+
+            purge = client.purge_url(['www.domain.com/a'])
+            assert purge.succeed()[201]['urls'] == ['www.domain.com/a']
+            assert client.purge_cache_key(['www.domain.com/@@a'])
+            assert client.purge_wildcard('www.domain.com/*')
+
+            assert client.delete_configuration(configuration.id)
+            with pytest.raises(NotFound):
+                client.get_configuration(configuration.id)
+            response = client.session.post(
+                client.session.build_url('purge', 'url'), json={'urls': []})
+            assert response.status_code == 400
+            stats = simulator.stats()
+            assert stats['statuses'][201] == 5
+            assert stats['routes']['configuration'] == 4
+
+    def test_strict_auth(self):
+        with Simulator(strict_auth=True) as simulator:
+            with pytest.raises(Unauthorized):
+                client_for(simulator).list_configurations()
+
+    def test_injected_errors(self):
+        with Simulator(faults=Faults({503: 1.0})) as simulator:
+            with pytest.raises(ServerError):
+                client_for(simulator).list_configurations()
+        with Simulator(faults=Faults({429: 1.0})) as simulator:
+            with pytest.raises(TooManyRequests) as error:
+                client_for(simulator).list_configurations()
+            assert error.value.response.headers['Retry-After'] == '1'
+
+    def test_timeouts(self):
+        faults = Faults(timeout_rate=1.0, timeout=1.0)
+        with Simulator(faults=faults) as simulator:
+            client = client_for(simulator)
+            with client.session.thread_options(timeout=0.1):
+                with pytest.raises(requests.Timeout):
+                    client.list_configurations()
+        assert simulator.stats()['statuses'] == {}
+
+    def test_concurrent_requests(self):
+        latency = Latency('constant', 0.05)
+        with Simulator(latency=latency, seed=1) as simulator:
+            simulator.populate(16)
+            client = client_for(simulator, pool_maxsize=16)
+            futures = [client.submit.get_configuration(id)
+                       for id in range(1, 17)]
+            ids = [future.result().id for future in futures]
+            client.close()
+        assert ids == list(range(1, 17))
+        assert simulator.stats()['max_in_flight'] > 1
+
+    def test_unlimited_by_default(self):
+        latency = Latency('constant', 0.05)
+        with Simulator(latency=latency, seed=1) as simulator:
+            simulator.populate(1)
+            client = client_for(simulator, pool_maxsize=32)
+            assert client.limiter is None
+            with ThreadPoolExecutor(max_workers=32) as executor:
+                list(executor.map(
+                    lambda _: client.get_configuration(1), range(64)))
+        assert simulator.stats()['max_in_flight'] > 16
+
+    def test_compressed_request_body(self):
+        with Simulator() as simulator:
+            client = client_for(simulator, compress_threshold=1)
+            configuration = client.create_configuration(
+                **configuration_fields())
+            assert configuration.name == 'Dummy'
+            response = requests.post(
+                simulator.url + '/purge/url', data=b'{}',
+                headers={'Authorization': 'token secret',
+                         'Content-Encoding': 'zstd'})
+            assert response.status_code == 415
+
+    def test_connection_close(self):
+        with Simulator() as simulator:
+            response = requests.get(
+                simulator.url + '/content_delivery/configurations',
+                headers={'Authorization': 'token secret',
+                         'Connection': 'close'})
+            assert response.headers['Connection'] == 'close'
+            assert response.json() == []
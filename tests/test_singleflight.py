@@ -0,0 +1,105 @@
+import threading
+import time
+from unittest import mock
+
+from azion.client import Azion
+from azion.singleflight import Group
+
+from .factories import configuration_data
+from .test_client import create_mocked_session
+
+
+def run_concurrently(target, count):
+    results = []
+    errors = []
+
+    def run():
+        try:
+            results.append(target())
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def wait_until(predicate, timeout=1):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+class TestGroup(object):
+
+    def test_coalesces_calls_in_flight(self):
+        group = Group()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(None)
+            release.wait(1)
+            return 'result'
+
+        threads, results, _ = run_concurrently(
+            lambda: group.do('key', fetch), 5)
+        wait_until(lambda: group.coalesced == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+        assert results == ['result'] * 5
+        assert not group.calls
+
+    def test_shares_exceptions(self):
+        group = Group()
+        release = threading.Event()
+
+        def fetch():
+            release.wait(1)
+            raise ValueError('boom')
+
+        threads, _, errors = run_concurrently(
+            lambda: group.do('key', fetch), 3)
+        wait_until(lambda: group.coalesced == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(errors) == 3
+        assert len(set(map(id, errors))) == 1
+
+    def test_sequential_calls_are_not_coalesced(self):
+        group = Group()
+        assert group.do('key', lambda: 1) == 1
+        assert group.do('key', lambda: 2) == 2
+        assert group.coalesced == 0
+
+
+class TestClientCoalescing(object):
+
+    def test_identical_gets_share_one_request(self):
+        mocked_session = create_mocked_session()
+        mocked_session.auth.token = 'foobar'
+        release = threading.Event()
+        response = mock.Mock(status_code=200)
+        response.json.return_value = configuration_data(1)
+
+        def get(url):
+            release.wait(1)
+            return response
+
+        mocked_session.get.side_effect = get
+        client = Azion(session=mocked_session, coalesce=True)
+
+        threads, results, _ = run_concurrently(
+            lambda: client.get_configuration(1), 4)
+        wait_until(lambda: client.singleflight.coalesced == 3)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert mocked_session.get.call_count == 1
+        assert [configuration.id for configuration in results] == [1] * 4
+        # Every waiter gets its own model instance
+        assert len(set(map(id, results))) == 4
@@ -0,0 +1,216 @@
+"""Heavy concurrency against a local server, across threads and forks."""
+import os
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from azion.breaker import Breakers
+from azion.cache import Cache
+from azion.client import Azion, Session
+from azion.connections import DNSCache, warmup
+from azion.hedging import HedgePolicy
+from azion.remote import Connection, RemoteBackend
+
+from .factories import configuration_data
+from .stub_server import StubServer
+from .test_connections import Resolver, idle_connections
+from .test_remote import RESPServer
+
+
+def echo(handler):
+    """Answer with a configuration named after the request headers."""
+    name = '{} {}'.format(handler.headers.get('Authorization'),
+                          handler.headers.get('X-Thread'))
+    return 200, configuration_data(1, name=name)
+
+
+class TestThreads(object):
+
+    def test_shared_client(self):
+        with StubServer(echo) as server:
+            session = Session(pool_maxsize=8)
+            session.base_url = server.url
+            client = Azion(token='token', session=session)
+            with ThreadPoolExecutor(max_workers=32) as executor:
+                names = list(executor.map(
+                    lambda _: client.get_configuration(1).name, range(500)))
+            assert names == ['token token None'] * 500
+            assert len(server.requests) == 500
+
+    def test_login_while_requesting(self):
+        tokens = {f'token {index}' for index in range(20)}
+        with StubServer(echo) as server:
+            session = Session(pool_maxsize=8)
+            session.base_url = server.url
+            client = Azion(token='0', session=session)
+
+            def login():
+                for index in range(20):
+                    client.login(str(index))
+
+            def get(_):
+                return client.get_configuration(1).name
+
+            thread = threading.Thread(target=login)
+            thread.start()
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                names = list(executor.map(get, range(200)))
+            thread.join()
+            assert {name.rsplit(' ', 1)[0] for name in names} <= tokens
+            assert client.session.auth.token == '19'
+
+    def test_thread_options(self):
+        with StubServer(echo) as server:
+            session = Session(pool_maxsize=8)
+            session.base_url = server.url
+            client = Azion(token='token', session=session)
+
+            def get(index):
+                headers = {'X-Thread': str(index)}
+                with session.thread_options(headers=headers, timeout=5):
+                    return [client.get_configuration(1).name
+                            for _ in range(10)]
+
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                results = list(executor.map(get, range(32)))
+            for index, names in enumerate(results):
+                assert names == [f'token token {index}'] * 10
+            # Options do not leak out of the block
+            assert client.get_configuration(1).name == 'token token None'
+
+    def test_nested_thread_options(self):
+        with StubServer(echo) as server:
+            session = Session()
+            with session.thread_options(headers={'X-Thread': 'outer'}):
+                with session.thread_options(
+                        headers={'Authorization': 'inner'}):
+                    response = session.get(server.url)
+                    assert response.json()['name'] == 'inner outer'
+                    response = session.get(
+                        server.url, headers={'X-Thread': 'request'})
+                    assert response.json()['name'] == 'inner request'
+                response = session.get(server.url)
+                assert response.json()['name'] == 'None outer'
+
+    def test_concurrent_submit(self):
+        client = Azion(session=Session())
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            submitters = set(executor.map(
+                lambda _: client.submit, range(64)))
+        assert len(submitters) == 1
+        client.close()
+
+
+@pytest.mark.skipif(not hasattr(os, 'register_at_fork'),
+                    reason='os.register_at_fork is not available')
+class TestFork(object):
+
+    def fork(self, child):
+        """Run `child` in a forked process and return its exit code,
+        or the negated signal that killed it."""
+        pid = os.fork()
+        if pid == 0:
+            # A child stuck on state inherited from the parent is killed
+            signal.alarm(10)
+            try:
+                code = child()
+            except BaseException:
+                code = 2
+            os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        if os.WIFSIGNALED(status):
+            return -os.WTERMSIG(status)
+        return os.WEXITSTATUS(status)
+
+    def test_pools_reset_in_child(self):
+        with StubServer(echo) as server:
+            session = Session(pool_maxsize=4)
+            session.base_url = server.url
+            client = Azion(token='token', session=session)
+            assert warmup(session, server.url, 4) == 4
+            client.submit
+
+            def child():
+                if idle_connections(session, server.url):
+                    return 1
+                if client._submitter is not None:
+                    return 1
+                names = [client.submit.get_configuration(1).result().name
+                         for _ in range(5)]
+                return 0 if names == ['token token None'] * 5 else 1
+
+            assert self.fork(child) == 0
+            # The parent keeps its connections
+            assert len(idle_connections(session, server.url)) == 4
+            assert client.get_configuration(1).name == 'token token None'
+            client.close()
+
+    def test_fork_while_requesting(self):
+        with StubServer(echo) as server:
+            session = Session(pool_maxsize=8)
+            session.base_url = server.url
+            client = Azion(token='token', session=session)
+            stop = threading.Event()
+
+            def load():
+                while not stop.is_set():
+                    client.get_configuration(1)
+
+            threads = [threading.Thread(target=load) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            try:
+                def child():
+                    names = {client.get_configuration(1).name
+                             for _ in range(10)}
+                    return 0 if names == {'token token None'} else 1
+
+                codes = [self.fork(child) for _ in range(3)]
+            finally:
+                stop.set()
+                for thread in threads:
+                    thread.join()
+            assert codes == [0] * 3
+
+    def test_components_reset_in_child(self):
+        with StubServer(echo) as server, RESPServer() as redis:
+            session = Session(pool_maxsize=4)
+            session.base_url = server.url
+            backend = RemoteBackend(
+                Connection(*redis.server_address), prefix='fork:')
+            client = Azion(
+                token='token', session=session, coalesce=True,
+                breakers=Breakers(bulkheads={'content_delivery': 2}),
+                hedging=HedgePolicy(delay=1, budget=1),
+                cache=Cache(backend, ttl=60))
+            # Start the hedging workers and open the cache connection
+            assert client.get_configuration(1).name == 'token token None'
+
+            def child():
+                for executor in (client.hedging.executor,
+                                 client.cache.executor):
+                    if executor.submit(lambda: 1).result(timeout=2) != 1:
+                        return 1
+                if backend.connection.sock is not None:
+                    return 1
+                names = [client.get_configuration(id).name
+                         for id in (1, 2, 3)]
+                client.login('child')
+                names.append(client.get_configuration(4).name)
+                return 0 if names == ['token token None'] * 3 + [
+                    'token child None'] else 1
+
+            assert self.fork(child) == 0
+            assert client.get_configuration(2).name == 'token token None'
+            assert backend.errors == 0
+            client.close()
+
+    def test_dns_cache_reset_in_child(self):
+        dns_cache = DNSCache(resolver=Resolver())
+        # Held by another thread of the parent at fork time
+        with dns_cache.lock:
+            code = self.fork(lambda: 0 if dns_cache.resolve(
+                'example.com', 80) == ['127.0.0.1'] else 1)
+        assert code == 0
@@ -0,0 +1,92 @@
+import pytest
+
+from azion import protocol
+from azion.client import Azion
+from azion.exceptions import ValidationError
+from azion.validation import (ADDRESS, CONFIGURATION, CONFIGURATION_UPDATE,
+                              ORIGIN, Field, Schema)
+
+from .test_client import create_mocked_session
+
+
+class TestSchema(object):
+
+    def test_valid_payload(self):
+        assert CONFIGURATION.validate({
+            'name': 'Foo', 'origin_address': 'www.example.com',
+            'origin_host_header': 'www.example.com',
+            'cname': ['cdn.example.com'], 'delivery_protocol': 'http,https',
+            'cdn_cache_settings': 'override',
+            'cdn_cache_settings_maximum_ttl': 3600}) == []
+
+    def test_reports_every_error(self):
+        errors = CONFIGURATION.validate({
+            'origin_address': 'www.example.com',
+            'delivery_protocol': 'ftp',
+            'cdn_cache_settings_maximum_ttl': -1,
+            'cname': 'cdn.example.com',
+            'colour': 'blue'})
+        assert errors == [
+            'name is required',
+            'origin_host_header is required',
+            "delivery_protocol must be one of 'http', 'http,https'",
+            'cdn_cache_settings_maximum_ttl must be at least 0',
+            'cname must be of type list',
+            'colour is unknown',
+        ]
+
+    def test_none_is_absent(self):
+        assert CONFIGURATION_UPDATE.validate({'name': None}) == []
+        assert ADDRESS.validate({'address': None}) == [
+            'address is required']
+
+    def test_booleans_are_not_numbers(self):
+        assert CONFIGURATION_UPDATE.validate(
+            {'digital_certificate': True}) == [
+                'digital_certificate must be of type int']
+
+    def test_nested_items(self):
+        errors = ORIGIN.validate({
+            'name': 'Foo', 'host_header': 'www.example.com',
+            'addresses': [{'address': 'a.example.com', 'weight': None},
+                          {'address': '', 'server_role': 'spare'},
+                          'b.example.com']})
+        assert errors == [
+            'addresses[1].address must have a length of at least 1',
+            "addresses[1].server_role must be one of 'primary', 'backup'",
+            'addresses[2] must be of type dict',
+        ]
+
+    def test_list_item_types(self):
+        schema = Schema({'tags': Field(list, items=str)})
+        assert schema.validate({'tags': ['a', 1]}) == [
+            'tags[1] must be of type str']
+
+    def test_allow_unknown(self):
+        schema = Schema({'name': Field(str)}, allow_unknown=True)
+        assert schema.validate({'name': 'a', 'other': 1}) == []
+
+    def test_check_raises(self):
+        with pytest.raises(ValidationError) as error:
+            CONFIGURATION_UPDATE.check(
+                {'active': 'yes', 'rawlogs': 'no'})
+        assert len(error.value.errors) == 2
+
+
+class TestRequestValidation(object):
+
+    def test_protocol_rejects_invalid_payloads(self):
+        with pytest.raises(ValidationError):
+            protocol.partial_update_configuration(
+                1, delivery_protocol='https')
+        with pytest.raises(ValidationError):
+            protocol.create_origin(1, name='Foo', addresses=[])
+
+    def test_nothing_is_sent(self):
+        mocked_session = create_mocked_session()
+        client = Azion(session=mocked_session)
+        with pytest.raises(ValidationError):
+            client.create_configuration(
+                'Foo', 'www.example.com', 'www.example.com',
+                cdn_cache_settings='bypass')
+        assert not mocked_session.post.called
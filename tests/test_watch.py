@@ -0,0 +1,80 @@
+from azion.watch import Watcher, diff_records, watch
+
+from .factories import create_client, make_configuration, make_origin
+
+
+class TestWatch(object):
+
+    def test_diff_records(self):
+        assert diff_records({'a': 1, 'b': 2}, {'a': 1, 'b': 3}) == {
+            'b': (2, 3)}
+        assert diff_records(None, {'a': 1}) == {'a': (None, 1)}
+
+    def test_first_poll_is_baseline(self):
+        client = create_client([make_configuration(1)], {1: [make_origin(10)]})
+        watcher = Watcher(client)
+        assert watcher.poll() == []
+
+    def test_configuration_changes(self):
+        client = create_client(
+            [make_configuration(1), make_configuration(2)], {})
+        watcher = Watcher(client)
+        watcher.poll()
+
+        client.list_configurations.return_value = [
+            make_configuration(1, name='Renamed'), make_configuration(3)]
+        changes = {(c.kind, c.id): c for c in watcher.poll()}
+        assert set(changes) == {
+            ('changed', 1), ('removed', 2), ('added', 3)}
+        assert changes[('changed', 1)].diff == {
+            'name': ('My configuration', 'Renamed')}
+
+    def test_origin_changes(self):
+        origins = {1: [make_origin(10)]}
+        client = create_client([make_configuration(1)], origins)
+        watcher = Watcher(client)
+        watcher.poll()
+
+        origins[1] = [make_origin(10, addresses=('new.origin.com',))]
+        changes = watcher.poll()
+        assert len(changes) == 1
+        assert changes[0].resource == 'origin'
+        assert changes[0].configuration_id == 1
+        assert list(changes[0].diff) == ['addresses']
+
+    def test_origins_are_polled_in_round_robin(self):
+        client = create_client(
+            [make_configuration(id) for id in (1, 2, 3)], {})
+        watcher = Watcher(client, origins_per_poll=2)
+        watcher.poll()
+        watcher.poll()
+        polled = [call[0][0] for call in client.list_origins.call_args_list]
+        assert polled == [1, 2, 3, 1]
+
+    def test_adaptive_interval(self):
+        client = create_client([make_configuration(1)], {})
+        watcher = Watcher(client, interval=10, min_interval=5,
+                          max_interval=20, jitter=0)
+        watcher.poll()
+        assert watcher.interval == 15
+        watcher.poll()
+        assert watcher.interval == 20
+
+        client.list_configurations.return_value = [
+            make_configuration(1, active=False)]
+        watcher.poll()
+        assert watcher.interval == 10
+        assert watcher.next_interval() == 10
+
+    def test_watch_yields_changes(self):
+        client = create_client([make_configuration(1)], {})
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            client.list_configurations.return_value = [
+                make_configuration(1, name='Renamed')]
+
+        change = next(watch(client, sleep=sleep))
+        assert change.kind == 'changed'
+        assert len(sleeps) == 1